@@ -1,11 +1,48 @@
 """E-Commerce Data Pipeline DAG."""
 
-from datetime import datetime, timedelta
+import os
+import sys
+import subprocess
+from functools import wraps
+from datetime import date, datetime, timedelta
 from airflow import DAG
+from airflow.exceptions import AirflowFailException, AirflowSkipException
 from airflow.operators.python import PythonOperator
-from airflow.operators.bash import BashOperator
 from airflow.utils.task_group import TaskGroup
 
+# Repo checkout (src/, great_expectations/) as mounted in docker/docker-compose.yml
+PROJECT_DIR = os.getenv('PIPELINE_PROJECT_DIR', '/opt/airflow')
+sys.path.insert(0, PROJECT_DIR)
+DATA_DIR = os.path.join(PROJECT_DIR, 'data/sample')
+DBT_DIR = os.path.join(PROJECT_DIR, 'dbt')
+FACT_TABLES = ['transactions', 'inventory_snapshots', 'page_views']
+# DuckDB allows one writing process: every task that opens the warehouse
+# takes the single slot of this pool (created by docker/docker-compose.yml),
+# so overlapping runs extract in parallel but touch the warehouse in turn
+WAREHOUSE_POOL = 'duckdb_warehouse'
+
+
+def instrumented(fn):
+    """Run a task callable inside a span labelled with its task instance.
+
+    Spans from generate_data and the warehouse loader nest under it and land
+    in PIPELINE_METRICS_PATH; the Prometheus textfile is refreshed afterwards.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        from src.utils.instrumentation import set_labels, span, write_prometheus
+        
+        ti = kwargs['ti']
+        set_labels(dag_id=ti.dag_id, run_id=ti.run_id, task_id=ti.task_id,
+                   map_index=ti.map_index, try_number=ti.try_number)
+        try:
+            with span(ti.task_id):
+                return fn(*args, **kwargs)
+        finally:
+            write_prometheus()
+    return wrapper
+
+
 default_args = {
     'owner': 'data-engineering',
     'depends_on_past': False,
@@ -18,42 +55,173 @@ with DAG(
     default_args=default_args,
     description='Daily e-commerce data pipeline',
     schedule_interval='0 6 * * *',
+    # Also the generator's PARTITION_EPOCH: dt= partitions are numbered from here
     start_date=datetime(2024, 1, 1),
     catchup=False,
+    max_active_runs=8,
     tags=['ecommerce', 'production'],
 ) as dag:
 
     # Ingestion Tasks
     with TaskGroup('ingestion') as ingestion:
-        def extract_data(**ctx):
-            print(f"Extracting data for {ctx['ds']}")
+        def extract_dimensions(**ctx):
+            from src.ingestion.generate_data import ensure_dimensions
+            ensure_dimensions(DATA_DIR)
         
-        extract = PythonOperator(
+        def list_partitions(**ctx):
+            # Trigger with {"days": N} to re-extract the N days ending at ds
+            days = int((ctx['dag_run'].conf or {}).get('days', 1))
+            ds = date.fromisoformat(ctx['ds'])
+            return [
+                {'table': table, 'ds': (ds - timedelta(days=n)).isoformat()}
+                for n in range(days)
+                for table in FACT_TABLES
+            ]
+        
+        def extract_partition(table, ds, **ctx):
+            from src.ingestion.generate_data import ensure_dimensions, write_partition
+            rows = write_partition(
+                table, date.fromisoformat(ds), DATA_DIR, *ensure_dimensions(DATA_DIR)
+            )
+            print(f"Extracted {rows:,} rows to {table}/dt={ds}")
+        
+        def load_warehouse(**ctx):
+            from src.utils.database import initialize_warehouse
+            initialize_warehouse(DATA_DIR, incremental=True)
+        
+        dimensions = PythonOperator(
+            task_id='dimensions',
+            python_callable=instrumented(extract_dimensions),
+        )
+        partitions = PythonOperator(
+            task_id='partitions',
+            python_callable=instrumented(list_partitions),
+        )
+        # One mapped task per (table, dt) partition; each retries on its own
+        extract = PythonOperator.partial(
             task_id='extract',
-            python_callable=extract_data,
+            python_callable=instrumented(extract_partition),
+        ).expand(op_kwargs=partitions.output)
+        load = PythonOperator(
+            task_id='load',
+            python_callable=instrumented(load_warehouse),
+            pool=WAREHOUSE_POOL,
         )
+        dimensions >> partitions >> extract >> load
 
     # Data Quality
     with TaskGroup('quality') as quality:
         def run_checks(**ctx):
-            print("Running data quality checks")
+            from src.quality.validator import validate_table
+            
+            # One aggregate scan of raw.transactions for the whole suite
+            suite = os.path.join(
+                PROJECT_DIR, 'great_expectations/expectations/transactions_suite.json'
+            )
+            result = validate_table('raw.transactions', suite)
+            print(result.summary())
+            if not result.success:
+                raise AirflowFailException(f"Data quality checks failed for {ctx['ds']}")
         
         checks = PythonOperator(
             task_id='checks',
-            python_callable=run_checks,
+            python_callable=instrumented(run_checks),
+            pool=WAREHOUSE_POOL,
         )
 
-    # dbt Transformations
+    # dbt Transformations: rebuild only models downstream of newly loaded raw tables
     with TaskGroup('dbt') as dbt:
-        dbt_run = BashOperator(
-            task_id='run',
-            bash_command='cd /opt/airflow/dbt && dbt run',
+        def run_dbt(*args, **ctx):
+            # Print dbt's output so it lands in the task log, then fail on error
+            result = subprocess.run(['dbt', *args], cwd=DBT_DIR, capture_output=True, text=True)
+            print(result.stdout + result.stderr)
+            result.check_returncode()
+        
+        def build_models(**ctx):
+            # One dbt process (DuckDB has a single writer) running independent
+            # models such as dim_product and fact_sales on parallel threads
+            plan = ctx['ti'].xcom_pull(task_ids='dbt.plan')
+            run_dbt('build', '--threads', '4', '--select', *plan['models'])
+        
+        def plan_models(**ctx):
+            from src.utils.dbt_selection import load_dbt_manifest, model_lineage, plan_build
+            
+            lineage = model_lineage(load_dbt_manifest(os.path.join(DBT_DIR, 'target/manifest.json')))
+            models, planned_at = plan_build(lineage)
+            if not models:
+                raise AirflowSkipException('No raw tables changed since the last dbt build')
+            print(f"Rebuilding {len(models)}/{len(lineage)} models: {' '.join(models)}")
+            return {'models': models, 'planned_at': planned_at.isoformat()}
+        
+        def record_models(**ctx):
+            from src.utils.dbt_selection import load_dbt_manifest, model_lineage, record_model_runs
+            
+            plan = ctx['ti'].xcom_pull(task_ids='dbt.plan')
+            lineage = model_lineage(load_dbt_manifest(os.path.join(DBT_DIR, 'target/manifest.json')))
+            record_model_runs(plan['models'], lineage, datetime.fromisoformat(plan['planned_at']))
+        
+        dbt_parse = PythonOperator(
+            task_id='parse',
+            python_callable=instrumented(run_dbt),
+            op_args=['parse'],
+        )
+        plan = PythonOperator(
+            task_id='plan',
+            python_callable=instrumented(plan_models),
+            pool=WAREHOUSE_POOL,
+        )
+        dbt_build = PythonOperator(
+            task_id='build',
+            python_callable=instrumented(build_models),
+            pool=WAREHOUSE_POOL,
+        )
+        record = PythonOperator(
+            task_id='record',
+            python_callable=instrumented(record_models),
+            pool=WAREHOUSE_POOL,
+        )
+        dbt_parse >> plan >> dbt_build >> record
+
+    # Serving layer: derived from marts.fact_sales, so it runs after dbt has
+    # rebuilt the loaded days (and still catches up when dbt had nothing to do)
+    with TaskGroup('analytics') as analytics:
+        def refresh_sales_rollups(**ctx):
+            from src.analytics.rollups import refresh_rollups
+            for name, window in refresh_rollups().items():
+                print(f"Refreshed {name}: {'all days' if window is None else window}")
+        
+        def refresh_customer_scores(**ctx):
+            from src.analytics.customers import refresh_customers
+            window = refresh_customers()
+            if window is False:
+                raise AirflowSkipException('No fact_sales days rebuilt since the last refresh')
+            print(f"Rescored customers from {'all days' if window is None else window}")
+        
+        def refresh_demand_features(**ctx):
+            from src.analytics.features import refresh_features
+            written = refresh_features(
+                feature_dir=os.getenv('FEATURE_STORE_DIR', os.path.join(PROJECT_DIR, 'data/features'))
+            )
+            print(f"Wrote {len(written)} feature partitions")
+        
+        rollups = PythonOperator(
+            task_id='rollups',
+            python_callable=instrumented(refresh_sales_rollups),
+            pool=WAREHOUSE_POOL,
+            trigger_rule='none_failed',
+        )
+        customers = PythonOperator(
+            task_id='customers',
+            python_callable=instrumented(refresh_customer_scores),
+            pool=WAREHOUSE_POOL,
+            trigger_rule='none_failed',
         )
-        dbt_test = BashOperator(
-            task_id='test',
-            bash_command='cd /opt/airflow/dbt && dbt test',
+        features = PythonOperator(
+            task_id='features',
+            python_callable=instrumented(refresh_demand_features),
+            pool=WAREHOUSE_POOL,
+            trigger_rule='none_failed',
         )
-        dbt_run >> dbt_test
 
     # Completion
     def notify(**ctx):
@@ -62,6 +230,7 @@ with DAG(
     complete = PythonOperator(
         task_id='complete',
         python_callable=notify,
+        trigger_rule='none_failed',
     )
 
-    ingestion >> quality >> dbt >> complete
\ No newline at end of file
+    ingestion >> quality >> dbt >> analytics >> complete
\ No newline at end of file
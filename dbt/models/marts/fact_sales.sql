@@ -1,5 +1,36 @@
-with transactions as (
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='delete+insert',
+        unique_key='transaction_day',
+        on_schema_change='append_new_columns'
+    )
+}}
+
+with
+{% if is_incremental() %}
+-- Days of every raw.transactions file loaded since the last build, so
+-- backfills and catch-up loads older than the lookback window land too
+touched_days as (
+    select distinct cast(unnest(generate_series(min_partition, max_partition, interval 1 day)) as date) as day
+    from {{ source('raw', '_load_manifest') }}
+    where table_name = 'transactions'
+      and loaded_at > (select coalesce(max(loaded_at), '-infinity'::timestamp) from {{ this }})
+),
+{% endif %}
+
+transactions as (
     select * from {{ ref('stg_transactions') }}
+    {% if is_incremental() %}
+    -- Reprocess whole days from the lookback window onwards, plus any touched
+    -- day; delete+insert on transaction_day replaces them, picking up late
+    -- order_status changes
+    where transaction_date >= (
+        select max(transaction_day) - interval '{{ var("fact_sales_lookback_days") }} days'
+        from {{ this }}
+    )
+    or cast(transaction_date as date) in (select day from touched_days)
+    {% endif %}
 ),
 
 products as (
@@ -26,6 +57,10 @@ select
     t.fulfillment_type,
     p.unit_cost,
     t.quantity * p.unit_cost as line_cost,
-    t.total_amount - (t.quantity * p.unit_cost) as line_profit
+    t.total_amount - (t.quantity * p.unit_cost) as line_profit,
+    -- Build time; later incremental runs pick up raw loads after it
+    cast(current_timestamp as timestamp) as loaded_at
 from transactions t
-left join products p on t.product_id = p.product_id
\ No newline at end of file
+left join products p on t.product_id = p.product_id
+-- Rows land in day order so DuckDB zone maps can skip row groups on date filters
+order by t.transaction_day, t.store_id
@@ -0,0 +1,255 @@
+"""RFM segmentation and customer lifetime value from per-customer daily and running aggregates."""
+
+import sys
+from pathlib import Path
+
+# Allow running as a script from the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.analytics.rollups import FACT_TABLE, SOLD_LINES, fact_watermark, rebuilt_days
+from src.utils.database import db_connection, invalidate_cache, table_exists
+
+CUSTOMER_SCHEMA = "customer_analytics"
+AGGREGATES_TABLE = "customer_aggregates"
+DAYS_TABLE = "customer_days"
+RFM_TABLE = "customer_rfm"
+STATE_TABLE = "_customer_state"
+CUSTOMER_TABLE = "raw.customers"
+
+LIFESPAN_YEARS = 3
+MIN_TENURE_DAYS = 30
+
+# First match wins; scores are quintiles where 5 is best (ties split by customer_id)
+SEGMENTS = [
+    ("Champions", "r >= 4 AND f >= 4 AND m >= 4"),
+    ("At Risk", "r <= 2 AND f >= 4"),
+    ("Loyal", "r >= 3 AND f >= 4"),
+    ("New", "r >= 4 AND f <= 2"),
+    ("Potential Loyalist", "r >= 3 AND f >= 2"),
+    ("Needs Attention", "r <= 2 AND f >= 2"),
+]
+DEFAULT_SEGMENT = "Hibernating"
+NO_PURCHASE_SEGMENT = "No Purchases"
+
+DAY = "CAST(CAST(transaction_day AS TIMESTAMP) AS DATE)"
+
+
+def _customer_days_sql(where):
+    """Per-customer, per-day aggregates over the fact rows matching `where`."""
+    return f"""
+        SELECT
+            customer_id,
+            {DAY} AS day,
+            COUNT(DISTINCT order_id) AS order_count,
+            COUNT(*) AS line_count,
+            SUM(total_amount) AS revenue,
+            SUM(line_profit) AS profit
+        FROM {FACT_TABLE}
+        WHERE {SOLD_LINES} AND ({where})
+        GROUP BY customer_id, {DAY}
+    """
+
+
+def _lifetime_aggregates_sql(where):
+    """Per-customer totals over the customer_days rows matching `where`.
+
+    Orders never span days, so daily order counts add up.
+    """
+    return f"""
+        SELECT
+            customer_id,
+            MIN(day) AS first_order_day,
+            MAX(day) AS last_order_day,
+            SUM(order_count) AS order_count,
+            SUM(line_count) AS line_count,
+            SUM(revenue) AS revenue,
+            SUM(profit) AS profit
+        FROM {CUSTOMER_SCHEMA}.{DAYS_TABLE}
+        WHERE {where}
+        GROUP BY customer_id
+    """
+
+
+def _ensure_state(conn):
+    conn.execute(f"CREATE SCHEMA IF NOT EXISTS {CUSTOMER_SCHEMA}")
+    # refreshed_at is the fact_watermark() the aggregates are up to date with
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CUSTOMER_SCHEMA}.{STATE_TABLE} (refreshed_at TIMESTAMP)
+    """)
+
+
+def rebuild_aggregates(conn):
+    """Recompute every customer's daily and lifetime aggregates from the whole fact table."""
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE {CUSTOMER_SCHEMA}.{DAYS_TABLE} AS
+        {_customer_days_sql("TRUE")}
+    """)
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE {CUSTOMER_SCHEMA}.{AGGREGATES_TABLE} AS
+        {_lifetime_aggregates_sql("TRUE")}
+    """)
+
+
+def merge_aggregates(conn, start, end):
+    """Replace days start..end in the aggregates, reading only those fact days.
+
+    The days' old customer_days rows are subtracted from the lifetime totals
+    and the freshly aggregated ones added, so days the fact table's lookback
+    rebuilt are not counted twice. Only a customer whose first or last order
+    day fell in the window and who no longer bought in it needs that day
+    looked up again, from customer_days rather than the fact table.
+    """
+    days = f"{CUSTOMER_SCHEMA}.{DAYS_TABLE}"
+    target = f"{CUSTOMER_SCHEMA}.{AGGREGATES_TABLE}"
+    in_window = "day BETWEEN CAST(? AS DATE) AND CAST(? AS DATE)"
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _customer_old AS
+        {_lifetime_aggregates_sql(in_window)}
+    """, [start, end])
+    conn.execute(f"DELETE FROM {days} WHERE {in_window}", [start, end])
+    conn.execute(f"""
+        INSERT INTO {days} BY NAME
+        {_customer_days_sql(f"{DAY} BETWEEN CAST(? AS DATE) AND CAST(? AS DATE)")}
+    """, [start, end])
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _customer_new AS
+        {_lifetime_aggregates_sql(in_window)}
+    """, [start, end])
+    # A first/last order day inside the window has no other days beyond it on
+    # that side, so it is the new window's, or NULL until looked up below
+    conn.execute(f"""
+        UPDATE {target} AS a SET
+            first_order_day = CASE WHEN a.first_order_day BETWEEN CAST(? AS DATE) AND CAST(? AS DATE)
+                                   THEN n.first_order_day
+                                   ELSE LEAST(a.first_order_day, n.first_order_day) END,
+            last_order_day = CASE WHEN a.last_order_day BETWEEN CAST(? AS DATE) AND CAST(? AS DATE)
+                                  THEN n.last_order_day
+                                  ELSE GREATEST(a.last_order_day, n.last_order_day) END,
+            order_count = a.order_count - COALESCE(o.order_count, 0) + COALESCE(n.order_count, 0),
+            line_count = a.line_count - COALESCE(o.line_count, 0) + COALESCE(n.line_count, 0),
+            revenue = a.revenue - COALESCE(o.revenue, 0) + COALESCE(n.revenue, 0),
+            profit = a.profit - COALESCE(o.profit, 0) + COALESCE(n.profit, 0)
+        FROM (
+            SELECT customer_id FROM _customer_old
+            UNION SELECT customer_id FROM _customer_new
+        ) AS t
+        LEFT JOIN _customer_old o USING (customer_id)
+        LEFT JOIN _customer_new n USING (customer_id)
+        WHERE a.customer_id = t.customer_id
+    """, [start, end, start, end])
+    conn.execute(f"DELETE FROM {target} WHERE line_count = 0")
+    unknown = f"""
+        customer_id IN (
+            SELECT customer_id FROM {target}
+            WHERE first_order_day IS NULL OR last_order_day IS NULL
+        )
+    """
+    conn.execute(f"""
+        UPDATE {target} AS a SET
+            first_order_day = d.first_order_day,
+            last_order_day = d.last_order_day
+        FROM ({_lifetime_aggregates_sql(unknown)}) AS d
+        WHERE a.customer_id = d.customer_id
+    """)
+    conn.execute(f"""
+        INSERT INTO {target} BY NAME
+        SELECT n.* FROM _customer_new n
+        WHERE n.customer_id NOT IN (SELECT customer_id FROM {target})
+    """)
+    conn.execute("DROP TABLE _customer_old")
+    conn.execute("DROP TABLE _customer_new")
+
+
+def score_customers(conn, as_of=None):
+    """Rebuild customer_rfm from the aggregates: quintile scores, segment and CLV.
+
+    Recency is measured from `as_of` (default: the latest aggregated order day).
+    CLV is average order value x orders per year x margin x LIFESPAN_YEARS,
+    with tenure floored at MIN_TENURE_DAYS so brand-new customers are not
+    extrapolated from a single day.
+    """
+    aggregates = f"{CUSTOMER_SCHEMA}.{AGGREGATES_TABLE}"
+    segment = " ".join(f"WHEN {rule} THEN '{name}'" for name, rule in SEGMENTS)
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE {CUSTOMER_SCHEMA}.{RFM_TABLE} AS
+        WITH as_of AS (
+            SELECT COALESCE(CAST(? AS DATE), MAX(last_order_day)) AS day FROM {aggregates}
+        ),
+        scored AS (
+            SELECT
+                a.*,
+                as_of.day - a.last_order_day AS recency_days,
+                NTILE(5) OVER (ORDER BY a.last_order_day, a.customer_id) AS r,
+                NTILE(5) OVER (ORDER BY a.order_count, a.customer_id) AS f,
+                NTILE(5) OVER (ORDER BY a.revenue, a.customer_id) AS m,
+                GREATEST(as_of.day - a.first_order_day + 1, {MIN_TENURE_DAYS}) AS tenure_days
+            FROM {aggregates} a, as_of
+        )
+        SELECT
+            c.customer_id,
+            c.customer_type,
+            c.loyalty_tier,
+            s.first_order_day,
+            s.last_order_day,
+            s.recency_days,
+            COALESCE(s.order_count, 0) AS order_count,
+            COALESCE(s.revenue, 0) AS revenue,
+            COALESCE(s.profit, 0) AS profit,
+            s.r AS recency_score,
+            s.f AS frequency_score,
+            s.m AS monetary_score,
+            CASE WHEN s.customer_id IS NULL THEN '{NO_PURCHASE_SEGMENT}'
+                 {segment} ELSE '{DEFAULT_SEGMENT}' END AS segment,
+            -- AOV x orders per year x margin reduces to profit per year
+            COALESCE(s.profit * 365.0 / s.tenure_days * {LIFESPAN_YEARS}, 0) AS clv
+        FROM {CUSTOMER_TABLE} c
+        LEFT JOIN scored s USING (customer_id)
+        ORDER BY c.customer_id
+    """, [as_of])
+
+
+def refresh_customers(db_path=None, full_refresh=False, as_of=None):
+    """Bring customer aggregates up to date with marts.fact_sales and rescore every customer.
+
+    Only the days dbt rebuilt since the last refresh (by fact_sales
+    loaded_at, so run it after `dbt build`) are read and replaced; the first
+    run or full_refresh=True aggregates the whole fact table. Returns the
+    (start, end) days merged, None for a full rebuild, or False when nothing
+    was rebuilt.
+    """
+    with db_connection(db_path) as conn:
+        _ensure_state(conn)
+        last = conn.execute(f"""
+            SELECT MAX(refreshed_at) FROM {CUSTOMER_SCHEMA}.{STATE_TABLE}
+        """).fetchone()[0]
+        rebuild = (full_refresh or last is None
+                   or not table_exists(conn, CUSTOMER_SCHEMA, AGGREGATES_TABLE)
+                   or not table_exists(conn, CUSTOMER_SCHEMA, DAYS_TABLE))
+        watermark = fact_watermark(conn)
+        window = None if rebuild else rebuilt_days(conn, since=last)
+        if not rebuild and window is None:
+            return False
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            if rebuild:
+                rebuild_aggregates(conn)
+            else:
+                merge_aggregates(conn, *window)
+            score_customers(conn, as_of)
+            conn.execute(f"""
+                INSERT INTO {CUSTOMER_SCHEMA}.{STATE_TABLE} (refreshed_at) VALUES (?)
+            """, [watermark])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    invalidate_cache()
+    return window
+
+
+if __name__ == "__main__":
+    window = refresh_customers(full_refresh="--full-refresh" in sys.argv)
+    if window is False:
+        print("  ✓ no fact_sales days rebuilt since the last refresh")
+    else:
+        print(f"  ✓ {CUSTOMER_SCHEMA}.{RFM_TABLE}: {'all days' if window is None else window}")
@@ -0,0 +1,253 @@
+"""Daily store x product demand features (lags, rolling stats, inventory) written as date-partitioned Parquet."""
+
+import os
+import sys
+import shutil
+from datetime import timedelta
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Allow running as a script from the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.analytics.rollups import FACT_TABLE, SOLD_LINES, fact_watermark, rebuilt_days
+from src.models.schemas import table_schema
+from src.utils.database import (
+    INVENTORY_INTERVALS_TABLE, db_connection, parquet_files, table_type,
+)
+
+FEATURE_SCHEMA = "features"
+HISTORY_TABLE = "_demand_history"
+STATE_TABLE = "_feature_state"
+INVENTORY_SCHEMA = "raw"
+INVENTORY_TABLE = "inventory_snapshots"
+FEATURE_DIR = os.getenv("FEATURE_STORE_DIR", "data/features")
+DATASET = "demand"
+
+LAGS = (1, 7, 28)
+WINDOWS = (7, 28, 90)
+MAX_WINDOW = max(WINDOWS + LAGS)
+# Demand history kept beyond the longest window, so reprocessing the fact
+# table's lookback days never has to go back to marts.fact_sales
+HISTORY_SLACK_DAYS = 30
+
+DAY = "CAST(CAST(transaction_day AS TIMESTAMP) AS DATE)"
+
+
+def _ensure_state(conn):
+    conn.execute(f"CREATE SCHEMA IF NOT EXISTS {FEATURE_SCHEMA}")
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {FEATURE_SCHEMA}.{HISTORY_TABLE} (
+            store_id VARCHAR, product_id VARCHAR, day DATE, units BIGINT
+        )
+    """)
+    # refreshed_at is the fact_watermark() the feature files are up to date with
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {FEATURE_SCHEMA}.{STATE_TABLE} (
+            refreshed_at TIMESTAMP, last_day DATE, history_from DATE
+        )
+    """)
+
+
+def fill_history(conn, start, end):
+    """Replace the window state's daily demand for days start..end from the fact table."""
+    history = f"{FEATURE_SCHEMA}.{HISTORY_TABLE}"
+    conn.execute(f"DELETE FROM {history} WHERE day BETWEEN ? AND ?", [start, end])
+    conn.execute(f"""
+        INSERT INTO {history}
+        SELECT store_id, product_id, {DAY} AS day, SUM(quantity) AS units
+        FROM {FACT_TABLE}
+        WHERE {DAY} BETWEEN ? AND ? AND {SOLD_LINES}
+        GROUP BY ALL
+        ORDER BY day
+    """, [start, end])
+
+
+def _inventory_join(conn):
+    """Join clause for feature_date's inventory row of each store x product.
+
+    When inventory_snapshots is the view over change intervals the
+    intervals are joined directly on valid_from/valid_to, so only those
+    covering feature_date are read instead of the view's full expansion.
+    """
+    keys = "i.store_id = w.store_id AND i.product_id = w.product_id"
+    if table_type(conn, INVENTORY_SCHEMA, INVENTORY_TABLE) == "VIEW":
+        return f"""
+            LEFT JOIN {INVENTORY_SCHEMA}.{INVENTORY_INTERVALS_TABLE} i
+                ON {keys} AND w.feature_date BETWEEN i.valid_from AND i.valid_to
+        """
+    return f"""
+        LEFT JOIN {INVENTORY_SCHEMA}.{INVENTORY_TABLE} i
+            ON {keys} AND CAST(CAST(i.snapshot_date AS TIMESTAMP) AS DATE) = w.feature_date
+    """
+
+
+def _features_sql(inventory_join):
+    """Features for the day bound to the single parameter, from the demand history alone.
+
+    Lags and windows cover the days before feature_date, so a row's features
+    never see its own `demand` target. Days without sales count as zero.
+    """
+    aggregates = ["CAST(SUM(units) FILTER (WHERE h.day = d.day) AS BIGINT) AS demand"]
+    aggregates += [
+        f"CAST(SUM(units) FILTER (WHERE h.day = d.day - {lag}) AS BIGINT) AS lag_{lag}"
+        for lag in LAGS
+    ]
+    features = ["COALESCE(demand, 0) AS demand"]
+    features += [f"COALESCE(lag_{lag}, 0) AS demand_lag_{lag}" for lag in LAGS]
+    for n in WINDOWS:
+        recent = f"h.day BETWEEN d.day - {n} AND d.day - 1"
+        aggregates += [
+            f"CAST(COALESCE(SUM(units) FILTER (WHERE {recent}), 0) AS BIGINT) AS sum_{n}",
+            f"COALESCE(SUM(CAST(units AS DOUBLE) ^ 2) FILTER (WHERE {recent}), 0) AS sumsq_{n}",
+        ]
+        features += [
+            f"sum_{n} / {n} AS demand_mean_{n}",
+            f"SQRT(GREATEST((sumsq_{n} - sum_{n} * sum_{n} / {n}) / {n - 1}, 0)) AS demand_std_{n}",
+            f"sum_{n} AS demand_sum_{n}",
+        ]
+    return f"""
+        WITH d AS (SELECT CAST(? AS DATE) AS day),
+        windowed AS (
+            SELECT d.day AS feature_date, h.store_id, h.product_id, {", ".join(aggregates)}
+            FROM {FEATURE_SCHEMA}.{HISTORY_TABLE} h, d
+            WHERE h.day BETWEEN d.day - {MAX_WINDOW} AND d.day
+            GROUP BY ALL
+        )
+        SELECT
+            w.feature_date, w.store_id, w.product_id, {", ".join(features)},
+            i.quantity_available, i.days_of_supply
+        FROM windowed w
+        {inventory_join}
+        ORDER BY w.store_id, w.product_id
+    """
+
+
+def feature_schema():
+    """Arrow schema of a feature partition, as selected by _features_sql."""
+    inventory = table_schema(INVENTORY_TABLE)
+    fields = [("feature_date", pa.date32()), ("store_id", pa.string()), ("product_id", pa.string()),
+              ("demand", pa.int64())]
+    fields += [(f"demand_lag_{lag}", pa.int64()) for lag in LAGS]
+    for n in WINDOWS:
+        fields += [(f"demand_mean_{n}", pa.float64()), (f"demand_std_{n}", pa.float64()),
+                   (f"demand_sum_{n}", pa.int64())]
+    fields += [(name, inventory.field(name).type) for name in ("quantity_available", "days_of_supply")]
+    return pa.schema(fields)
+
+
+def _feature_paths(day, feature_dir):
+    """(partition, staging directory) of one day's features."""
+    output = Path(feature_dir)
+    partition = output / DATASET / f"dt={day.isoformat()}"
+    return partition, output / ".staging" / DATASET / partition.name
+
+
+def write_feature_day(conn, day, feature_dir=FEATURE_DIR):
+    """Stage one day's features for <feature_dir>/demand/dt=YYYY-MM-DD/part-00000.parquet.
+
+    The file lands under <feature_dir>/.staging until publish_feature_days
+    swaps it in, so a refresh can publish only once its state has committed.
+    """
+    _, staging = _feature_paths(day, feature_dir)
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    table = conn.execute(_features_sql(_inventory_join(conn)), [day]).arrow()
+    pq.write_table(table, staging / "part-00000.parquet")
+    return table.num_rows
+
+
+def publish_feature_days(days, feature_dir=FEATURE_DIR):
+    """Swap the staged partitions of `days` in, replacing any earlier version."""
+    for day in days:
+        partition, staging = _feature_paths(day, feature_dir)
+        partition.parent.mkdir(parents=True, exist_ok=True)
+        shutil.rmtree(partition, ignore_errors=True)
+        staging.rename(partition)
+
+
+def refresh_features(db_path=None, feature_dir=FEATURE_DIR, start=None, end=None,
+                     full_refresh=False):
+    """Update the demand window state and rewrite the feature partitions it affects.
+
+    Days come from start/end, or from the fact_sales days dbt rebuilt since
+    the last refresh (so run it after `dbt build`). Only those days of
+    marts.fact_sales are read; features are computed from the window state
+    (MAX_WINDOW days of daily demand kept in features._demand_history), and
+    days after a reprocessed one are rewritten too. Partitions are published once the state has committed. The first run
+    or full_refresh=True builds every day in the fact table. Returns
+    {day: feature rows written}.
+    """
+    history = f"{FEATURE_SCHEMA}.{HISTORY_TABLE}"
+    with db_connection(db_path) as conn:
+        _ensure_state(conn)
+        last_refresh, last_day, history_from = conn.execute(f"""
+            SELECT refreshed_at, last_day, history_from FROM {FEATURE_SCHEMA}.{STATE_TABLE}
+            ORDER BY refreshed_at DESC, rowid DESC LIMIT 1
+        """).fetchone() or (None, None, None)
+        watermark = fact_watermark(conn)
+        if full_refresh or last_day is None:
+            conn.execute(f"DELETE FROM {history}")
+            last_day = history_from = None
+            start, end = conn.execute(f"SELECT MIN({DAY}), MAX({DAY}) FROM {FACT_TABLE}").fetchone()
+        elif start is None:
+            start, end = rebuilt_days(conn, since=last_refresh) or (None, None)
+        if start is None:
+            return {}
+
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            oldest_needed = start - timedelta(days=MAX_WINDOW)
+            if history_from is not None and history_from > oldest_needed:
+                fill_history(conn, oldest_needed, start - timedelta(days=1))
+            fill_history(conn, start, end)
+
+            stop = max(end, last_day or end)
+            written, day = {}, start
+            while day <= stop:
+                written[day] = write_feature_day(conn, day, feature_dir)
+                day += timedelta(days=1)
+
+            history_from = max(
+                min(history_from or oldest_needed, oldest_needed),
+                stop - timedelta(days=MAX_WINDOW + HISTORY_SLACK_DAYS),
+            )
+            conn.execute(f"DELETE FROM {history} WHERE day < ?", [history_from])
+            conn.execute(
+                f"INSERT INTO {FEATURE_SCHEMA}.{STATE_TABLE} VALUES (?, ?, ?)",
+                [watermark, stop, history_from],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            shutil.rmtree(Path(feature_dir) / ".staging" / DATASET, ignore_errors=True)
+            raise
+    publish_feature_days(written, feature_dir)
+    return written
+
+
+def read_features(start=None, end=None, feature_dir=FEATURE_DIR, columns=None):
+    """Feature rows for feature_date start..end (inclusive) as a pyarrow.Table.
+
+    Only the matching dt= partitions are opened; with none, the table is empty
+    but keeps the feature schema.
+    """
+    files = [
+        f for f in parquet_files(Path(feature_dir) / DATASET)
+        if (start is None or Path(f).parent.name >= f"dt={start.isoformat()}")
+        and (end is None or Path(f).parent.name <= f"dt={end.isoformat()}")
+    ]
+    if not files:
+        empty = feature_schema().empty_table()
+        return empty if columns is None else empty.select(columns)
+    return ds.dataset(files, format="parquet").to_table(columns=columns)
+
+
+if __name__ == "__main__":
+    written = refresh_features(full_refresh="--full-refresh" in sys.argv)
+    for day, rows in written.items():
+        print(f"  ✓ {DATASET}/dt={day}: {rows:,} rows")
@@ -0,0 +1,272 @@
+"""Pre-aggregated sales rollups over marts.fact_sales, and a router that answers from them."""
+
+import sys
+from datetime import timedelta
+from pathlib import Path
+from dataclasses import dataclass
+
+# Allow running as a script from the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.utils.database import db_connection, execute_query, invalidate_cache, table_exists
+
+ROLLUP_SCHEMA = "rollups"
+STATE_TABLE = "_rollup_state"
+FACT_TABLE = "marts.fact_sales"
+# Lines with these statuses never became revenue or demand
+EXCLUDED_STATUSES = ("cancelled", "returned")
+SOLD_LINES = "CAST(order_status AS VARCHAR) NOT IN ({})".format(
+    ", ".join(f"'{s}'" for s in EXCLUDED_STATUSES)
+)
+PRODUCT_TABLE = "marts.dim_product"
+STORE_TABLE = "raw.stores"
+
+# Grouping columns, as expressions over fact (f), product (p) and store (s)
+DIMENSIONS = {
+    "day": "CAST(CAST(f.transaction_day AS TIMESTAMP) AS DATE)",
+    "month": "CAST(CAST(f.transaction_month AS TIMESTAMP) AS DATE)",
+    "store_id": "f.store_id",
+    "region": "s.region",
+    "category": "p.category",
+    "channel": "f.channel",
+    "order_status": "f.order_status",
+}
+
+MEASURES = {
+    "revenue": "SUM(f.total_amount)",
+    "units": "SUM(f.quantity)",
+    "discount": "SUM(f.discount_amount)",
+    "profit": "SUM(f.line_profit)",
+    "line_items": "COUNT(*)",
+    "order_count": "COUNT(DISTINCT f.order_id)",
+}
+
+# order_count is a distinct count, so summing it across rollup rows is only
+# exact when the rows being summed never share an order. Orders never span
+# days (every line of an order gets the same date), so only the time columns
+# may be aggregated away; everything else must match the rollup's grain.
+ORDER_DISJOINT_DIMENSIONS = {"day", "month"}
+# A store is in one region, so fixing store_id also fixes region
+FUNCTIONAL_DEPENDENCIES = {"region": "store_id"}
+
+
+@dataclass(frozen=True)
+class Rollup:
+    name: str
+    dimensions: tuple
+
+    @property
+    def time_dimension(self):
+        return "day" if "day" in self.dimensions else "month"
+
+
+# Smallest first: the router answers from the first eligible rollup
+ROLLUPS = [
+    Rollup("sales_monthly_region", ("month", "region", "category", "channel", "order_status")),
+    Rollup("sales_daily_category", ("day", "category", "channel", "order_status")),
+    Rollup(
+        "sales_daily_store_category",
+        ("day", "store_id", "region", "category", "channel", "order_status"),
+    ),
+]
+
+
+def _source_sql(dimensions, measures, where="TRUE"):
+    columns = [f"{DIMENSIONS[d]} AS {d}" for d in dimensions]
+    columns += [f"{MEASURES[m]} AS {m}" for m in measures]
+    return f"""
+        SELECT {", ".join(columns)}
+        FROM {FACT_TABLE} f
+        LEFT JOIN {PRODUCT_TABLE} p ON f.product_id = p.product_id
+        LEFT JOIN {STORE_TABLE} s ON f.store_id = s.store_id
+        WHERE {where}
+        GROUP BY ALL
+    """
+
+
+def _ensure_state(conn):
+    conn.execute(f"CREATE SCHEMA IF NOT EXISTS {ROLLUP_SCHEMA}")
+    # refreshed_at is the fact_watermark() a refresh brought the rollup up to
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ROLLUP_SCHEMA}.{STATE_TABLE} (
+            rollup_name VARCHAR, refreshed_at TIMESTAMP
+        )
+    """)
+
+
+def fact_watermark(conn):
+    """Latest loaded_at in marts.fact_sales, i.e. when dbt last rebuilt any of its days."""
+    return conn.execute(f"SELECT MAX(loaded_at) FROM {FACT_TABLE}").fetchone()[0]
+
+
+def rebuilt_days(conn, since=None):
+    """(first, last) day of marts.fact_sales rows that dbt rebuilt after the watermark `since`.
+
+    Keyed on the fact table rather than the raw load manifest, so days loaded
+    into raw but not yet transformed by dbt wait for the next build. Returns
+    None when nothing was rebuilt since then.
+    """
+    first, last = conn.execute(f"""
+        SELECT MIN({DIMENSIONS['day']}), MAX({DIMENSIONS['day']}) FROM {FACT_TABLE} f
+        WHERE CAST(? AS TIMESTAMP) IS NULL OR f.loaded_at > ?
+    """, [since, since]).fetchone()
+    return (first, last) if first is not None else None
+
+
+def refresh_rollup(conn, rollup, start=None, end=None):
+    """Rebuild one rollup, or only its rows for days start..end when both are given."""
+    measures = list(MEASURES)
+    target = f"{ROLLUP_SCHEMA}.{rollup.name}"
+    if start is None or not table_exists(conn, ROLLUP_SCHEMA, rollup.name):
+        conn.execute(f"""
+            CREATE OR REPLACE TABLE {target} AS
+            {_source_sql(rollup.dimensions, measures)}
+            ORDER BY {rollup.time_dimension}
+        """)
+        return
+    if rollup.time_dimension == "month":
+        # Month rows are rebuilt whole, so widen the window to month boundaries
+        start = start.replace(day=1)
+        end = (end.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    column = rollup.time_dimension
+    conn.execute(f"DELETE FROM {target} WHERE {column} BETWEEN ? AND ?", [start, end])
+    conn.execute(f"""
+        INSERT INTO {target} BY NAME
+        {_source_sql(rollup.dimensions, measures,
+                     f"{DIMENSIONS['day']} BETWEEN ? AND ?")}
+        ORDER BY {column}
+    """, [start, end])
+
+
+def refresh_rollups(db_path=None, start=None, end=None, full_refresh=False):
+    """Refresh every rollup for the days dbt rebuilt in marts.fact_sales since its last refresh.
+
+    Run after `dbt build`; pass start/end to refresh an explicit day range.
+    Rollups that do not exist yet, or full_refresh=True, are rebuilt from the
+    whole fact table. Returns {rollup name: (start, end) refreshed, or None
+    for a full rebuild}.
+    """
+    refreshed = {}
+    with db_connection(db_path) as conn:
+        _ensure_state(conn)
+        last = dict(conn.execute(
+            f"SELECT rollup_name, MAX(refreshed_at) FROM {ROLLUP_SCHEMA}.{STATE_TABLE} GROUP BY 1"
+        ).fetchall())
+        # Taken first: days dbt rebuilds while we run count as new next time
+        watermark = fact_watermark(conn)
+        for rollup in ROLLUPS:
+            window = (start, end) if start is not None else None
+            if window is None and not full_refresh and rollup.name in last:
+                window = rebuilt_days(conn, since=last[rollup.name])
+                if window is None:
+                    continue
+            if full_refresh or rollup.name not in last:
+                window = None
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                refresh_rollup(conn, rollup, *(window or (None, None)))
+                conn.execute(
+                    f"INSERT INTO {ROLLUP_SCHEMA}.{STATE_TABLE} VALUES (?, ?)", [rollup.name, watermark]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            refreshed[rollup.name] = window
+    invalidate_cache()
+    return refreshed
+
+
+def _month_aligned(start, end):
+    return (start is None or start.day == 1) and (
+        end is None or (end + timedelta(days=1)).day == 1
+    )
+
+
+def route(measures, group_by=(), filters=None, start=None, end=None):
+    """Smallest rollup that answers the query exactly, or None to scan the fact table."""
+    filters = filters or {}
+    needed = set(group_by) | set(filters)
+    for rollup in ROLLUPS:
+        available = set(rollup.dimensions)
+        if "day" in available:
+            available.add("month")  # derived as date_trunc('month', day)
+        if not needed <= available:
+            continue
+        if rollup.time_dimension == "month" and not _month_aligned(start, end):
+            continue
+        if "order_count" in measures:
+            fixed = set(group_by) | {
+                d for d, v in filters.items() if not isinstance(v, (list, tuple, set))
+            }
+            fixed |= {d for d, key in FUNCTIONAL_DEPENDENCIES.items() if key in fixed}
+            summed = set(rollup.dimensions) - fixed - ORDER_DISJOINT_DIMENSIONS
+            if summed:
+                continue
+        return rollup
+    return None
+
+
+def build_query(measures, group_by=(), filters=None, start=None, end=None, rollup=None):
+    """SQL and parameters for an aggregate, over `rollup` or (when None) the fact table."""
+    filters = filters or {}
+    if rollup is None:
+        columns = {d: DIMENSIONS[d] for d in DIMENSIONS}
+        time_column = DIMENSIONS["day"]
+        aggregates = [f"{MEASURES[m]} AS {m}" for m in measures]
+        source = f"""{FACT_TABLE} f
+            LEFT JOIN {PRODUCT_TABLE} p ON f.product_id = p.product_id
+            LEFT JOIN {STORE_TABLE} s ON f.store_id = s.store_id"""
+    else:
+        columns = {d: d for d in rollup.dimensions}
+        if "day" in columns:
+            columns["month"] = "CAST(date_trunc('month', day) AS DATE)"
+        time_column = rollup.time_dimension
+        aggregates = [f"SUM({m}) AS {m}" for m in measures]
+        source = f"{ROLLUP_SCHEMA}.{rollup.name}"
+
+    where, params = [], []
+    for dimension, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            value = list(value)
+            where.append(f"{columns[dimension]} IN ({', '.join('?' * len(value))})")
+            params.extend(value)
+        else:
+            where.append(f"{columns[dimension]} = ?")
+            params.append(value)
+    if start is not None:
+        where.append(f"{time_column} >= ?")
+        params.append(start)
+    if end is not None:
+        where.append(f"{time_column} <= ?")
+        params.append(end)
+
+    select = [f"{columns[d]} AS {d}" for d in group_by] + aggregates
+    sql = f"SELECT {', '.join(select)} FROM {source}"
+    if where:
+        sql += f" WHERE {' AND '.join(where)}"
+    if group_by:
+        positions = ", ".join(str(i + 1) for i in range(len(group_by)))
+        sql += f" GROUP BY {positions} ORDER BY {positions}"
+    return sql, params
+
+
+def query_sales(measures, group_by=(), filters=None, start=None, end=None, db_path=None,
+                use_rollups=True, cache=False):
+    """Aggregate sales by `group_by`, answered from the smallest eligible rollup.
+
+    `measures` are names from MEASURES; `group_by` and `filters` keys are names
+    from DIMENSIONS (a filter value may be a list for IN). start/end bound the
+    day, inclusive. Returns a pyarrow.Table.
+    """
+    unknown = (set(measures) - set(MEASURES)) | ((set(group_by) | set(filters or {})) - set(DIMENSIONS))
+    if unknown:
+        raise ValueError(f"Unknown measures or dimensions: {sorted(unknown)}")
+    rollup = route(measures, group_by, filters, start, end) if use_rollups else None
+    sql, params = build_query(measures, group_by, filters, start, end, rollup)
+    return execute_query(sql, params, db_path=db_path, cache=cache)
+
+
+if __name__ == "__main__":
+    for name, window in refresh_rollups(full_refresh="--full-refresh" in sys.argv).items():
+        print(f"  ✓ {ROLLUP_SCHEMA}.{name}: {'all days' if window is None else window}")
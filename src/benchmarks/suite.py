@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Scale-factor benchmarks for data generation, warehouse load and dbt models.
+
+Usage:
+    python src/benchmarks/suite.py run --scale-factors 0.1 1 10
+    python src/benchmarks/suite.py compare --threshold 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from multiprocessing import get_context
+from pathlib import Path
+
+import pandas as pd
+
+# Allow running as a script from the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.ingestion import generate_data
+from src.ingestion.dataset_cache import cached_dataset, materialize
+
+REPO_DIR = Path(__file__).resolve().parent.parent.parent
+DBT_DIR = REPO_DIR / "dbt"
+HISTORY_PATH = os.getenv("BENCHMARK_HISTORY", "data/benchmarks/history.json")
+START_DATE = date(2024, 1, 1)
+BASE_DAYS = 7
+THRESHOLD = 0.2
+REPEATS = 3
+# Stages faster than this in the baseline are timer noise, not a signal
+MIN_SECONDS = 0.1
+
+# Metrics where a larger value is a regression; everything else is a rate
+LOWER_IS_BETTER = ("seconds", "peak_rss_mb")
+
+GENERATE_STAGES = [
+    "generate_products", "generate_stores", "generate_customers",
+    "generate_transactions", "generate_inventory", "generate_page_views",
+]
+STAGES = GENERATE_STAGES + ["initialize_warehouse", "dbt_models"]
+# Stages that read the dimensions written by write_dimensions
+FACT_STAGES = ["generate_transactions", "generate_inventory", "generate_page_views"]
+
+
+def scale(scale_factor):
+    """Generator sizes at a scale factor: SF 1 is the default dimensions and BASE_DAYS days.
+
+    Customers and days grow linearly with the scale factor, so every fact
+    table grows linearly too; products and stores stay fixed, as
+    PRODUCTS_PER_STORE bounds the inventory assortment.
+    """
+    return {
+        "products": generate_data.NUM_PRODUCTS,
+        "stores": generate_data.NUM_STORES,
+        "customers": max(1, round(generate_data.NUM_CUSTOMERS * scale_factor)),
+        "days": max(1, round(BASE_DAYS * scale_factor)),
+    }
+
+
+def write_dimensions(sizes, workdir):
+    """Write the dimensions the fact-table stages read to <workdir>/dimensions (not timed)."""
+    output = Path(workdir) / "dimensions"
+    output.mkdir(parents=True, exist_ok=True)
+    for name, generate in generate_data.DIMENSION_TABLES.items():
+        generate_data.write_dimension(generate(sizes[name], fast=True), output, name, csv=False)
+
+
+def _dimensions(workdir):
+    return tuple(
+        pd.read_parquet(Path(workdir) / "dimensions" / f"{name}.parquet")
+        for name in generate_data.DIMENSION_TABLES
+    )
+
+
+def _prepare_stage(stage, sizes, workdir):
+    """Build a stage's inputs and return a callable that runs it and returns rows processed."""
+    if stage in ("generate_products", "generate_stores", "generate_customers"):
+        name = stage.split("_")[1]
+        generate = getattr(generate_data, stage)
+        return lambda: len(generate(sizes[name], fast=True))
+    products, stores, customers = _dimensions(workdir)
+    if stage == "generate_transactions":
+        return lambda: len(generate_data.generate_transactions(
+            products, stores, customers, sizes["days"], START_DATE))
+    if stage == "generate_inventory":
+        return lambda: len(generate_data.generate_inventory(
+            products, stores, sizes["days"], START_DATE))
+    if stage == "generate_page_views":
+        return lambda: len(generate_data.generate_page_views(
+            products, customers, sizes["days"], START_DATE))
+    if stage == "initialize_warehouse":
+        from src.utils.database import initialize_warehouse
+        data_dir = Path(workdir) / "data"
+        db_path = str(Path(workdir) / "warehouse.duckdb")
+        return lambda: sum(initialize_warehouse(data_dir, db_path).values())
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def peak_rss_mb():
+    """High-water RSS of this process in MB.
+
+    Prefers VmHWM, which starts over at exec (and at reset_peak_rss); Linux
+    carries ru_maxrss over from the parent into a spawned child.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def reset_peak_rss():
+    """Restart VmHWM from the current RSS where Linux allows it; returns the new baseline in MB."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def measure_stage(stage, sizes, workdir, repeats=REPEATS):
+    """Time one stage in this process: best-of-`repeats` seconds, rows, rows/sec and peak RSS.
+
+    Peak RSS is the growth over the baseline sampled once the stage's inputs
+    are loaded, so it covers the stage alone. Run it in a fresh process (see
+    run_benchmarks) all the same, as without a VmHWM reset the baseline is
+    the high-water mark of the whole process.
+    """
+    run = _prepare_stage(stage, sizes, workdir)
+    baseline = reset_peak_rss()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        rows = run()
+        timings.append(time.perf_counter() - start)
+    seconds = min(timings)
+    return {
+        "seconds": seconds,
+        "rows": rows,
+        "rows_per_sec": rows / seconds if seconds else 0.0,
+        "peak_rss_mb": peak_rss_mb() - baseline,
+    }
+
+
+def write_sample(sizes, data_dir):
+    """Write the Parquet inputs initialize_warehouse loads (not timed), from the dataset cache."""
+    entry = cached_dataset(
+        sizes["days"], START_DATE, fast_dims=True, products=sizes["products"],
+        stores=sizes["stores"], customers=sizes["customers"],
+    )
+    materialize(entry, data_dir)
+
+
+def run_dbt_models(db_path, target_dir):
+    """Run the staging and mart models against `db_path`; None when dbt is not installed.
+
+    Returns {"dbt_models": {"seconds": wall time of the run}} plus
+    {"dbt_models.<model>": {"seconds": ...}} from dbt's run_results.json.
+    """
+    dbt = shutil.which("dbt")
+    if dbt is None:
+        return None
+    env = dict(os.environ, DBT_DUCKDB_PATH=str(Path(db_path).resolve()))
+    start = time.perf_counter()
+    subprocess.run(
+        [dbt, "run", "--project-dir", str(DBT_DIR), "--profiles-dir", str(DBT_DIR),
+         "--target-path", str(target_dir), "--select", "staging", "marts"],
+        env=env, check=True, capture_output=True,
+    )
+    stages = {"dbt_models": {"seconds": time.perf_counter() - start}}
+    with open(Path(target_dir) / "run_results.json") as f:
+        for result in json.load(f)["results"]:
+            model = result["unique_id"].rsplit(".", 1)[-1]
+            stages[f"dbt_models.{model}"] = {"seconds": result["execution_time"]}
+    return stages
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(scale_factors, stages=STAGES):
+    """Measure every stage at each scale factor; returns one history entry.
+
+    Each generate/load stage runs in its own spawned process so its peak RSS
+    is not inflated by earlier stages; fact-table stages read dimensions
+    written beforehand. Metrics are keyed
+    "sf<scale>/<stage>/<metric>".
+    """
+    metrics = {}
+    context = get_context("spawn")
+    for scale_factor in scale_factors:
+        sizes = scale(scale_factor)
+        workdir = tempfile.mkdtemp(prefix="benchmark-")
+        try:
+            if "initialize_warehouse" in stages or "dbt_models" in stages:
+                write_sample(sizes, Path(workdir) / "data")
+            if set(stages) & set(FACT_STAGES):
+                write_dimensions(sizes, workdir)
+            for stage in stages:
+                if stage == "dbt_models":
+                    if "initialize_warehouse" not in stages:
+                        raise ValueError("dbt_models needs initialize_warehouse to build the warehouse")
+                    results = run_dbt_models(Path(workdir) / "warehouse.duckdb", Path(workdir) / "dbt")
+                    if results is None:
+                        print(f"  - sf{scale_factor:g} dbt_models: skipped (dbt not installed)")
+                        continue
+                else:
+                    with ProcessPoolExecutor(1, mp_context=context) as pool:
+                        results = {stage: pool.submit(measure_stage, stage, sizes, workdir).result()}
+                for name, result in results.items():
+                    for metric, value in result.items():
+                        metrics[f"sf{scale_factor:g}/{name}/{metric}"] = value
+                print(f"  ✓ sf{scale_factor:g} {stage}: {results[stage]['seconds']:.2f}s")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "scale_factors": list(scale_factors),
+        "metrics": metrics,
+    }
+
+
+def load_history(path=HISTORY_PATH):
+    """Benchmark runs recorded so far, oldest first."""
+    if not Path(path).exists():
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def append_history(entry, path=HISTORY_PATH):
+    """Add a run to the JSON history file."""
+    history = load_history(path) + [entry]
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(history, f, indent=2)
+    return history
+
+
+def compare_runs(baseline, current, threshold=THRESHOLD):
+    """Regressions of `current` against `baseline` beyond `threshold` (0.2 = 20%).
+
+    Returns [(metric, baseline value, current value, relative change)], where
+    a positive change is always worse. Only metrics in both runs are compared;
+    rows counts are skipped since they describe the input, not performance,
+    and so are stages that took under MIN_SECONDS in the baseline.
+    """
+    regressions = []
+    for name, before in baseline["metrics"].items():
+        after = current["metrics"].get(name)
+        stage, metric = name.rsplit("/", 1)
+        if after is None or metric == "rows" or not before:
+            continue
+        if baseline["metrics"].get(f"{stage}/seconds", 0) < MIN_SECONDS:
+            continue
+        change = (after - before) / before
+        if metric not in LOWER_IS_BETTER:
+            change = -change
+        if change > threshold:
+            regressions.append((name, before, after, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--history", default=HISTORY_PATH, help="JSON history file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Run the benchmarks and append them to the history")
+    run.add_argument("--scale-factors", type=float, nargs="+", default=[1.0])
+    run.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    compare = commands.add_parser("compare", help="Exit 1 if the latest run regressed")
+    compare.add_argument("--threshold", type=float, default=THRESHOLD,
+                         help="Allowed relative slowdown, e.g. 0.2 for 20%%")
+    compare.add_argument("--baseline", type=int, default=-2,
+                         help="History index of the run to compare against (default: previous)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        append_history(run_benchmarks(args.scale_factors, args.stages), args.history)
+        return
+
+    history = load_history(args.history)
+    if len(history) < 2:
+        print("Need at least two runs in the history to compare")
+        return
+    baseline, current = history[args.baseline], history[-1]
+    regressions = compare_runs(baseline, current, args.threshold)
+    print(f"Comparing {current['commit']} against {baseline['commit']} ({baseline['timestamp']})")
+    for name, before, after, change in regressions:
+        print(f"  ✗ {name}: {before:,.2f} → {after:,.2f} ({change:+.0%} worse)")
+    if regressions:
+        sys.exit(1)
+    print("  ✓ no regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of generated datasets, so reruns skip regeneration.
+
+Usage:
+    python src/ingestion/dataset_cache.py generate --days 30 --output data/sample
+    python src/ingestion/dataset_cache.py generate --days 7 --start-date 2024-01-01 --fast-dims
+    python src/ingestion/dataset_cache.py stats
+    python src/ingestion/dataset_cache.py clear
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import fcntl
+import hashlib
+import argparse
+import threading
+import importlib.metadata
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import date, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+import pyarrow.parquet as pq
+from faker import Faker
+
+# Allow running as a script from the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.ingestion import generate_data as gen
+from src.models import schemas
+from src.utils.instrumentation import span, write_prometheus
+
+CACHE_DIR = os.getenv("DATASET_CACHE_DIR", "data/cache/datasets")
+CACHE_BYTES = int(os.getenv("DATASET_CACHE_BYTES", 8 * 1024 ** 3))
+# Bump when the cache layout or the key fields change
+CACHE_FORMAT = 1
+# Modules whose source determines generated output, and libraries whose versions do
+VERSIONED_MODULES = (gen, schemas)
+VERSIONED_PACKAGES = ("numpy", "pandas", "pyarrow", "faker")
+MANIFEST = "manifest.json"
+LOCK_FILE = ".lock"
+HASH_CHUNK = 1024 ** 2
+
+
+@lru_cache(maxsize=None)
+def generator_version():
+    """Hash of the generator's source and of the library versions that shape its output."""
+    digest = hashlib.sha256(f"format {CACHE_FORMAT}\n".encode())
+    for module in VERSIONED_MODULES:
+        digest.update(Path(module.__file__).read_bytes())
+    for package in VERSIONED_PACKAGES:
+        digest.update(f"{package} {importlib.metadata.version(package)}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def dataset_params(days=30, start_date=None, fast_dims=False, compact=False, clickstream_scale=1.0,
+                   products=None, stores=None, customers=None, workers=1):
+    """Everything that determines a generated dataset, as a JSON-ready dict.
+
+    Sizes default to the generator's NUM_* constants and the start date to
+    `days` before today, as in generate_data.py. Dimension timestamps such
+    as updated_at are relative to the time of generation and are not part
+    of the key; pass a fixed `start_date` to share entries across days.
+    `workers` is part of the key because it sets the file layout
+    (<table>.parquet, or <table>/part-*.parquet with one part per shard).
+    """
+    start_date = start_date or date.today() - timedelta(days=days)
+    return {
+        "days": days,
+        "start_date": start_date.isoformat(),
+        "fast_dims": bool(fast_dims),
+        "compact": bool(compact),
+        "clickstream_scale": float(clickstream_scale),
+        "products": products or gen.NUM_PRODUCTS,
+        "stores": stores or gen.NUM_STORES,
+        "customers": customers or gen.NUM_CUSTOMERS,
+        "workers": max(1, workers),
+        "transactions_per_day": gen.TRANSACTIONS_PER_DAY,
+        "vocab_size": gen.VOCAB_SIZE,
+        "seed": gen.SEED,
+        "generator_version": generator_version(),
+    }
+
+
+def dataset_key(params):
+    """Cache key of a dataset_params() dict."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def file_digest(path):
+    """sha256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _generate(params, output, batch_size=gen.BATCH_SIZE):
+    """Write the Parquet files (no CSV) of a dataset_params() dataset to `output`."""
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    # Faker dimensions draw from the global random state; seed it as a fresh run would
+    random.seed(gen.SEED)
+    Faker.seed(gen.SEED)
+    dimensions = []
+    for name, generate in gen.DIMENSION_TABLES.items():
+        frame = generate(params[name], fast=params["fast_dims"])
+        gen.write_dimension(frame, output, name, params["compact"], csv=False)
+        dimensions.append(frame)
+
+    workers = params["workers"]
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(workers, initializer=gen._init_worker, initargs=tuple(dimensions))
+    try:
+        for name in gen.FACT_TABLES:
+            gen.write_fact_table(
+                name, *dimensions, params["days"], output, date.fromisoformat(params["start_date"]),
+                workers, batch_size, executor, params["clickstream_scale"], params["compact"], csv=False,
+            )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+class DatasetCache:
+    """Generated datasets stored by key, with identical Parquet files stored once.
+
+    Each distinct file lives at <root>/blobs/ab/<sha256>.parquet. An entry,
+    <root>/entries/<key>/, mirrors the generator's output layout with hard
+    links to those blobs plus a manifest.json of its parameters, so it can
+    be passed straight to initialize_warehouse(). Entries are evicted least
+    recently used first once the blobs exceed `max_bytes`. Entry
+    directories are shared: read them, or copy them out with materialize().
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._stats = dict(hits=0, misses=0, evictions=0)
+
+    def path(self, key):
+        return self.root / "entries" / key
+
+    def get(self, key):
+        """Entry directory for `key`, marked as recently used, or None on a miss."""
+        try:
+            self._touch(self.path(key) / MANIFEST)
+        except FileNotFoundError:
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        return self.path(key)
+
+    @staticmethod
+    def _touch(manifest):
+        # Explicit nanoseconds: the filesystem's own clock is too coarse to order quick successive uses
+        now = time.time_ns()
+        os.utime(manifest, ns=(now, now))
+
+    def staging(self, key):
+        """Empty scratch directory on the cache's filesystem for building entry `key`."""
+        path = self.root / "tmp" / f"{key}-{os.getpid()}"
+        shutil.rmtree(path, ignore_errors=True)
+        path.mkdir(parents=True)
+        return path
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock across processes, held while entries and blobs are linked or removed."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / LOCK_FILE, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def put(self, key, source, params=None):
+        """Store the Parquet files under `source` as entry `key`, evict, and return the entry directory.
+
+        Files in a staging() directory are moved into the cache; others are
+        copied. The entry is built beside the cache and renamed into place,
+        so readers never see a partial entry; if another process stored the
+        same key first, its entry is kept.
+        """
+        source = Path(source)
+        # Hash and stage the blobs before taking the lock; only the renames happen under it
+        staged = []
+        for path in sorted(source.rglob("*.parquet")):
+            digest = file_digest(path)
+            staged.append((path.relative_to(source).as_posix(), digest, self._stage_blob(path, digest)))
+
+        building = self.staging(f"{key}.entry")
+        files = {}
+        with self._locked():
+            for relative, digest, partial in staged:
+                blob = self._blob(digest)
+                if blob.exists():
+                    partial.unlink()
+                else:
+                    os.replace(partial, blob)
+                target = building / relative
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.link(blob, target)
+                files[relative] = {
+                    "sha256": digest,
+                    "bytes": blob.stat().st_size,
+                    "rows": pq.read_metadata(blob).num_rows,
+                }
+            with open(building / MANIFEST, "w") as f:
+                json.dump({"key": key, "params": params, "files": files, "created_at": time.time()}, f,
+                          indent=2)
+            self._touch(building / MANIFEST)
+
+            self.path(key).parent.mkdir(parents=True, exist_ok=True)
+            try:
+                building.rename(self.path(key))
+            except OSError:
+                shutil.rmtree(building, ignore_errors=True)
+                self._collect()
+            self._evict(keep=key)
+        return self.path(key)
+
+    def _blob(self, digest):
+        return self.root / "blobs" / digest[:2] / f"{digest}.parquet"
+
+    def _stage_blob(self, path, digest):
+        """Move (from staging) or copy `path` next to its blob under a name collection ignores."""
+        blob = self._blob(digest)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        partial = blob.with_name(f".{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+        if (self.root / "tmp") in Path(path).resolve().parents:
+            os.replace(path, partial)
+        else:
+            shutil.copyfile(path, partial)
+        return partial
+
+    def entries(self):
+        """Entry directories, least recently used first."""
+        manifests = []
+        for manifest in self.root.glob(f"entries/*/{MANIFEST}"):
+            try:
+                manifests.append((manifest.stat().st_mtime_ns, manifest.parent))
+            except FileNotFoundError:
+                continue
+        return [entry for _, entry in sorted(manifests)]
+
+    def total_bytes(self):
+        """Bytes held by blobs, each distinct file counted once."""
+        return sum(blob.stat().st_size for blob in self.root.glob("blobs/*/*.parquet"))
+
+    def evict(self, keep=None):
+        """Drop least recently used entries (other than `keep`) until the cache fits in max_bytes."""
+        with self._locked():
+            self._evict(keep)
+
+    def _evict(self, keep=None):
+        total = self.total_bytes()
+        for entry in self.entries():
+            if total <= self.max_bytes:
+                break
+            if entry.name == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            self._collect()
+            self._stats["evictions"] += 1
+            total = self.total_bytes()
+
+    def remove(self, key):
+        """Delete entry `key` and any blobs no other entry links to."""
+        with self._locked():
+            shutil.rmtree(self.path(key), ignore_errors=True)
+            self._collect()
+
+    def _collect(self):
+        # Callers hold the lock, so no put() is between storing a blob and linking it
+        for blob in self.root.glob("blobs/*/*.parquet"):
+            # One link left: only the blob store references this file
+            if blob.stat().st_nlink == 1:
+                blob.unlink(missing_ok=True)
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def stats(self):
+        """Hit/miss counters of this instance plus the cache's current entries and size."""
+        return dict(self._stats, entries=len(self.entries()), bytes=self.total_bytes(),
+                    max_bytes=self.max_bytes)
+
+
+def cached_dataset(days=30, start_date=None, fast_dims=False, compact=False, clickstream_scale=1.0,
+                   products=None, stores=None, customers=None, cache=None, batch_size=gen.BATCH_SIZE,
+                   workers=1):
+    """Directory with the Parquet dataset for these parameters, generated and cached on a miss.
+
+    The layout matches generate_data.py's output without the CSV files
+    (<table>.parquet, or <table>/part-*.parquet with workers > 1), so it
+    can be passed to initialize_warehouse(data_dir=...) as is. Concurrent
+    misses on the same key both generate; the first to finish is kept.
+    """
+    cache = cache or DatasetCache()
+    params = dataset_params(days, start_date, fast_dims, compact, clickstream_scale,
+                            products, stores, customers, workers)
+    key = dataset_key(params)
+    with span("cached_dataset", key=key[:12]) as s:
+        entry = cache.get(key)
+        s.labels["cache"] = "miss" if entry is None else "hit"
+        if entry is None:
+            staging = cache.staging(key)
+            try:
+                _generate(params, staging, batch_size)
+                entry = cache.put(key, staging, params)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+        with open(entry / MANIFEST) as f:
+            files = json.load(f)["files"].values()
+        s.rows = sum(f["rows"] for f in files)
+        s.bytes = sum(f["bytes"] for f in files)
+    return entry
+
+
+def load_dataset(*args, tables=None, **kwargs):
+    """cached_dataset() as {table: Arrow table}, memory-mapped from the cache rather than copied."""
+    entry = cached_dataset(*args, **kwargs)
+    names = tables or [*gen.DIMENSION_TABLES, *gen.FACT_TABLES]
+    return {
+        name: pq.read_table(entry / name if (entry / name).is_dir() else entry / f"{name}.parquet",
+                            memory_map=True)
+        for name in names
+    }
+
+
+def materialize(entry, output):
+    """Copy a cached entry's files to `output`, replacing each table's previous files there."""
+    entry, output = Path(entry), Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    for item in sorted(entry.iterdir()):
+        if item.name == MANIFEST:
+            continue
+        name = item.name.removesuffix(".parquet")
+        # A table is either <name>.parquet or a <name>/ directory of parts; stale CSVs would disagree
+        shutil.rmtree(output / name, ignore_errors=True)
+        for stale in (f"{name}.parquet", f"{name}.csv"):
+            (output / stale).unlink(missing_ok=True)
+        if item.is_dir():
+            shutil.copytree(item, output / name)
+        else:
+            shutil.copyfile(item, output / item.name)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate = commands.add_parser("generate", help="Write a dataset to --output, from the cache if present")
+    generate.add_argument("--days", type=int, default=30)
+    generate.add_argument("--start-date", type=date.fromisoformat,
+                          help="First day (default: --days before today)")
+    generate.add_argument("--output", type=str, default="data/sample")
+    generate.add_argument("--fast-dims", action="store_true")
+    generate.add_argument("--compact", action="store_true")
+    generate.add_argument("--clickstream-scale", type=float, default=1.0)
+    generate.add_argument("--workers", type=int, default=1)
+    generate.add_argument("--batch-size", type=int, default=gen.BATCH_SIZE)
+    commands.add_parser("stats", help="Show cached entries and size")
+    commands.add_parser("clear", help="Delete the whole cache")
+    args = parser.parse_args()
+
+    cache = DatasetCache()
+    if args.command == "stats":
+        for entry in cache.entries():
+            with open(entry / MANIFEST) as f:
+                manifest = json.load(f)
+            params = manifest["params"] or {}
+            print(f"  {entry.name[:12]}  {params.get('days')} days from {params.get('start_date')}, "
+                  f"{sum(f['bytes'] for f in manifest['files'].values()) / 1024 ** 2:,.1f} MB")
+        stats = cache.stats()
+        print(f"{stats['entries']} entries, {stats['bytes'] / 1024 ** 2:,.1f} MB "
+              f"of {stats['max_bytes'] / 1024 ** 2:,.0f} MB")
+        return
+    if args.command == "clear":
+        cache.clear()
+        print(f"✓ Cleared {cache.root}")
+        return
+
+    start = time.perf_counter()
+    with span("generate_data"):
+        entry = cached_dataset(
+            args.days, args.start_date, args.fast_dims, args.compact, args.clickstream_scale,
+            cache=cache, batch_size=args.batch_size, workers=args.workers,
+        )
+        materialize(entry, args.output)
+    source = "cache hit" if cache.stats()["hits"] else "generated and cached"
+    print(f"✓ {Path(args.output).absolute()} ({source}, {time.perf_counter() - start:.1f}s)")
+    write_prometheus()
+
+
+if __name__ == "__main__":
+    main()
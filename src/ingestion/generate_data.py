@@ -5,29 +5,61 @@ Generate realistic e-commerce data for the Home Depot Data Platform.
 Usage:
     python src/ingestion/generate_data.py
     python src/ingestion/generate_data.py --days 90 --output data/sample
+    python src/ingestion/generate_data.py --to-warehouse [--persist]
 """
 
 import os
+import sys
+import json
+import queue
 import random
-import uuid
+import shutil
+import zlib
 import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, date
 from pathlib import Path
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from faker import Faker
 
+# Allow running as a script from the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.models.schemas import CATEGORICAL_COLUMNS, SURROGATE_KEYS, table_schema, validate_batch
+from src.utils.database import db_connection, load_arrow_to_table
+from src.utils.instrumentation import Span, span, write_prometheus
+
+SEED = 42
+
 fake = Faker()
-Faker.seed(42)
-random.seed(42)
-np.random.seed(42)
+Faker.seed(SEED)
+random.seed(SEED)
+np.random.seed(SEED)
 
 # Configuration
 NUM_PRODUCTS = 500
 NUM_STORES = 50
 NUM_CUSTOMERS = 10000
 TRANSACTIONS_PER_DAY = 5000
+BATCH_SIZE = 100_000
+PRODUCTS_PER_STORE = 200
+INVENTORY_STORE_BLOCK = 8  # stores per inventory random stream; the unit of inventory sharding
+FRAME_ROWS = 1_000_000  # target rows per in-memory chunk produced by the generators
+ANONYMOUS_VISITORS = 5000
+
+# Day-partitioned extracts number orders and replay the inventory walk from
+# this date, so a dt= partition has the same rows however it was produced
+PARTITION_EPOCH = date(2024, 1, 1)
+
+# Faker values sampled once and reused by the fast dimension generators
+VOCAB_PATH = os.getenv("FAKER_VOCAB_PATH", "data/faker_vocabulary.json")
+VOCAB_SIZE = 5000
 
 # Categories and brands (Home Depot style)
 CATEGORIES = {
@@ -56,9 +88,34 @@ REGIONS = {
     "West": ["CA", "WA", "OR"],
 }
 
+BRAND_NAMES = sorted({brand for brands in BRANDS.values() for brand in brands})
+
+# Clickstream distributions
+SESSIONS_PER_DAY = (3000, 7000)
+EVENTS_PER_SESSION = (3, 15)
+EVENT_TYPES = (["page_view", "add_to_cart", "purchase", "search"], [70, 15, 5, 10])
+DEVICE_TYPES = ["desktop", "mobile", "tablet"]
+BROWSERS = ["Chrome", "Safari", "Firefox", "Edge"]
+REFERRERS = [None, "https://google.com", "direct"]
 
-def generate_products(n=NUM_PRODUCTS):
+# Transaction distributions
+ITEMS_PER_ORDER = ([1, 2, 3, 4, 5], [40, 30, 15, 10, 5])
+QUANTITIES = ([1, 2, 3, 5, 10], [60, 25, 10, 4, 1])
+DISCOUNT_RATES = [0, 0.05, 0.1, 0.15]
+CHANNELS = (["online", "in_store", "app"], [35, 55, 10])
+ORDER_STATUSES = (
+    ["pending", "confirmed", "shipped", "delivered", "cancelled", "returned"],
+    [5, 10, 15, 60, 5, 5],
+)
+SHIP_FULFILLMENT_TYPES = ["ship_to_home", "bopis"]
+
+_ID_DIGITS = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+
+
+def generate_products(n=NUM_PRODUCTS, fast=False):
     """Generate product master data."""
+    if fast:
+        return _generate_products_fast(n)
     products = []
     for i in range(n):
         category = random.choice(list(CATEGORIES.keys()))
@@ -83,8 +140,10 @@ def generate_products(n=NUM_PRODUCTS):
     return pd.DataFrame(products)
 
 
-def generate_stores(n=NUM_STORES):
+def generate_stores(n=NUM_STORES, fast=False):
     """Generate store data."""
+    if fast:
+        return _generate_stores_fast(n)
     stores = []
     for i in range(n):
         region = random.choice(list(REGIONS.keys()))
@@ -112,8 +171,10 @@ def generate_stores(n=NUM_STORES):
     return pd.DataFrame(stores)
 
 
-def generate_customers(n=NUM_CUSTOMERS):
+def generate_customers(n=NUM_CUSTOMERS, fast=False):
     """Generate customer data."""
+    if fast:
+        return _generate_customers_fast(n)
     customers = []
     tiers = ["bronze"] * 50 + ["silver"] * 30 + ["gold"] * 15 + ["pro_xtra"] * 5
     
@@ -137,200 +198,1111 @@ def generate_customers(n=NUM_CUSTOMERS):
     return pd.DataFrame(customers)
 
 
-def generate_transactions(products_df, stores_df, customers_df, days=30):
+def _build_vocabulary(size):
+    """Sample pools of Faker values from a dedicated, seeded Faker instance."""
+    faker = Faker()
+    faker.seed_instance(SEED)
+    return {
+        "first_names": [faker.first_name() for _ in range(size)],
+        "last_names": [faker.last_name() for _ in range(size)],
+        "cities": [faker.city() for _ in range(size)],
+        "zip_codes": [faker.zipcode() for _ in range(size)],
+        "street_addresses": [faker.street_address() for _ in range(size)],
+        "words": [faker.word().title() for _ in range(size)],
+        "email_domains": sorted({faker.free_email_domain() for _ in range(100)}),
+    }
+
+
+def load_vocabulary(path=None, size=None):
+    """Load the cached Faker vocabulary, building and saving it on first use."""
+    path = Path(path or VOCAB_PATH)
+    size = size or VOCAB_SIZE
+    if path.exists():
+        with open(path) as f:
+            vocab = json.load(f)
+        if len(vocab["first_names"]) == size:
+            return {k: np.asarray(v, dtype=object) for k, v in vocab.items()}
+    
+    vocab = _build_vocabulary(size)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(vocab, f)
+    return {k: np.asarray(v, dtype=object) for k, v in vocab.items()}
+
+
+def _stream_rng(stream):
+    """Random generator for a table that is not split by day."""
+    return np.random.default_rng([SEED, zlib.crc32(stream.encode())])
+
+
+def _region_states(rng, n):
+    """Draw a region uniformly, then a state uniformly within it."""
+    regions = list(REGIONS)
+    states = np.asarray([s for r in regions for s in REGIONS[r]], dtype=object)
+    sizes = np.asarray([len(REGIONS[r]) for r in regions])
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    
+    region = rng.integers(0, len(regions), size=n)
+    state = offsets[region] + (rng.random(n) * sizes[region]).astype(int)
+    return np.asarray(regions, dtype=object)[region], states[state]
+
+
+def _datetimes_between(rng, start, end, n):
+    """Uniform timestamps (second resolution) between two datetimes."""
+    seconds = rng.integers(0, int((end - start).total_seconds()), size=n)
+    return np.datetime64(start.replace(microsecond=0), "ns") + (seconds * 1_000_000_000).astype("timedelta64[ns]")
+
+
+def _generate_products_fast(n):
+    """Vectorized generate_products drawing names from the cached vocabulary."""
+    rng = _stream_rng("products")
+    vocab = load_vocabulary()
+    now = datetime.now()
+    
+    categories = list(CATEGORIES)
+    category = rng.integers(0, len(categories), size=n)
+    sub_sizes = np.asarray([len(CATEGORIES[c]) for c in categories])
+    brand_sizes = np.asarray([len(BRANDS[c]) for c in categories])
+    subcategories = np.asarray([s for c in categories for s in CATEGORIES[c]], dtype=object)
+    brands = np.asarray([b for c in categories for b in BRANDS[c]], dtype=object)
+    subcategory = subcategories[
+        np.concatenate([[0], np.cumsum(sub_sizes)[:-1]])[category]
+        + (rng.random(n) * sub_sizes[category]).astype(int)
+    ]
+    brand = brands[
+        np.concatenate([[0], np.cumsum(brand_sizes)[:-1]])[category]
+        + (rng.random(n) * brand_sizes[category]).astype(int)
+    ]
+    sku_prefixes = np.asarray([f"{c[:3].upper()}-" for c in categories], dtype=object)
+    base_price = rng.uniform(5, 2000, size=n)
+    words = vocab["words"][rng.integers(0, len(vocab["words"]), size=n)]
+    
+    return pd.DataFrame({
+        "product_id": _format_ids("PRD-", np.arange(1, n + 1), 6),
+        "sku": sku_prefixes[category] + _format_ids("", rng.integers(100000, 1000000, size=n), 6),
+        "product_name": brand + " " + subcategory + " " + words,
+        "category": np.asarray(categories, dtype=object)[category],
+        "subcategory": subcategory,
+        "brand": brand,
+        "unit_price": np.round(base_price, 2),
+        "unit_cost": np.round(base_price * rng.uniform(0.4, 0.7, size=n), 2),
+        "weight_lbs": np.round(rng.uniform(0.1, 200, size=n), 2),
+        "is_active": rng.random(n) > 0.05,
+        "created_at": _datetimes_between(rng, now - timedelta(days=3 * 365), now - timedelta(days=182), n),
+        "updated_at": _datetimes_between(rng, now - timedelta(days=182), now, n),
+    })
+
+
+def _generate_stores_fast(n):
+    """Vectorized generate_stores drawing places from the cached vocabulary."""
+    rng = _stream_rng("stores")
+    vocab = load_vocabulary()
+    today = date.today()
+    
+    region, state = _region_states(rng, n)
+    store_type = _weighted(rng, (["retail", "distribution_center", "fulfillment_center"], [80, 15, 5]), n)
+    opened = np.datetime64(today - timedelta(days=20 * 365)) + rng.integers(0, 19 * 365, size=n)
+    
+    def pool(name):
+        return vocab[name][rng.integers(0, len(vocab[name]), size=n)]
+    
+    return pd.DataFrame({
+        "store_id": _format_ids("STR-", np.arange(1, n + 1), 4),
+        "store_name": _format_ids("Store #", np.arange(1, n + 1), 4) + " - " + pool("cities"),
+        "store_type": np.asarray(["retail", "distribution_center", "fulfillment_center"], dtype=object)[store_type],
+        "address": pool("street_addresses"),
+        "city": pool("cities"),
+        "state": state,
+        "zip_code": pool("zip_codes"),
+        "region": region,
+        "latitude": np.round(rng.uniform(-90, 90, size=n), 6),
+        "longitude": np.round(rng.uniform(-180, 180, size=n), 6),
+        "opened_date": opened.astype(object),
+        "square_footage": rng.integers(80000, 150001, size=n),
+        "is_active": np.ones(n, dtype=bool),
+    })
+
+
+def _id_strings(prefix, values, width):
+    """Like _format_ids, but as an Arrow-backed pandas string array with no Python objects."""
+    chars = np.empty((len(values), len(prefix) + width), dtype=np.uint8)
+    chars[:, :len(prefix)] = np.frombuffer(prefix.encode(), dtype=np.uint8)
+    values = np.array(values, dtype=np.int64)
+    for col in range(chars.shape[1] - 1, len(prefix) - 1, -1):
+        values, digit = np.divmod(values, 10)
+        chars[:, col] = _ID_DIGITS[digit]
+    offsets = np.arange(0, chars.size + 1, chars.shape[1], dtype=np.int32)
+    array = pa.Array.from_buffers(
+        pa.string(), len(chars), [None, pa.py_buffer(offsets), pa.py_buffer(chars)]
+    )
+    return pd.arrays.ArrowStringArray(array)
+
+
+def _generate_customers_fast(n):
+    """Vectorized generate_customers drawing names and places from the cached vocabulary.
+    
+    Free-text columns come back as Arrow-backed strings, which keeps 10M+ rows
+    within a few GB instead of one Python object per cell.
+    """
+    rng = _stream_rng("customers")
+    vocab = load_vocabulary()
+    now = datetime.now()
+    
+    def pool(name):
+        return pa.array(vocab[name], pa.string()).take(rng.integers(0, len(vocab[name]), size=n))
+    
+    region, state = _region_states(rng, n)
+    first = rng.integers(0, len(vocab["first_names"]), size=n)
+    last = rng.integers(0, len(vocab["last_names"]), size=n)
+    first_names = pa.array(vocab["first_names"], pa.string())
+    last_names = pa.array(vocab["last_names"], pa.string())
+    email = pc.binary_join_element_wise(
+        pc.utf8_lower(first_names).take(first),
+        ".",
+        pc.utf8_lower(last_names).take(last),
+        pa.array([f"{i:02d}" for i in range(100)]).take(rng.integers(0, 100, size=n)),
+        "@",
+        pool("email_domains"),
+        "",
+    )
+    tiers = (["bronze", "silver", "gold", "pro_xtra"], [50, 30, 15, 5])
+    
+    return pd.DataFrame({
+        "customer_id": _id_strings("CUS-", np.arange(1, n + 1), 8),
+        "customer_type": np.where(rng.random(n) < 0.15, "pro", "consumer").astype(object),
+        "email": pd.arrays.ArrowStringArray(email),
+        "first_name": pd.arrays.ArrowStringArray(first_names.take(first)),
+        "last_name": pd.arrays.ArrowStringArray(last_names.take(last)),
+        "city": pd.arrays.ArrowStringArray(pool("cities")),
+        "state": state,
+        "zip_code": pd.arrays.ArrowStringArray(pool("zip_codes")),
+        "created_at": _datetimes_between(rng, now - timedelta(days=5 * 365), now, n),
+        "loyalty_tier": np.asarray(tiers[0], dtype=object)[_weighted(rng, tiers, n)],
+    })
+
+
+def _day_rng(stream, day):
+    """Random generator for one table stream on one calendar day.
+
+    Seeding by (SEED, stream, date) keeps every day reproducible on its own,
+    independent of the date range or order it is generated in.
+    """
+    return np.random.default_rng([SEED, zlib.crc32(stream.encode()), day.toordinal()])
+
+
+def _weighted(rng, choices, size):
+    """Draw indices into a (values, weights) pair."""
+    values, weights = choices
+    p = np.asarray(weights, dtype=float)
+    return rng.choice(len(values), size=size, p=p / p.sum())
+
+
+def _format_ids(prefix, values, width, base=10):
+    """Format integers as zero-padded ids (e.g. ORD-0000000001) without a Python loop."""
+    values = np.array(values, dtype=np.int64)
+    # One newline-terminated row per id, decoded and split in a single pass.
+    chars = np.empty((len(values), len(prefix) + width + 1), dtype=np.uint8)
+    chars[:, :len(prefix)] = np.frombuffer(prefix.encode(), dtype=np.uint8)
+    chars[:, -1] = ord("\n")
+    for col in range(len(prefix) + width - 1, len(prefix) - 1, -1):
+        if base == 16:
+            chars[:, col] = _ID_DIGITS[values & 15]
+            values >>= 4
+        else:
+            values, digit = np.divmod(values, base)
+            chars[:, col] = _ID_DIGITS[digit]
+    ids = np.empty(len(values), dtype=object)
+    ids[:] = chars.tobytes().decode("ascii").split("\n")[:-1]
+    return ids
+
+
+def _scramble48(values):
+    """Bijective 48-bit mix so sequential counters look random but stay unique."""
+    mask = np.uint64((1 << 48) - 1)
+    x = np.asarray(values, dtype=np.uint64) & mask
+    x = (x * np.uint64(0x9E3779B97F4A7C15)) & mask
+    x ^= x >> np.uint64(23)
+    x = (x * np.uint64(0xBF58476D1CE4E5B9)) & mask
+    return x ^ (x >> np.uint64(21))
+
+
+def _sample_distinct(rng, n, group, size, max_group):
+    """Draw `size` indices below n, distinct within each run of equal group labels."""
+    picks = rng.integers(0, n, size=size)
+    while True:
+        dup = np.zeros(size, dtype=bool)
+        for lag in range(1, max_group):
+            dup[lag:] |= (group[lag:] == group[:-lag]) & (picks[lag:] == picks[:-lag])
+        if not dup.any():
+            return picks
+        picks[dup] = rng.integers(0, n, size=int(dup.sum()))
+
+
+def _frame_from_columns(chunks):
+    """Build one DataFrame from a list of column dicts, concatenating per column."""
+    if not chunks:
+        return pd.DataFrame()
+    return pd.DataFrame({
+        name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]
+    })
+
+
+def _daily_order_count(day):
+    """Number of orders placed on a given day."""
+    is_weekend = day.weekday() >= 5
+    return int(TRANSACTIONS_PER_DAY * (1.3 if is_weekend else 1.0))
+
+
+def _transactions_for_day(day, first_order, product_ids, prices, store_ids, customer_ids):
+    """Generate one day of line items as a dict of column arrays."""
+    rng = _day_rng("transactions", day)
+    n_orders = _daily_order_count(day)
+
+    items = np.asarray(ITEMS_PER_ORDER[0])[_weighted(rng, ITEMS_PER_ORDER, n_orders)]
+    items = np.minimum(items, len(product_ids))
+    channels = _weighted(rng, CHANNELS, n_orders)
+
+    order_idx = np.repeat(np.arange(n_orders), items)
+    n = len(order_idx)
+
+    product = _sample_distinct(rng, len(product_ids), order_idx, n, int(items.max(initial=1)))
+    qty = np.asarray(QUANTITIES[0])[_weighted(rng, QUANTITIES, n)]
+    price = prices[product]
+    rate = np.asarray(DISCOUNT_RATES)[rng.integers(0, len(DISCOUNT_RATES), size=n)]
+    discount = np.round(price * qty * rate, 2)
+    customer = rng.integers(0, len(customer_ids), size=n)
+    store = rng.integers(0, len(store_ids), size=n)
+    minutes = rng.integers(6, 22, size=n) * 60 + rng.integers(0, 60, size=n)
+    timestamps = np.datetime64(day, "ns") + (minutes * 60_000_000_000).astype("timedelta64[ns]")
+    status = _weighted(rng, ORDER_STATUSES, n)
+    channel = channels[order_idx]
+    shipped = np.asarray(SHIP_FULFILLMENT_TYPES, dtype=object)[
+        rng.integers(0, len(SHIP_FULFILLMENT_TYPES), size=n)
+    ]
+    in_store = CHANNELS[0].index("in_store")
+
+    line_numbers = (np.uint64(day.toordinal()) << np.uint64(28)) + np.arange(n, dtype=np.uint64)
+
+    return {
+        "transaction_id": _format_ids("TXN-", _scramble48(line_numbers).astype(np.int64), 12, base=16),
+        "order_id": _format_ids("ORD-", first_order + np.arange(n_orders), 10)[order_idx],
+        "customer_id": customer_ids[customer],
+        "store_id": store_ids[store],
+        "product_id": product_ids[product],
+        "transaction_date": timestamps,
+        "quantity": qty,
+        "unit_price": price,
+        "discount_amount": discount,
+        "total_amount": np.round(price * qty - discount, 2),
+        "order_status": np.asarray(ORDER_STATUSES[0], dtype=object)[status],
+        "channel": np.asarray(CHANNELS[0], dtype=object)[channel],
+        "fulfillment_type": np.where(channel == in_store, "in_store", shipped),
+    }
+
+
+def _transaction_chunks(products_df, stores_df, customers_df, days=30, start_date=None,
+                        first_order=1):
+    """Yield sales transactions one day at a time as column dicts."""
+    active = products_df[products_df["is_active"]]
+    product_ids = active["product_id"].to_numpy(dtype=object)
+    prices = active["unit_price"].to_numpy(dtype=float)
+    store_ids = stores_df[stores_df["store_type"] == "retail"]["store_id"].to_numpy(dtype=object)
+    customer_ids = customers_df["customer_id"].to_numpy(dtype=object)
+
+    start_date = start_date or date.today() - timedelta(days=days)
+
+    for offset in range(days):
+        current = start_date + timedelta(days=offset)
+        yield _transactions_for_day(
+            current, first_order, product_ids, prices, store_ids, customer_ids
+        )
+        first_order += _daily_order_count(current)
+
+
+def iter_transactions(products_df, stores_df, customers_df, days=30, start_date=None,
+                      first_order=1):
+    """Yield sales transactions as one DataFrame per day."""
+    for chunk in _transaction_chunks(
+        products_df, stores_df, customers_df, days, start_date, first_order
+    ):
+        yield pd.DataFrame(chunk)
+
+
+def generate_transactions(products_df, stores_df, customers_df, days=30, start_date=None):
     """Generate sales transactions."""
-    transactions = []
+    return _frame_from_columns(list(
+        _transaction_chunks(products_df, stores_df, customers_df, days, start_date)
+    ))
+
+
+def _inventory_blocks(n_stores, store_blocks=None):
+    """(block, first store, last store + 1) for each INVENTORY_STORE_BLOCK-sized block of stores."""
+    n_blocks = -(-n_stores // INVENTORY_STORE_BLOCK)
+    blocks = range(n_blocks) if store_blocks is None else store_blocks
+    return [
+        (b, b * INVENTORY_STORE_BLOCK, min((b + 1) * INVENTORY_STORE_BLOCK, n_stores))
+        for b in blocks if b < n_blocks
+    ]
+
+
+def _inventory_assortment(n_products, n_stores, per_store, walk_start, block=0):
+    """Pick each store's stocked products (as a stores x products index matrix) and opening stock."""
+    rng = _day_rng(f"inventory_assortment/{block}", walk_start)
+    per_store = min(per_store or n_products, n_products)
+    if per_store == n_products:
+        assortment = np.broadcast_to(np.arange(n_products), (n_stores, per_store))
+    else:
+        assortment = np.array(
+            [rng.choice(n_products, per_store, replace=False) for _ in range(n_stores)],
+            dtype=np.int64,
+        ).reshape(n_stores, per_store)
+    return assortment, rng.integers(10, 501, size=(n_stores, per_store), dtype=np.int32)
+
+
+def _walk(stock, deltas):
+    """Advance stock through a block of daily deltas, clamped at zero.
+    
+    A walk restarted at zero whenever it would go negative is the unclamped
+    cumulative sum S minus min(0, running min of S), so a whole block of days
+    is one cumsum instead of a loop over days.
+    """
+    levels = stock + np.cumsum(deltas, axis=0, dtype=stock.dtype)
+    return levels - np.minimum(np.minimum.accumulate(levels, axis=0), 0)
+
+
+def _inventory_columns(snap_date, rng, qty, store_ids, product_ids):
+    """One day's snapshot columns for a block of stores from their stock matrix."""
+    qty = qty.ravel().astype(np.int64)
+    n = len(qty)
+    reserved = rng.integers(0, np.minimum(20, qty) + 1)
+    
+    return {
+        "snapshot_date": np.full(n, snap_date, dtype=object),
+        "store_id": np.repeat(store_ids, product_ids.shape[1]),
+        "product_id": product_ids.ravel(),
+        "quantity_on_hand": qty,
+        "quantity_reserved": reserved,
+        "quantity_available": qty - reserved,
+        "reorder_point": rng.integers(20, 51, size=n),
+        "safety_stock": rng.integers(10, 31, size=n),
+        "days_of_supply": np.round(qty / rng.uniform(5, 20, size=n), 1),
+    }
+
+
+def iter_inventory(products_df, stores_df, days=30, start_date=None, walk_start=None,
+                   products_per_store=PRODUCTS_PER_STORE, store_blocks=None, state=None):
+    """Yield inventory snapshots in frames of about FRAME_ROWS rows, ordered by day then store.
+    
+    Stock levels for every store x product follow a random walk that begins
+    at `walk_start` (defaults to `start_date`); days before `start_date` are
+    replayed without emitting rows. Each block of INVENTORY_STORE_BLOCK
+    stores draws from its own streams, so `store_blocks` (a range of block
+    numbers) yields exactly those stores' rows of a full run. Pass
+    products_per_store=None to stock the full active assortment in every store.
+    
+    `state` (a dict, updated in place) checkpoints the walk: when it holds
+    the end-of-day "stock" frame of an earlier "date" for the same stores
+    and products, the walk resumes there instead of at `walk_start`. Once
+    the last day is yielded it holds that day's stock.
+    """
+    product_ids = products_df[products_df["is_active"]]["product_id"].to_numpy(dtype=object)
+    store_ids = stores_df["store_id"].to_numpy(dtype=object)
     
-    product_ids = products_df[products_df["is_active"]]["product_id"].tolist()
-    prices = dict(zip(products_df["product_id"], products_df["unit_price"]))
-    store_ids = stores_df[stores_df["store_type"] == "retail"]["store_id"].tolist()
-    customer_ids = customers_df["customer_id"].tolist()
+    start_date = start_date or date.today() - timedelta(days=days)
+    walk_start = walk_start or start_date
     
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-    order_num = 0
+    blocks = []
+    for block, lo, hi in _inventory_blocks(len(store_ids), store_blocks):
+        assortment, stock = _inventory_assortment(
+            len(product_ids), hi - lo, products_per_store, walk_start, block
+        )
+        blocks.append((block, store_ids[lo:hi], product_ids[assortment], stock))
+    if not blocks:
+        return
+    cells = sum(stock.size for *_, stock in blocks)
+    block_days = max(1, FRAME_ROWS // max(1, cells))
+    total_days = (start_date - walk_start).days + days
+    resume = 0
+    if state is not None and state.get("stock") is not None and walk_start <= state["date"] < start_date:
+        stocks = _restore_stock(state["stock"], blocks)
+        if stocks is not None:
+            blocks = [(b, stores, products, stock) for (b, stores, products, _), stock in zip(blocks, stocks)]
+            resume = (state["date"] - walk_start).days + 1
+    chunks, rows = [], 0
     
-    for day in range(days):
-        current = start_date + timedelta(days=day)
-        is_weekend = current.weekday() >= 5
-        daily_count = int(TRANSACTIONS_PER_DAY * (1.3 if is_weekend else 1.0))
+    for first in range(resume, total_days, block_days):
+        dates = [walk_start + timedelta(days=d) for d in range(first, min(first + block_days, total_days))]
+        walked = []
+        for i, (block, stores, products, stock) in enumerate(blocks):
+            rngs = [_day_rng(f"inventory/{block}", d) for d in dates]
+            # Deltas are each day's first draw, so replayed days consume only these.
+            deltas = np.stack([rng.integers(-20, 31, size=stock.shape, dtype=np.int32) for rng in rngs])
+            levels = _walk(stock, deltas)
+            blocks[i] = (block, stores, products, levels[-1])
+            walked.append((rngs, levels))
         
-        for _ in range(daily_count):
-            order_num += 1
-            order_id = f"ORD-{order_num:010d}"
-            num_items = random.choices([1,2,3,4,5], weights=[40,30,15,10,5])[0]
-            
-            channel = random.choices(
-                ["online", "in_store", "app"],
-                weights=[35, 55, 10]
-            )[0]
-            
-            for prod_id in random.sample(product_ids, num_items):
-                qty = random.choices([1,2,3,5,10], weights=[60,25,10,4,1])[0]
-                price = prices.get(prod_id, 50.0)
-                discount = round(price * qty * random.choice([0, 0.05, 0.1, 0.15]), 2)
-                
-                transactions.append({
-                    "transaction_id": f"TXN-{uuid.uuid4().hex[:12].upper()}",
-                    "order_id": order_id,
-                    "customer_id": random.choice(customer_ids),
-                    "store_id": random.choice(store_ids),
-                    "product_id": prod_id,
-                    "transaction_date": current.replace(
-                        hour=random.randint(6, 21),
-                        minute=random.randint(0, 59)
-                    ),
-                    "quantity": qty,
-                    "unit_price": price,
-                    "discount_amount": discount,
-                    "total_amount": round(price * qty - discount, 2),
-                    "order_status": random.choices(
-                        ["pending", "confirmed", "shipped", "delivered", "cancelled", "returned"],
-                        weights=[5, 10, 15, 60, 5, 5]
-                    )[0],
-                    "channel": channel,
-                    "fulfillment_type": "in_store" if channel == "in_store" else random.choice(["ship_to_home", "bopis"]),
-                })
-    
-    return pd.DataFrame(transactions)
-
-
-def generate_inventory(products_df, stores_df, days=30):
+        for d, snap_date in enumerate(dates):
+            if snap_date < start_date:
+                continue
+            for (_, stores, products, _), (rngs, levels) in zip(blocks, walked):
+                chunks.append(_inventory_columns(snap_date, rngs[d], levels[d], stores, products))
+                rows += levels[d].size
+                if rows >= FRAME_ROWS:
+                    yield _frame_from_columns(chunks)
+                    chunks, rows = [], 0
+    if chunks:
+        yield _frame_from_columns(chunks)
+    if state is not None:
+        state["date"] = walk_start + timedelta(days=total_days - 1)
+        state["stock"] = pd.DataFrame({
+            "store_id": np.concatenate([np.repeat(stores, products.shape[1]) for _, stores, products, _ in blocks]),
+            "product_id": np.concatenate([products.ravel() for _, _, products, _ in blocks]),
+            "quantity_on_hand": np.concatenate([stock.ravel() for *_, stock in blocks]),
+        })
+
+
+def _restore_stock(frame, blocks):
+    """Per-block stock matrices from a checkpoint frame, or None if the assortment has changed."""
+    store_ids = np.concatenate([np.repeat(stores, products.shape[1]) for _, stores, products, _ in blocks])
+    product_ids = np.concatenate([products.ravel() for _, _, products, _ in blocks])
+    if not (np.array_equal(frame["store_id"].to_numpy(dtype=object), store_ids)
+            and np.array_equal(frame["product_id"].to_numpy(dtype=object), product_ids)):
+        return None
+    stock = frame["quantity_on_hand"].to_numpy(dtype=np.int32)
+    bounds = np.cumsum([0] + [s.size for *_, s in blocks])
+    return [stock[lo:hi].reshape(s.shape) for (*_, s), lo, hi in zip(blocks, bounds[:-1], bounds[1:])]
+
+
+def generate_inventory(products_df, stores_df, days=30, start_date=None,
+                       products_per_store=PRODUCTS_PER_STORE):
     """Generate inventory snapshots."""
-    snapshots = []
-    product_ids = products_df[products_df["is_active"]]["product_id"].tolist()
-    store_ids = stores_df["store_id"].tolist()
-    
-    # Sample product-store combinations
-    combos = [
-        (s, p) for s in store_ids
-        for p in random.sample(product_ids, min(200, len(product_ids)))
-    ]
+    frames = list(iter_inventory(
+        products_df, stores_df, days, start_date, products_per_store=products_per_store
+    ))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def _page_view_frame(day, rng, first_session, first_event, sizes,
+                     product_ids, product_urls, customer_ids):
+    """Expand a block of sessions into event rows with session attributes repeated per event."""
+    n_sessions = len(sizes)
+    session = np.repeat(np.arange(n_sessions), sizes)
+    n = len(session)
+    
+    # Indices past the customer list are anonymous visitors.
+    customer = rng.integers(0, len(customer_ids) + ANONYMOUS_VISITORS, size=n_sessions)
+    session_customers = np.full(n_sessions, None, dtype=object)
+    known = customer < len(customer_ids)
+    session_customers[known] = customer_ids[customer[known]]
+    devices = np.asarray(DEVICE_TYPES, dtype=object)[rng.integers(0, len(DEVICE_TYPES), size=n_sessions)]
+    browsers = np.asarray(BROWSERS, dtype=object)[rng.integers(0, len(BROWSERS), size=n_sessions)]
+    
+    event_type = _weighted(rng, EVENT_TYPES, n)
+    product = np.full(n, None, dtype=object)
+    viewed = rng.random(n) > 0.3
+    product[viewed] = product_ids[rng.integers(0, len(product_ids), size=int(viewed.sum()))]
+    minutes = rng.integers(0, 24 * 60, size=n)
+    page_url = np.full(n, "/", dtype=object)
+    on_product = rng.random(n) > 0.4
+    page_url[on_product] = product_urls[rng.integers(0, len(product_ids), size=int(on_product.sum()))]
+    referrer = np.asarray(REFERRERS, dtype=object)[rng.integers(0, len(REFERRERS), size=n)]
+    
+    # Counter ids: the day's ordinal followed by a per-day sequence number.
+    ordinal = day.toordinal()
+    session_ids = _format_ids("SES-", ordinal * 10**10 + first_session + np.arange(n_sessions), 16)
     
-    end_date = date.today()
-    start_date = end_date - timedelta(days=days)
-    
-    inventory = {c: random.randint(10, 500) for c in combos}
-    
-    for day in range(days):
-        snap_date = start_date + timedelta(days=day)
-        for (store_id, product_id), base in inventory.items():
-            qty = max(0, base + random.randint(-20, 30))
-            inventory[(store_id, product_id)] = qty
-            reserved = random.randint(0, min(20, qty))
-            
-            snapshots.append({
-                "snapshot_date": snap_date,
-                "store_id": store_id,
-                "product_id": product_id,
-                "quantity_on_hand": qty,
-                "quantity_reserved": reserved,
-                "quantity_available": qty - reserved,
-                "reorder_point": random.randint(20, 50),
-                "safety_stock": random.randint(10, 30),
-                "days_of_supply": round(qty / max(1, random.uniform(5, 20)), 1),
-            })
-    
-    return pd.DataFrame(snapshots)
-
-
-def generate_page_views(products_df, customers_df, days=30):
+    return pd.DataFrame({
+        "event_id": _format_ids("EVT-", ordinal * 10**9 + first_event + np.arange(n), 15),
+        "session_id": session_ids[session],
+        "customer_id": session_customers[session],
+        "product_id": product,
+        "event_timestamp": np.datetime64(day, "ns") + (minutes * 60_000_000_000).astype("timedelta64[ns]"),
+        "event_type": np.asarray(EVENT_TYPES[0], dtype=object)[event_type],
+        "page_url": page_url,
+        "referrer_url": referrer,
+        "device_type": devices[session],
+        "browser": browsers[session],
+    })
+
+
+def iter_page_views(products_df, customers_df, days=30, start_date=None, clickstream_scale=1.0):
+    """Yield clickstream data, one DataFrame per day (or per block of sessions on large days).
+    
+    Session counts and sizes are drawn once per day; `clickstream_scale`
+    multiplies the number of sessions for load testing.
+    """
+    product_ids = products_df["product_id"].to_numpy(dtype=object)
+    product_urls = ("/product/" + products_df["product_id"]).to_numpy(dtype=object)
+    customer_ids = customers_df["customer_id"].to_numpy(dtype=object)
+    
+    start_date = start_date or date.today() - timedelta(days=days)
+    low, high = EVENTS_PER_SESSION
+    sessions_per_frame = max(1, FRAME_ROWS // ((low + high) // 2))
+    
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        rng = _day_rng("page_views", day)
+        n_sessions = int(rng.integers(SESSIONS_PER_DAY[0], SESSIONS_PER_DAY[1] + 1) * clickstream_scale)
+        sizes = rng.integers(low, high + 1, size=n_sessions)
+        first_event = 0
+        
+        for lo in range(0, n_sessions, sessions_per_frame):
+            block = sizes[lo:lo + sessions_per_frame]
+            yield _page_view_frame(
+                day, rng, lo, first_event, block, product_ids, product_urls, customer_ids
+            )
+            first_event += int(block.sum())
+
+
+def generate_page_views(products_df, customers_df, days=30, start_date=None, clickstream_scale=1.0):
     """Generate clickstream data."""
-    page_views = []
-    product_ids = products_df["product_id"].tolist()
-    customer_ids = customers_df["customer_id"].tolist() + [None] * 5000
+    frames = list(iter_page_views(products_df, customers_df, days, start_date, clickstream_scale))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def _stable_schema(schema):
+    """Give all-null columns a concrete type so later batches can be cast to it."""
+    return pa.schema(
+        [field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in schema],
+        metadata=schema.metadata,
+    )
+
+
+def iter_record_batches(frames, batch_size=BATCH_SIZE, schema=None):
+    """Re-chunk a stream of DataFrames into Arrow record batches of `batch_size` rows.
     
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
+    With a `schema` (see src.models.schemas.table_schema) every frame is
+    validated against it and batches carry exactly its types; otherwise the
+    schema is inferred from the first frame.
+    """
+    validate = schema is not None
+    pending = []
+    pending_rows = 0
     
-    for day in range(days):
-        current = start_date + timedelta(days=day)
-        sessions = random.randint(3000, 7000)
+    for frame in frames:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if validate:
+            # Later frames keep the first frame's pandas metadata
+            table = validate_batch(table, schema)
+            schema = table.schema
+        else:
+            if schema is None:
+                schema = _stable_schema(table.schema)
+            table = table.cast(schema)
+        pending.append(table)
+        pending_rows += table.num_rows
         
-        for _ in range(sessions):
-            session_id = f"SES-{uuid.uuid4().hex[:16].upper()}"
-            customer_id = random.choice(customer_ids)
-            device = random.choice(["desktop", "mobile", "tablet"])
-            browser = random.choice(["Chrome", "Safari", "Firefox", "Edge"])
-            
-            for _ in range(random.randint(3, 15)):
-                event_type = random.choices(
-                    ["page_view", "add_to_cart", "purchase", "search"],
-                    weights=[70, 15, 5, 10]
-                )[0]
-                
-                page_views.append({
-                    "event_id": f"EVT-{uuid.uuid4().hex[:12].upper()}",
-                    "session_id": session_id,
-                    "customer_id": customer_id,
-                    "product_id": random.choice(product_ids) if random.random() > 0.3 else None,
-                    "event_timestamp": current.replace(
-                        hour=random.randint(0, 23),
-                        minute=random.randint(0, 59)
-                    ),
-                    "event_type": event_type,
-                    "page_url": f"/product/{random.choice(product_ids)}" if random.random() > 0.4 else "/",
-                    "referrer_url": random.choice([None, "https://google.com", "direct"]),
-                    "device_type": device,
-                    "browser": browser,
-                })
-    
-    return pd.DataFrame(page_views)
+        if pending_rows < batch_size:
+            continue
+        merged = pa.concat_tables(pending).combine_chunks()
+        full = pending_rows - pending_rows % batch_size
+        yield from merged.slice(0, full).to_batches(max_chunksize=batch_size)
+        pending = [merged.slice(full)]
+        pending_rows -= full
+    
+    if pending_rows:
+        yield from pa.concat_tables(pending).combine_chunks().to_batches(max_chunksize=batch_size)
+
+
+def write_dataset(frames, output, name, batch_size=BATCH_SIZE, compact=False, csv=True, table=None):
+    """Stream DataFrames to <name>.parquet (one row group per batch) and, with csv=True, <name>.csv.
+    
+    Only one batch is held in memory at a time, so peak memory does not grow
+    with the number of days generated. Time spent generating, writing Parquet
+    and writing CSV is reported as separate spans. With `table`, batches are
+    validated against that table's schema before they are written.
+    """
+    output = Path(output)
+    writer = None
+    rows = 0
+    csv_file = open(output / f"{name}.csv", "w", newline="") if csv else None
+    generating = Span("generate", accumulate=True)
+    parquet = Span("write_parquet", accumulate=True)
+    csv_span = Span("write_csv", accumulate=True)
+    schema = table_schema(table, compact) if table else None
+    batches = iter_record_batches(frames, batch_size, schema)
+    
+    try:
+        while True:
+            with generating:
+                batch = next(batches, None)
+            if batch is None:
+                break
+            with parquet:
+                if writer is None:
+                    options = compact_parquet_options(batch.schema.names) if compact else {}
+                    writer = pq.ParquetWriter(output / f"{name}.parquet", batch.schema, **options)
+                writer.write_batch(batch, row_group_size=batch_size)
+            if csv_file is not None:
+                with csv_span:
+                    batch.to_pandas().to_csv(csv_file, header=rows == 0, index=False)
+            rows += batch.num_rows
+    finally:
+        if csv_file is not None:
+            csv_span.bytes = csv_file.tell()
+            csv_file.close()
+    
+    if writer is not None:
+        with parquet:
+            writer.close()
+        parquet.bytes = (output / f"{name}.parquet").stat().st_size
+    for stage in (generating, parquet, csv_span) if csv else (generating, parquet):
+        stage.rows = rows
+        stage.emit()
+    return rows
+
+
+def write_dimension(frame, output, name, compact=False, csv=True):
+    """Write a dimension table to <name>.parquet and <name>.csv, validated against its schema."""
+    options = {}
+    if compact:
+        frame = compact_frame(frame)
+        options = compact_parquet_options(list(frame.columns))
+    parquet_path, csv_path = Path(output) / f"{name}.parquet", Path(output) / f"{name}.csv"
+    with span("write_parquet") as s:
+        data = pa.Table.from_pandas(frame, preserve_index=False)
+        pq.write_table(validate_batch(data, table_schema(name, compact)), parquet_path, **options)
+        s.rows, s.bytes = len(frame), parquet_path.stat().st_size
+    if not csv:
+        return
+    with span("write_csv") as s:
+        frame.to_csv(csv_path, index=False)
+        s.rows, s.bytes = len(frame), csv_path.stat().st_size
+
+
+def _categorical(values, categories, column):
+    """Categorical with a fixed dictionary; values outside it are an error, not NaN."""
+    result = pd.Categorical(values, categories=categories)
+    unexpected = pd.isna(result) & pd.notna(values)
+    if unexpected.any():
+        raise ValueError(f"Unexpected {column} values: {sorted(set(values[unexpected]))}")
+    return result
+
+
+def _surrogate_keys(ids, dtype):
+    """Parse the numeric part of display ids such as CUS-00000042; missing ids stay null."""
+    keys = pc.cast(pc.utf8_slice_codeunits(pa.array(ids, pa.string(), from_pandas=True), 4), pa.int64())
+    if keys.null_count:
+        return pd.array(keys.to_pandas(), dtype=pd.Int64Dtype() if dtype == np.int64 else pd.Int32Dtype())
+    return keys.to_numpy().astype(dtype)
+
+
+def compact_frame(frame):
+    """Compact representation of a generated table.
+    
+    Low-cardinality columns become Categoricals whose dictionaries come from
+    the enums in src.models.schemas (written to Parquet as dictionary-encoded
+    columns), and each display id gets an integer surrogate key next to it.
+    """
+    frame = frame.copy(deep=False)
+    for column, enum in CATEGORICAL_COLUMNS.items():
+        if column in frame:
+            frame[column] = _categorical(frame[column].to_numpy(object), [e.value for e in enum], column)
+    if "brand" in frame:
+        frame["brand"] = _categorical(frame["brand"].to_numpy(object), BRAND_NAMES, "brand")
+    for id_column, (key_column, dtype) in SURROGATE_KEYS.items():
+        if id_column in frame:
+            frame.insert(
+                frame.columns.get_loc(id_column) + 1, key_column,
+                _surrogate_keys(frame[id_column], dtype),
+            )
+    return frame
+
+
+def compact_parquet_options(columns):
+    """Parquet writer options for compact output: zstd, plus delta encoding for surrogate keys."""
+    keys = [key for key, _ in SURROGATE_KEYS.values() if key in columns]
+    return {
+        "compression": "zstd",
+        "use_dictionary": [c for c in columns if c not in keys],
+        "column_encoding": {key: "DELTA_BINARY_PACKED" for key in keys},
+    }
+
+
+FACT_TABLES = ["transactions", "inventory_snapshots", "page_views"]
+
+_worker_inputs = None
+
+
+def _init_worker(products_df, stores_df, customers_df):
+    """Hold the dimension tables once per worker process instead of per task."""
+    global _worker_inputs
+    _worker_inputs = (products_df, stores_df, customers_df)
+
+
+def iter_fact_table(name, products_df, stores_df, customers_df, start_date, days, first_day=0,
+                    clickstream_scale=1.0, compact=False, store_blocks=None, state=None):
+    """Yield one fact table for days [first_day, first_day + days) of a run starting at start_date.
+    
+    Every day is seeded from SEED and its date, so any split of the run into
+    shards yields exactly the same rows. `store_blocks` limits inventory to
+    those blocks of INVENTORY_STORE_BLOCK stores, and `state` checkpoints its
+    walk (see iter_inventory).
+    """
+    frames = _iter_fact_frames(
+        name, products_df, stores_df, customers_df, start_date, days, first_day, clickstream_scale,
+        store_blocks, state,
+    )
+    return map(compact_frame, frames) if compact else frames
+
+
+def _iter_fact_frames(name, products_df, stores_df, customers_df, start_date, days, first_day,
+                      clickstream_scale, store_blocks=None, state=None):
+    shard_start = start_date + timedelta(days=first_day)
+    if name == "transactions":
+        first_order = 1 + sum(
+            _daily_order_count(start_date + timedelta(days=d)) for d in range(first_day)
+        )
+        return iter_transactions(products_df, stores_df, customers_df, days, shard_start, first_order)
+    if name == "inventory_snapshots":
+        return iter_inventory(products_df, stores_df, days, shard_start, walk_start=start_date,
+                              store_blocks=store_blocks, state=state)
+    if name == "page_views":
+        return iter_page_views(products_df, customers_df, days, shard_start, clickstream_scale)
+    raise ValueError(f"Unknown fact table: {name}")
+
+
+def _write_shard(name, output, index, start_date, first_day, days, batch_size, clickstream_scale,
+                 compact, csv=True, store_blocks=None):
+    """Worker task: write one day-range (or inventory store-block) shard as a part file."""
+    frames = iter_fact_table(
+        name, *_worker_inputs, start_date, days, first_day, clickstream_scale, compact, store_blocks
+    )
+    with span("shard", table=name, shard=index) as s:
+        s.rows = write_dataset(frames, output, f"part-{index:05d}", batch_size, compact, csv, name)
+    return s.rows
+
+
+def write_fact_table(name, products_df, stores_df, customers_df, days, output,
+                     start_date=None, workers=1, batch_size=BATCH_SIZE, executor=None,
+                     clickstream_scale=1.0, compact=False, csv=True):
+    """Write one fact table, sharded when more than one worker is used.
+    
+    A single worker writes <name>.parquet; otherwise part files are written to
+    <name>/part-NNNNN.parquet, which DuckDB reads as one dataset via a glob.
+    Shards are day ranges, except for inventory: its random walk carries
+    stock from day to day, so it is split by blocks of stores over all days.
+    """
+    output = Path(output)
+    start_date = start_date or date.today() - timedelta(days=days)
+    single, parts = output / f"{name}.parquet", output / name
+    
+    if workers <= 1:
+        shutil.rmtree(parts, ignore_errors=True)
+        frames = iter_fact_table(
+            name, products_df, stores_df, customers_df, start_date, days,
+            clickstream_scale=clickstream_scale, compact=compact,
+        )
+        return write_dataset(frames, output, name, batch_size, compact, csv, name)
+    
+    single.unlink(missing_ok=True)
+    (output / f"{name}.csv").unlink(missing_ok=True)
+    shutil.rmtree(parts, ignore_errors=True)
+    parts.mkdir(parents=True)
+    
+    # Several shards per worker keeps the pool busy while long shards finish.
+    if name == "inventory_snapshots":
+        n_blocks = len(_inventory_blocks(len(stores_df)))
+        bounds = np.linspace(0, n_blocks, min(n_blocks, workers * 4) + 1).astype(int)
+        shards = [(0, days, range(lo, hi)) for lo, hi in zip(bounds[:-1], bounds[1:])]
+    else:
+        bounds = np.linspace(0, days, min(days, workers * 4) + 1).astype(int)
+        shards = [(int(first), int(last - first), None) for first, last in zip(bounds[:-1], bounds[1:])]
+    futures = [
+        executor.submit(
+            _write_shard, name, parts, i, start_date, first, n, batch_size, clickstream_scale,
+            compact, csv, blocks,
+        )
+        for i, (first, n, blocks) in enumerate(shards)
+    ]
+    return sum(f.result() for f in futures)
+
+
+DIMENSION_TABLES = {
+    "products": generate_products,
+    "stores": generate_stores,
+    "customers": generate_customers,
+}
+
+
+def ensure_dimensions(output):
+    """Read products, stores and customers from `output`, generating any that are missing.
+    
+    Missing tables come from the fast generators, whose ids and attributes
+    depend only on SEED, so every extract task sees the same dimensions.
+    """
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    frames = []
+    for name, generate in DIMENSION_TABLES.items():
+        path = output / f"{name}.parquet"
+        if path.exists():
+            frames.append(pd.read_parquet(path))
+        else:
+            frame = generate(fast=True)
+            write_dimension(frame, output, name)
+            frames.append(frame)
+    return tuple(frames)
+
+
+def _latest_checkpoint(directory, before):
+    """(date, path) of the newest dt=YYYY-MM-DD.parquet checkpoint in `directory` before `before`."""
+    days = sorted(
+        (date.fromisoformat(p.stem.removeprefix("dt=")), p) for p in Path(directory).glob("dt=*.parquet")
+    )
+    earlier = [(day, path) for day, path in days if day < before]
+    return earlier[-1] if earlier else (None, None)
+
+
+def write_partition(name, day, output, products_df, stores_df, customers_df, batch_size=BATCH_SIZE,
+                    clickstream_scale=1.0, compact=False, epoch=PARTITION_EPOCH):
+    """Write one day of a fact table to <output>/<name>/dt=YYYY-MM-DD/part-00000.parquet.
+    
+    The partition is written to <output>/.staging first and then swapped in,
+    so reruns replace only that day and readers never see a half-written
+    directory. Order numbers and inventory levels are anchored at `epoch`.
+    Inventory also leaves its end-of-day stock in
+    <output>/_state/inventory_snapshots/dt=YYYY-MM-DD.parquet and continues
+    from the newest earlier checkpoint, so a day costs the same whatever its
+    distance from `epoch`.
+    """
+    if day < epoch:
+        raise ValueError(f"Partition date {day} is before the partition epoch {epoch}")
+    output = Path(output)
+    partition = output / name / f"dt={day.isoformat()}"
+    staging = output / ".staging" / name / partition.name
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    
+    state = None
+    if name == "inventory_snapshots":
+        checkpoint_day, checkpoint = _latest_checkpoint(output / "_state" / name, day)
+        state = {"date": checkpoint_day, "stock": pd.read_parquet(checkpoint) if checkpoint else None}
+    frames = iter_fact_table(
+        name, products_df, stores_df, customers_df, epoch, 1, (day - epoch).days,
+        clickstream_scale, compact, state=state,
+    )
+    rows = write_dataset(frames, staging, "part-00000", batch_size, compact, csv=False, table=name)
+    
+    partition.parent.mkdir(parents=True, exist_ok=True)
+    shutil.rmtree(partition, ignore_errors=True)
+    staging.rename(partition)
+    if state is not None and state.get("stock") is not None:
+        checkpoint = output / "_state" / name / f"{partition.name}.parquet"
+        checkpoint.parent.mkdir(parents=True, exist_ok=True)
+        partial = checkpoint.with_suffix(".tmp")
+        state["stock"].to_parquet(partial, index=False)
+        os.replace(partial, checkpoint)
+    return rows
+
+
+class BackgroundParquetWriter:
+    """Write record batches to one Parquet file on a background thread.
+    
+    write() only queues the batch (blocking once `max_pending` are waiting),
+    so generation carries on while pyarrow encodes and compresses.
+    """
+    
+    def __init__(self, path, schema, compact=False, batch_size=BATCH_SIZE, max_pending=4):
+        self._queue = queue.Queue(max_pending)
+        self._error = None
+        options = compact_parquet_options(schema.names) if compact else {}
+        self._thread = threading.Thread(
+            target=self._run, args=(path, schema, options, batch_size), daemon=True
+        )
+        self._thread.start()
+    
+    def _run(self, path, schema, options, batch_size):
+        try:
+            with pq.ParquetWriter(path, schema, **options) as writer:
+                while (batch := self._queue.get()) is not None:
+                    writer.write_batch(batch, row_group_size=batch_size)
+        except Exception as exc:
+            self._error = exc
+            while self._queue.get() is not None:  # keep draining so write() never blocks
+                pass
+    
+    def write(self, batch):
+        self._queue.put(batch)
+    
+    def close(self):
+        """Wait for queued batches to be written, re-raising any write error."""
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+def _persisted(batches, path, compact, batch_size, writers):
+    """Pass batches through, also queueing each on a BackgroundParquetWriter for `path`."""
+    writer = None
+    for batch in batches:
+        if writer is None:
+            writer = BackgroundParquetWriter(path, batch.schema, compact, batch_size)
+            writers.append(writer)
+        writer.write(batch)
+        yield batch
+
+
+def generate_to_warehouse(days=30, db_path=None, start_date=None, batch_size=BATCH_SIZE,
+                          clickstream_scale=1.0, fast_dims=False, compact=False, persist_dir=None):
+    """Generate every table straight into raw.* of the DuckDB warehouse, with no files in between.
+    
+    Record batches go from the generators to DuckDB's Arrow scan one at a
+    time. With `persist_dir`, the same batches are also written to
+    <persist_dir>/<name>.parquet on background threads (no CSV), which finish
+    before this returns. Returns {table: rows}.
+    """
+    start_date = start_date or date.today() - timedelta(days=days)
+    writers = []
+    
+    def persisted(batches, name):
+        if persist_dir is None:
+            return batches
+        output = Path(persist_dir)
+        output.mkdir(parents=True, exist_ok=True)
+        shutil.rmtree(output / name, ignore_errors=True)
+        (output / f"{name}.csv").unlink(missing_ok=True)
+        return _persisted(batches, output / f"{name}.parquet", compact, batch_size, writers)
+    
+    loaded = {}
+    try:
+        with db_connection(db_path) as conn:
+            dimensions = []
+            for name, generate in DIMENSION_TABLES.items():
+                frame = generate(fast=fast_dims)
+                dimensions.append(frame)
+                table = pa.Table.from_pandas(
+                    compact_frame(frame) if compact else frame, preserve_index=False
+                )
+                # Validated here so the persisted Parquet is checked too
+                table = validate_batch(table, table_schema(name, compact))
+                loaded[name] = load_arrow_to_table(
+                    name, persisted(table.to_batches(), name), compact=compact, conn=conn,
+                    validate=False,
+                )
+            for name in FACT_TABLES:
+                frames = iter_fact_table(
+                    name, *dimensions, start_date, days,
+                    clickstream_scale=clickstream_scale, compact=compact,
+                )
+                batches = iter_record_batches(frames, batch_size, table_schema(name, compact))
+                loaded[name] = load_arrow_to_table(
+                    name, persisted(batches, name), compact=compact, conn=conn, validate=False
+                )
+    finally:
+        for writer in writers:
+            writer.close()
+    return loaded
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--days", type=int, default=30)
     parser.add_argument("--output", type=str, default="data/sample")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="Rows per Parquet row group when streaming fact tables")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes used to generate fact tables in day-range shards")
+    parser.add_argument("--clickstream-scale", type=float, default=1.0,
+                        help="Multiplier on sessions per day for page_views load tests")
+    parser.add_argument("--fast-dims", action="store_true",
+                        help="Build products/stores/customers from a cached Faker vocabulary")
+    parser.add_argument("--compact", action="store_true",
+                        help="Write categorical columns dictionary-encoded with integer surrogate keys")
+    parser.add_argument("--partition-date", type=date.fromisoformat,
+                        help="Only write fact tables for this day as <table>/dt=YYYY-MM-DD/ partitions")
+    parser.add_argument("--to-warehouse", action="store_true",
+                        help="Generate straight into raw.* of the DuckDB warehouse without writing files")
+    parser.add_argument("--persist", action="store_true",
+                        help="With --to-warehouse, also write Parquet to --output in the background")
     args = parser.parse_args()
     
+    with span("generate_data"):
+        _run(args)
+    write_prometheus()
+
+
+def _run(args):
+    """Generate the dataset described by main()'s arguments."""
+    if args.to_warehouse:
+        with span("generate_to_warehouse") as s:
+            loaded = generate_to_warehouse(
+                args.days, batch_size=args.batch_size, clickstream_scale=args.clickstream_scale,
+                fast_dims=args.fast_dims, compact=args.compact,
+                persist_dir=args.output if args.persist else None,
+            )
+            s.rows = sum(loaded.values())
+        for name, rows in loaded.items():
+            print(f"  ✓ raw.{name}: {rows:,} rows")
+        return
+    
     output = Path(args.output)
     output.mkdir(parents=True, exist_ok=True)
     
+    if args.partition_date:
+        dimensions = ensure_dimensions(output)
+        for name in FACT_TABLES:
+            with span("fact_table", table=name) as s:
+                rows = write_partition(
+                    name, args.partition_date, output, *dimensions, args.batch_size,
+                    args.clickstream_scale, args.compact,
+                )
+                s.rows = rows
+            print(f"  ✓ {name}/dt={args.partition_date}: {rows:,} rows")
+        return
+    
     print("=" * 50)
     print("Home Depot Data Generator")
     print("=" * 50)
     
-    print("\nGenerating products...")
-    products = generate_products()
-    products.to_parquet(output / "products.parquet", index=False)
-    products.to_csv(output / "products.csv", index=False)
-    print(f"  ✓ {len(products):,} products")
-    
-    print("\nGenerating stores...")
-    stores = generate_stores()
-    stores.to_parquet(output / "stores.parquet", index=False)
-    stores.to_csv(output / "stores.csv", index=False)
-    print(f"  ✓ {len(stores):,} stores")
-    
-    print("\nGenerating customers...")
-    customers = generate_customers()
-    customers.to_parquet(output / "customers.parquet", index=False)
-    customers.to_csv(output / "customers.csv", index=False)
-    print(f"  ✓ {len(customers):,} customers")
-    
-    print(f"\nGenerating transactions ({args.days} days)...")
-    transactions = generate_transactions(products, stores, customers, args.days)
-    transactions.to_parquet(output / "transactions.parquet", index=False)
-    transactions.to_csv(output / "transactions.csv", index=False)
-    print(f"  ✓ {len(transactions):,} transactions")
-    
-    print(f"\nGenerating inventory ({args.days} days)...")
-    inventory = generate_inventory(products, stores, args.days)
-    inventory.to_parquet(output / "inventory_snapshots.parquet", index=False)
-    inventory.to_csv(output / "inventory_snapshots.csv", index=False)
-    print(f"  ✓ {len(inventory):,} inventory records")
-    
-    print(f"\nGenerating page views ({args.days} days)...")
-    views = generate_page_views(products, customers, args.days)
-    views.to_parquet(output / "page_views.parquet", index=False)
-    views.to_csv(output / "page_views.csv", index=False)
-    print(f"  ✓ {len(views):,} page views")
+    dimensions = []
+    for name, generate in [
+        ("products", generate_products),
+        ("stores", generate_stores),
+        ("customers", generate_customers),
+    ]:
+        print(f"\nGenerating {name}...")
+        with span("dimension", table=name) as s:
+            with span("generate") as generating:
+                frame = generate(fast=args.fast_dims)
+                generating.rows = len(frame)
+            write_dimension(frame, output, name, args.compact)
+            s.rows = len(frame)
+        dimensions.append(frame)
+        print(f"  ✓ {len(frame):,} {name}")
+    products, stores, customers = dimensions
+    
+    start_date = date.today() - timedelta(days=args.days)
+    labels = {
+        "transactions": "transactions",
+        "inventory_snapshots": "inventory records",
+        "page_views": "page views",
+    }
+    
+    executor = None
+    if args.workers > 1:
+        executor = ProcessPoolExecutor(
+            args.workers, initializer=_init_worker, initargs=(products, stores, customers)
+        )
+    try:
+        for name in FACT_TABLES:
+            print(f"\nGenerating {labels[name]} ({args.days} days)...")
+            with span("fact_table", table=name) as s:
+                rows = write_fact_table(
+                    name, products, stores, customers, args.days, output,
+                    start_date, args.workers, args.batch_size, executor, args.clickstream_scale,
+                    args.compact,
+                )
+                s.rows = rows
+            print(f"  ✓ {rows:,} {labels[name]}")
+    finally:
+        if executor is not None:
+            executor.shutdown()
     
     print("\n" + "=" * 50)
     print("✅ Data generation complete!")
     print(f"Output: {output.absolute()}")
 
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
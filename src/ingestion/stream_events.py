@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Real-time clickstream and order events, landed as Parquet micro-batches.
+
+Usage:
+    python src/ingestion/stream_events.py run --rate 2000 --duration 600
+    python src/utils/database.py --tail          # load micro-batches into raw.* as they land
+    python src/ingestion/stream_events.py load-test --rates 1000 5000 20000 --duration 20
+
+Streamed ids are hex and unique across runs landing in the same directory
+(run ids come from a counter kept there), so they never collide with batch
+extracts or earlier runs; still, keep streamed days out of a warehouse that also takes
+batch extracts, since load_parquet_incremental replaces whole days.
+"""
+
+import os
+import sys
+import time
+import fcntl
+import shutil
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Allow running as a script from the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.ingestion import generate_data as gen
+from src.models.schemas import table_schema, validate_batch
+from src.utils.database import FIRST_EVENT_KEY, LANDED_FILE, LANDING_DIR, tail_landing
+
+TICK_SECONDS = 0.05
+FLUSH_SECONDS = 1.0
+FLUSH_ROWS = 50_000
+MAX_PENDING_FLUSHES = 8
+# Stream ids are run_id << 34 plus a per-run counter, all below 2**47
+RUN_ID_BITS = 13
+RUN_ID_FILE = "_run_id"
+# Order lines are about a fifth of the batch generator's daily events (~11k of ~56k)
+TRANSACTION_SHARE = 0.2
+# Online orders only; in-store sales arrive through the daily batch extract
+ONLINE_CHANNELS = (["online", "app"], [35, 10])
+# Relative online traffic by hour of day (quiet overnight, lunch bump, evening peak)
+INTRADAY_CURVE = np.array([
+    0.25, 0.15, 0.10, 0.10, 0.12, 0.20, 0.40, 0.70, 0.95, 1.10, 1.20, 1.30,
+    1.35, 1.30, 1.25, 1.20, 1.20, 1.30, 1.50, 1.70, 1.75, 1.50, 1.00, 0.55,
+])
+INTRADAY_CURVE = INTRADAY_CURVE / INTRADAY_CURVE.mean()
+# Load test pass criteria
+SUSTAINED_SHARE = 0.95
+MAX_P99_LATENCY = 5.0
+
+
+def intraday_factor(moment, curve=INTRADAY_CURVE):
+    """Traffic multiplier at a time of day, interpolated between hourly points (mean 1)."""
+    if curve is None:
+        return 1.0
+    hour = moment.hour + moment.minute / 60 + moment.second / 3600
+    return float(np.interp(hour, np.arange(24) + 0.5, curve, period=24))
+
+
+def _stream_ids(prefix, run_id, counter, n):
+    """Hex ids unique within a run and disjoint from the batch generator's ids.
+
+    Batch transaction ids scramble (day ordinal << 28) + n, which is at least
+    2**47 for any modern date; stream ids scramble values below 2**47.
+    """
+    values = (np.int64(run_id) << np.int64(34)) + counter + np.arange(n, dtype=np.int64)
+    return gen._format_ids(prefix, gen._scramble48(values).astype(np.int64), 12, base=16)
+
+
+def next_run_id(landing_dir):
+    """Take the next run id from the counter file in `landing_dir`, under an exclusive lock.
+
+    Every run landing in the directory gets its own id whatever its seed;
+    after 2**RUN_ID_BITS runs ids would repeat, so that raises instead.
+    """
+    landing_dir = Path(landing_dir)
+    landing_dir.mkdir(parents=True, exist_ok=True)
+    with open(landing_dir / RUN_ID_FILE, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        run_id = int(f.read().strip() or 0)
+        if run_id >= 2 ** RUN_ID_BITS:
+            raise RuntimeError(f"{landing_dir} has used all {2 ** RUN_ID_BITS} run ids; land in a new directory")
+        f.seek(0)
+        f.truncate()
+        f.write(str(run_id + 1))
+    return run_id
+
+
+class EventStream:
+    """Emit page_view and transaction events at `rate` events/sec and land them as micro-batches.
+
+    Each tick draws Poisson counts of sessions and orders for the elapsed
+    time, scaled by the intraday curve at the simulated clock (`speedup`
+    simulated seconds per wall second, starting at `start`). Events are
+    validated against the raw table schemas and buffered per table; a
+    buffer is flushed to <landing_dir>/<table>/ once it holds `flush_rows`
+    rows or its oldest event is `flush_seconds` old. Flushes run on worker
+    threads, and at most MAX_PENDING_FLUSHES wait before the producer
+    blocks, which shows up as lag.
+    """
+
+    def __init__(self, products_df, stores_df, customers_df, rate, landing_dir=LANDING_DIR,
+                 start=None, speedup=1.0, curve=INTRADAY_CURVE, flush_seconds=FLUSH_SECONDS,
+                 flush_rows=FLUSH_ROWS, transaction_share=TRANSACTION_SHARE, seed=None):
+        self.rate = rate
+        self.landing_dir = Path(landing_dir)
+        self.start = start or datetime.now()
+        self.speedup = speedup
+        self.curve = curve
+        self.flush_seconds = flush_seconds
+        self.flush_rows = flush_rows
+        self.transaction_share = transaction_share
+        self.rng = np.random.default_rng(seed)
+        self.run_id = next_run_id(self.landing_dir)
+
+        active = products_df[products_df["is_active"]]
+        self.product_ids = products_df["product_id"].to_numpy(dtype=object)
+        self.product_urls = ("/product/" + products_df["product_id"]).to_numpy(dtype=object)
+        self.sale_ids = active["product_id"].to_numpy(dtype=object)
+        self.prices = active["unit_price"].to_numpy(dtype=float)
+        self.store_ids = stores_df[stores_df["store_type"] == "retail"]["store_id"].to_numpy(dtype=object)
+        self.customer_ids = customers_df["customer_id"].to_numpy(dtype=object)
+
+        low, high = gen.EVENTS_PER_SESSION
+        self.session_events = (low + high) / 2
+        values, weights = gen.ITEMS_PER_ORDER
+        self.order_lines = np.dot(values, weights) / np.sum(weights)
+
+        self.counters = {"event": 0, "session": 0, "order": 0, "line": 0}
+        self.buffers = {table: [] for table in ("page_views", "transactions")}
+        self.oldest_ns = {}
+        self.emitted = {table: 0 for table in self.buffers}
+        self.files = 0
+        self.max_lag_seconds = 0.0
+        self._seq = 0
+
+    def clock(self, elapsed):
+        """Simulated time `elapsed` wall seconds after the stream started."""
+        return self.start + timedelta(seconds=elapsed * self.speedup)
+
+    def _next(self, name, n):
+        first = self.counters[name]
+        self.counters[name] += n
+        return first
+
+    def page_views(self, n_sessions, moments):
+        """Events of `n_sessions` new sessions, stamped with simulated times from `moments`."""
+        low, high = gen.EVENTS_PER_SESSION
+        sizes = self.rng.integers(low, high + 1, size=n_sessions)
+        frame = gen._page_view_frame(
+            self.start.date(), self.rng, 0, 0, sizes, self.product_ids, self.product_urls, self.customer_ids
+        )
+        n = len(frame)
+        session = np.repeat(np.arange(n_sessions), sizes)
+        sessions = _stream_ids("SES-", self.run_id, self._next("session", n_sessions), n_sessions)
+        frame["event_id"] = _stream_ids("EVT-", self.run_id, self._next("event", n), n)
+        frame["session_id"] = sessions[session]
+        frame["event_timestamp"] = np.sort(self.rng.choice(moments, size=n))
+        return frame
+
+    def transactions(self, n_orders, moments):
+        """Order lines of `n_orders` new online orders, each order at one simulated moment."""
+        rng = self.rng
+        items = np.asarray(gen.ITEMS_PER_ORDER[0])[gen._weighted(rng, gen.ITEMS_PER_ORDER, n_orders)]
+        items = np.minimum(items, len(self.sale_ids))
+        order_idx = np.repeat(np.arange(n_orders), items)
+        n = len(order_idx)
+
+        product = gen._sample_distinct(rng, len(self.sale_ids), order_idx, n, int(items.max(initial=1)))
+        qty = np.asarray(gen.QUANTITIES[0])[gen._weighted(rng, gen.QUANTITIES, n)]
+        price = self.prices[product]
+        rate = np.asarray(gen.DISCOUNT_RATES)[rng.integers(0, len(gen.DISCOUNT_RATES), size=n)]
+        discount = np.round(price * qty * rate, 2)
+        channel = np.asarray(ONLINE_CHANNELS[0], dtype=object)[
+            gen._weighted(rng, ONLINE_CHANNELS, n_orders)
+        ]
+        fulfillment = np.asarray(gen.SHIP_FULFILLMENT_TYPES, dtype=object)[
+            rng.integers(0, len(gen.SHIP_FULFILLMENT_TYPES), size=n_orders)
+        ]
+        customer = rng.integers(0, len(self.customer_ids), size=n_orders)
+        store = rng.integers(0, len(self.store_ids), size=n_orders)
+        placed = np.sort(rng.choice(moments, size=n_orders))
+
+        return pd.DataFrame({
+            "transaction_id": _stream_ids("TXN-", self.run_id, self._next("line", n), n),
+            "order_id": _stream_ids("ORD-", self.run_id, self._next("order", n_orders), n_orders)[order_idx],
+            "customer_id": self.customer_ids[customer][order_idx],
+            "store_id": self.store_ids[store][order_idx],
+            "product_id": self.sale_ids[product],
+            "transaction_date": placed[order_idx],
+            "quantity": qty,
+            "unit_price": price,
+            "discount_amount": discount,
+            "total_amount": np.round(price * qty - discount, 2),
+            # Just placed; later status changes come with the batch extract
+            "order_status": np.full(n, "pending", dtype=object),
+            "channel": channel[order_idx],
+            "fulfillment_type": fulfillment[order_idx],
+        })
+
+    def emit(self, begin, end):
+        """Generate the events for simulated interval [begin, end) into the buffers."""
+        seconds = (end - begin).total_seconds() / self.speedup
+        expected = self.rate * intraday_factor(begin, self.curve) * seconds
+        n_sessions = self.rng.poisson(expected * (1 - self.transaction_share) / self.session_events)
+        n_orders = self.rng.poisson(expected * self.transaction_share / self.order_lines)
+        # Event times at millisecond resolution within the interval
+        steps = max(1, int((end - begin).total_seconds() * 1000))
+        moments = np.datetime64(begin, "ns") + np.arange(steps) * np.timedelta64(1, "ms")
+        now_ns = time.time_ns()
+
+        for table, count, build in (
+            ("page_views", n_sessions, self.page_views),
+            ("transactions", n_orders, self.transactions),
+        ):
+            if not count:
+                continue
+            frame = build(count, moments)
+            data = validate_batch(pa.Table.from_pandas(frame, preserve_index=False), table_schema(table))
+            self.buffers[table].append(data)
+            self.oldest_ns.setdefault(table, now_ns)
+            self.emitted[table] += data.num_rows
+
+    def ready(self, force=False):
+        """Tables whose buffers are due for a flush."""
+        now_ns = time.time_ns()
+        return [
+            table for table, tables in self.buffers.items()
+            if tables and (
+                force or sum(t.num_rows for t in tables) >= self.flush_rows
+                or now_ns - self.oldest_ns[table] >= self.flush_seconds * 1e9
+            )
+        ]
+
+    def take(self, table):
+        """Remove a table's buffered events as (Arrow table, first event wall-clock ns, sequence)."""
+        data = pa.concat_tables(self.buffers[table])
+        self.buffers[table] = []
+        self._seq += 1
+        return data, self.oldest_ns.pop(table), self._seq
+
+    async def _flush(self, queue):
+        while (item := await queue.get()) is not None:
+            table, data, first_ns, seq = item
+            await asyncio.to_thread(
+                land_micro_batch, data, self.landing_dir / table, first_ns, seq, self.run_id
+            )
+            self.files += 1
+
+    async def run(self, duration=None):
+        """Stream for `duration` wall seconds (forever when None), then flush and return stats."""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(MAX_PENDING_FLUSHES)
+        flusher = asyncio.create_task(self._flush(queue))
+        started = loop.time()
+        emitted_until = 0.0
+        tick = 0
+        try:
+            while duration is None or emitted_until < duration:
+                tick += 1
+                scheduled = tick * TICK_SECONDS
+                await asyncio.sleep(max(0.0, started + scheduled - loop.time()))
+                now = loop.time() - started
+                self.max_lag_seconds = max(self.max_lag_seconds, now - scheduled)
+                until = now if duration is None else min(now, duration)
+                self.emit(self.clock(emitted_until), self.clock(until))
+                emitted_until = until
+                for table in self.ready():
+                    await queue.put((table, *self.take(table)))
+        finally:
+            for table in self.ready(force=True):
+                await queue.put((table, *self.take(table)))
+            await queue.put(None)
+            await flusher
+        elapsed = loop.time() - started
+        return {
+            "seconds": elapsed,
+            "events": sum(self.emitted.values()),
+            "events_per_second": sum(self.emitted.values()) / elapsed if elapsed else 0.0,
+            "max_lag_seconds": self.max_lag_seconds,
+            "files": self.files,
+            **{f"{table}_rows": rows for table, rows in self.emitted.items()},
+        }
+
+
+def land_micro_batch(data, directory, first_event_ns, seq, run_id=0):
+    """Write one micro-batch and rename it into `directory`, so readers only see complete files.
+
+    Both names carry the stream's `run_id`, so streams sharing the directory
+    never write or rename each other's files.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp = directory / f".{run_id:04d}-{seq:06d}.tmp"
+    metadata = {**(data.schema.metadata or {}), FIRST_EVENT_KEY: str(first_event_ns).encode()}
+    pq.write_table(data.replace_schema_metadata(metadata), tmp)
+    path = directory / LANDED_FILE.format(landed_ns=time.time_ns(), run_id=run_id, seq=seq)
+    os.replace(tmp, path)
+    return path
+
+
+def _dimensions():
+    return (
+        gen.generate_products(fast=True),
+        gen.generate_stores(fast=True),
+        gen.generate_customers(fast=True),
+    )
+
+
+def _tail_worker(landing_dir, db_path, stop, results):
+    latencies = []
+    tail_landing(landing_dir, db_path=db_path, stop=stop, on_load=lambda loaded: latencies.extend(
+        (item["latency_seconds"], item["event_latency_seconds"]) for item in loaded
+    ))
+    results.put(latencies)
+
+
+def load_test(rates, duration=20.0, flush_seconds=FLUSH_SECONDS, max_p99=MAX_P99_LATENCY):
+    """Stream at each rate (flat curve) into a fresh landing dir and warehouse with a tailing loader.
+
+    The loader runs in its own process, as it would in production. A rate
+    is sustained when at least SUSTAINED_SHARE of it was emitted and p99
+    landing-to-queryable latency stayed within `max_p99` seconds. Returns
+    one result per rate.
+    """
+    dimensions = _dimensions()
+    context = get_context("spawn")
+    results = []
+    for rate in rates:
+        workdir = tempfile.mkdtemp(prefix="stream-")
+        try:
+            landing = Path(workdir) / "landing"
+            stop, queue = context.Event(), context.Queue()
+            loader = context.Process(
+                target=_tail_worker, args=(str(landing), str(Path(workdir) / "warehouse.duckdb"), stop, queue)
+            )
+            loader.start()
+            stream = EventStream(*dimensions, rate, landing, curve=None, flush_seconds=flush_seconds)
+            stats = asyncio.run(stream.run(duration))
+            stop.set()
+            latencies = queue.get()
+            loader.join()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        landing_latency = [lat for lat, _ in latencies]
+        event_latency = [lat for _, lat in latencies if lat is not None]
+        stats.update({
+            "rate": rate,
+            "p50_latency_seconds": float(np.percentile(landing_latency, 50)) if latencies else None,
+            "p99_latency_seconds": float(np.percentile(landing_latency, 99)) if latencies else None,
+            "p99_event_latency_seconds": float(np.percentile(event_latency, 99)) if event_latency else None,
+        })
+        stats["sustained"] = bool(
+            stats["events_per_second"] >= SUSTAINED_SHARE * rate
+            and stats["p99_latency_seconds"] is not None and stats["p99_latency_seconds"] <= max_p99
+        )
+        results.append(stats)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Stream events into the landing directory")
+    run.add_argument("--rate", type=float, default=1000, help="Mean events/sec over a day")
+    run.add_argument("--duration", type=float, help="Seconds to run (default: until interrupted)")
+    run.add_argument("--landing", default=LANDING_DIR)
+    run.add_argument("--speedup", type=float, default=1.0,
+                     help="Simulated seconds per wall second, e.g. 1440 for a day in a minute")
+    run.add_argument("--flat", action="store_true", help="Constant rate instead of the intraday curve")
+    run.add_argument("--flush-seconds", type=float, default=FLUSH_SECONDS)
+    run.add_argument("--flush-rows", type=int, default=FLUSH_ROWS)
+    run.add_argument("--seed", type=int)
+    test = commands.add_parser("load-test", help="Find the max sustainable events/sec")
+    test.add_argument("--rates", type=float, nargs="+", default=[1000, 5000, 20000])
+    test.add_argument("--duration", type=float, default=20.0)
+    test.add_argument("--flush-seconds", type=float, default=FLUSH_SECONDS)
+    test.add_argument("--max-p99", type=float, default=MAX_P99_LATENCY,
+                      help="Allowed p99 landing-to-queryable latency in seconds")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        stream = EventStream(
+            *_dimensions(), args.rate, args.landing, speedup=args.speedup,
+            curve=None if args.flat else INTRADAY_CURVE, flush_seconds=args.flush_seconds,
+            flush_rows=args.flush_rows, seed=args.seed,
+        )
+        try:
+            stats = asyncio.run(stream.run(args.duration))
+        except KeyboardInterrupt:
+            return
+        print(f"  ✓ {stats['events']:,} events in {stats['files']} micro-batches "
+              f"({stats['events_per_second']:,.0f}/s)")
+        return
+
+    results = load_test(args.rates, args.duration, args.flush_seconds, args.max_p99)
+    for r in results:
+        print(f"  {'✓' if r['sustained'] else '✗'} {r['rate']:>9,.0f}/s offered: "
+              f"{r['events_per_second']:>9,.0f}/s emitted, p50 {r['p50_latency_seconds'] or 0:.2f}s, "
+              f"p99 {r['p99_latency_seconds'] or 0:.2f}s landing-to-queryable, "
+              f"p99 {r['p99_event_latency_seconds'] or 0:.2f}s event-to-queryable, "
+              f"max lag {r['max_lag_seconds']:.2f}s")
+    sustained = [r["rate"] for r in results if r["sustained"]]
+    print(f"Max sustainable rate: {max(sustained):,.0f} events/s" if sustained
+          else "No tested rate was sustainable")
+
+
+if __name__ == "__main__":
+    main()
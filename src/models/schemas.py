@@ -1,9 +1,19 @@
-"""Schema definitions for e-commerce data."""
-from dataclasses import dataclass
+"""Schema definitions for e-commerce data.
+
+Each table is declared once, as a row view class whose annotations list its
+columns in output order. The Arrow schemas the generators and loaders
+enforce are derived from those annotations.
+"""
 from datetime import datetime, date
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Union, get_args, get_origin, get_type_hints
 from enum import Enum
 
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
 
 class ProductCategory(Enum):
     LUMBER = "Lumber & Building Materials"
@@ -27,8 +37,133 @@ class OrderStatus(Enum):
     RETURNED = "returned"
 
 
-@dataclass
-class Product:
+class Channel(Enum):
+    ONLINE = "online"
+    IN_STORE = "in_store"
+    APP = "app"
+
+
+class FulfillmentType(Enum):
+    IN_STORE = "in_store"
+    SHIP_TO_HOME = "ship_to_home"
+    BOPIS = "bopis"
+
+
+class LoyaltyTier(Enum):
+    BRONZE = "bronze"
+    SILVER = "silver"
+    GOLD = "gold"
+    PRO_XTRA = "pro_xtra"
+
+
+class DeviceType(Enum):
+    DESKTOP = "desktop"
+    MOBILE = "mobile"
+    TABLET = "tablet"
+
+
+class EventType(Enum):
+    PAGE_VIEW = "page_view"
+    ADD_TO_CART = "add_to_cart"
+    PURCHASE = "purchase"
+    SEARCH = "search"
+
+
+# Low-cardinality columns and the enum whose values form their dictionary
+CATEGORICAL_COLUMNS = {
+    "category": ProductCategory,
+    "order_status": OrderStatus,
+    "channel": Channel,
+    "fulfillment_type": FulfillmentType,
+    "loyalty_tier": LoyaltyTier,
+    "device_type": DeviceType,
+    "event_type": EventType,
+}
+
+
+# Other columns written dictionary-encoded in compact output; their vocabularies live in the generator
+DICTIONARY_COLUMNS = {"brand"}
+
+# Display id column -> (integer surrogate key column, key dtype) for compact output
+SURROGATE_KEYS = {
+    "order_id": ("order_key", np.int64),
+    "customer_id": ("customer_key", np.int32),
+    "product_id": ("product_key", np.int32),
+    "store_id": ("store_key", np.int32),
+    "session_id": ("session_key", np.int64),
+    "event_id": ("event_key", np.int64),
+}
+
+ARROW_TYPES = {
+    str: pa.string(),
+    int: pa.int64(),
+    float: pa.float64(),
+    bool: pa.bool_(),
+    datetime: pa.timestamp("ns"),
+    date: pa.date32(),
+}
+# Compact categoricals: pandas codes Categoricals of up to 127 categories as int8
+DICTIONARY_TYPE = pa.dictionary(pa.int8(), pa.string())
+
+# Table name -> row view class, filled in as the classes below are defined
+TABLES = {}
+
+
+class Record:
+    """Read-only view of one row of a Batch, for the rare per-record code paths.
+    
+    Subclasses declare a table's columns as annotations; each becomes a
+    property reading that row's value from the batch (enum columns return
+    enum members). Bulk work should stay on Batch columns.
+    """
+    
+    __slots__ = ("_batch", "_index")
+    table = None
+    
+    def __init_subclass__(cls, table=None, **kwargs):
+        super().__init_subclass__(**kwargs)
+        hints = get_type_hints(cls)
+        cls.table = table
+        cls.columns = tuple(hints)
+        for name, hint in hints.items():
+            setattr(cls, name, _column_property(name, _unwrap(hint)[0]))
+        TABLES[table] = cls
+    
+    def __init__(self, batch, index):
+        self._batch = batch
+        self._index = index
+    
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.columns}
+    
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.columns)
+        return f"{type(self).__name__}({fields})"
+    
+    @classmethod
+    def schema(cls, compact=False):
+        return table_schema(cls.table, compact)
+
+
+def _unwrap(hint):
+    """(type, nullable) of an annotation, with Optional[X] nullable."""
+    if get_origin(hint) is Union:
+        args = [a for a in get_args(hint) if a is not type(None)]
+        return args[0], True
+    return hint, False
+
+
+def _column_property(name, kind):
+    enum = kind if isinstance(kind, type) and issubclass(kind, Enum) else None
+    
+    def get(self):
+        value = self._batch.column(name)[self._index].as_py()
+        return enum(value) if enum is not None and value is not None else value
+    return property(get, doc=f"{name} of this row")
+
+
+class Product(Record, table="products"):
+    __slots__ = ()
     product_id: str
     sku: str
     product_name: str
@@ -43,31 +178,39 @@ class Product:
     updated_at: datetime
 
 
-@dataclass
-class Store:
+class Store(Record, table="stores"):
+    __slots__ = ()
     store_id: str
     store_name: str
     store_type: str
+    address: str
     city: str
     state: str
+    zip_code: str
     region: str
+    latitude: float
+    longitude: float
+    opened_date: date
+    square_footage: int
     is_active: bool
 
 
-@dataclass
-class Customer:
+class Customer(Record, table="customers"):
+    __slots__ = ()
     customer_id: str
     customer_type: str
     email: str
     first_name: str
     last_name: str
+    city: str
     state: str
-    loyalty_tier: str
+    zip_code: str
     created_at: datetime
+    loyalty_tier: LoyaltyTier
 
 
-@dataclass
-class Transaction:
+class Transaction(Record, table="transactions"):
+    __slots__ = ()
     transaction_id: str
     order_id: str
     customer_id: str
@@ -79,5 +222,189 @@ class Transaction:
     discount_amount: float
     total_amount: float
     order_status: OrderStatus
-    channel: str
-    fulfillment_type: str
\ No newline at end of file
+    channel: Channel
+    fulfillment_type: FulfillmentType
+
+
+class InventorySnapshot(Record, table="inventory_snapshots"):
+    __slots__ = ()
+    snapshot_date: date
+    store_id: str
+    product_id: str
+    quantity_on_hand: int
+    quantity_reserved: int
+    quantity_available: int
+    reorder_point: int
+    safety_stock: int
+    days_of_supply: float
+
+
+class PageView(Record, table="page_views"):
+    __slots__ = ()
+    event_id: str
+    session_id: str
+    # Anonymous sessions and pages that are not product pages
+    customer_id: Optional[str]
+    product_id: Optional[str]
+    event_timestamp: datetime
+    event_type: EventType
+    page_url: str
+    referrer_url: Optional[str]
+    device_type: DeviceType
+    browser: str
+
+
+@lru_cache(maxsize=None)
+def table_schema(table, compact=False):
+    """Arrow schema of a table, derived from its row view's annotations.
+    
+    Enum columns are strings, or with compact=True dictionary-encoded
+    (as are DICTIONARY_COLUMNS), and compact schemas carry each display
+    id's surrogate key right after it, as generate_data.compact_frame writes them.
+    """
+    fields = []
+    for name, hint in get_type_hints(TABLES[table]).items():
+        kind, nullable = _unwrap(hint)
+        if compact and (name in CATEGORICAL_COLUMNS or name in DICTIONARY_COLUMNS):
+            arrow_type = DICTIONARY_TYPE
+        elif isinstance(kind, type) and issubclass(kind, Enum):
+            arrow_type = pa.string()
+        else:
+            arrow_type = ARROW_TYPES[kind]
+        fields.append(pa.field(name, arrow_type, nullable=nullable))
+        if compact and name in SURROGATE_KEYS:
+            key, dtype = SURROGATE_KEYS[name]
+            fields.append(pa.field(key, pa.from_numpy_dtype(dtype), nullable=nullable))
+    return pa.schema(fields)
+
+
+def _type_problem(name, actual, field):
+    """Why `actual` cannot hold `field`'s column, or None when it can."""
+    if pa.types.is_dictionary(actual) and pa.types.is_dictionary(field.type):
+        # Index width is a storage detail (Parquet reads dictionaries back with int32 indices)
+        if actual.value_type == field.type.value_type:
+            return None
+    elif actual == field.type or (pa.types.is_null(actual) and field.nullable):
+        return None
+    return f"{name}: expected {field.type}, got {actual}"
+
+
+def _unexpected_values(column, enum):
+    """Distinct non-null values of an Array or ChunkedArray that are not members of `enum`."""
+    allowed = pa.array([e.value for e in enum])
+    values = pc.unique(column)
+    if pa.types.is_dictionary(values.type):
+        values = values.dictionary_decode()
+    values = values.drop_null()
+    return values.filter(pc.invert(pc.is_in(values, value_set=allowed))).to_pylist()
+
+
+def validate_batch(data, schema):
+    """Check a RecordBatch or Table against `schema`, a whole column at a time.
+    
+    Columns must match by name and type (dictionary columns on their value
+    type; all-null columns may be untyped where the field is nullable),
+    non-nullable columns may not hold nulls, and categorical columns may
+    only hold their enum's values. Returns the data with columns in schema
+    order and cast to the schema's types; raises ValueError listing every
+    problem found.
+    """
+    problems = []
+    names = set(data.schema.names)
+    missing = [name for name in schema.names if name not in names]
+    unexpected = sorted(names - set(schema.names))
+    if missing:
+        problems.append(f"missing columns {missing}")
+    if unexpected:
+        problems.append(f"unexpected columns {unexpected}")
+    
+    for field in schema:
+        if field.name not in names:
+            continue
+        column = data.column(field.name)
+        problem = _type_problem(field.name, column.type, field)
+        if problem:
+            problems.append(problem)
+            continue
+        if not field.nullable and column.null_count:
+            problems.append(f"{field.name}: {column.null_count:,} nulls in a non-nullable column")
+        enum = CATEGORICAL_COLUMNS.get(field.name)
+        if enum is not None and not pa.types.is_null(column.type):
+            values = _unexpected_values(column, enum)
+            if values:
+                problems.append(f"{field.name}: values outside {enum.__name__}: {values[:5]}")
+    if problems:
+        raise ValueError("Schema violations: " + "; ".join(problems))
+    
+    columns = [data.column(field.name).cast(field.type) for field in schema]
+    if schema.metadata is None:
+        schema = schema.with_metadata(data.schema.metadata)
+    if isinstance(data, pa.Table):
+        return pa.Table.from_arrays(columns, schema=schema)
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def validate_parquet_metadata(files, schema):
+    """Check Parquet files against `schema` from their footers alone, without reading data.
+    
+    Column names and types are compared as in validate_batch, and null
+    counts come from row-group statistics. Enum membership needs the data
+    and is left to validate_batch at write time. Raises ValueError.
+    """
+    problems = []
+    for path in files:
+        metadata = pq.read_metadata(path)
+        actual = metadata.schema.to_arrow_schema()
+        try:
+            validate_batch(actual.empty_table(), schema)
+        except ValueError as exc:
+            problems.append(f"{path}: {str(exc).removeprefix('Schema violations: ')}")
+            continue
+        required = {field.name for field in schema if not field.nullable}
+        nulls = {}
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            for j in range(row_group.num_columns):
+                chunk = row_group.column(j)
+                stats = chunk.statistics
+                if chunk.path_in_schema in required and stats is not None and stats.has_null_count:
+                    nulls[chunk.path_in_schema] = nulls.get(chunk.path_in_schema, 0) + stats.null_count
+        for name, count in nulls.items():
+            if count:
+                problems.append(f"{path}: {name}: {count:,} nulls in a non-nullable column")
+    if problems:
+        raise ValueError("Schema violations: " + "; ".join(problems))
+
+
+class Batch:
+    """Rows of one table held column-wise in a schema-validated pyarrow RecordBatch or Table.
+    
+    Columns are Arrow arrays for vectorized work; indexing or iterating
+    yields the table's Record views.
+    """
+    
+    __slots__ = ("record_type", "data")
+    
+    def __init__(self, record_type, data, compact=False):
+        self.record_type = record_type
+        self.data = validate_batch(data, record_type.schema(compact))
+    
+    @classmethod
+    def from_pandas(cls, record_type, frame, compact=False):
+        return cls(record_type, pa.Table.from_pandas(frame, preserve_index=False), compact)
+    
+    def column(self, name):
+        return self.data.column(name)
+    
+    def __len__(self):
+        return self.data.num_rows
+    
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Row {index} out of range for {len(self)} rows")
+        return self.record_type(self, index)
+    
+    def __iter__(self):
+        return (self.record_type(self, i) for i in range(len(self)))
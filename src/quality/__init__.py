@@ -0,0 +1 @@
+"""Data quality modules."""
@@ -0,0 +1,273 @@
+"""Single-pass validation of Great Expectations-style suites against DuckDB tables or Parquet."""
+
+import sys
+import json
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Any, List
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Allow running as a script from the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.utils.database import db_connection, parquet_files
+
+SAMPLE_SIZE = 5
+BATCH_SIZE = 100_000
+SUPPORTED = {
+    "expect_column_to_exist",
+    "expect_column_values_to_be_unique",
+    "expect_column_values_to_not_be_null",
+    "expect_column_values_to_be_between",
+    "expect_column_values_to_be_in_set",
+}
+
+
+@dataclass
+class ExpectationResult:
+    expectation_type: str
+    column: str
+    success: bool
+    element_count: int = 0
+    unexpected_count: int = 0
+    unexpected_samples: List[Any] = field(default_factory=list)
+
+
+@dataclass
+class ValidationResult:
+    suite_name: str
+    row_count: int
+    results: List[ExpectationResult]
+
+    @property
+    def success(self):
+        return all(r.success for r in self.results)
+
+    def summary(self):
+        lines = [f"{self.suite_name}: {'passed' if self.success else 'FAILED'} ({self.row_count:,} rows)"]
+        for r in self.results:
+            line = f"  {'✓' if r.success else '✗'} {r.expectation_type}({r.column})"
+            if r.unexpected_count:
+                line += f": {r.unexpected_count:,} unexpected, e.g. {r.unexpected_samples}"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def load_suite(path):
+    """Read an expectation suite JSON, rejecting expectation types the validator cannot check."""
+    with open(path) as f:
+        suite = json.load(f)
+    unsupported = {e["expectation_type"] for e in suite["expectations"]} - SUPPORTED
+    if unsupported:
+        raise ValueError(f"Unsupported expectation types: {sorted(unsupported)}")
+    return suite
+
+
+def _literal(value):
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+
+def _unexpected_predicate(expectation):
+    """SQL predicate selecting the rows that violate a row-level expectation."""
+    kind, kwargs = expectation["expectation_type"], expectation["kwargs"]
+    column = f'"{kwargs["column"]}"'
+    if kind == "expect_column_values_to_not_be_null":
+        return f"{column} IS NULL"
+    if kind == "expect_column_values_to_be_between":
+        bounds = []
+        if kwargs.get("min_value") is not None:
+            bounds.append(f"{column} < {_literal(kwargs['min_value'])}")
+        if kwargs.get("max_value") is not None:
+            bounds.append(f"{column} > {_literal(kwargs['max_value'])}")
+        return " OR ".join(bounds) or "FALSE"
+    if kind == "expect_column_values_to_be_in_set":
+        values = ", ".join(_literal(v) for v in kwargs["value_set"])
+        return f"{column} IS NOT NULL AND {column} NOT IN ({values})"
+    return None
+
+
+def _passes(expectation, unexpected, element_count):
+    """Apply the optional `mostly` threshold (fraction of values that must be expected)."""
+    mostly = expectation["kwargs"].get("mostly")
+    if mostly is None or not element_count:
+        return unexpected == 0
+    return 1 - unexpected / element_count >= mostly
+
+
+def compile_suite(suite, table, columns):
+    """One aggregate SELECT computing every expectation's counts over `table`.
+
+    Expectations on missing columns are left out (they fail without a scan).
+    Returns the SQL and, per expectation, the names of its output columns.
+    """
+    selects, outputs = ["COUNT(*) AS row_count"], []
+    for i, expectation in enumerate(suite["expectations"]):
+        kind, column = expectation["expectation_type"], expectation["kwargs"]["column"]
+        if kind == "expect_column_to_exist" or column not in columns:
+            outputs.append(None)
+            continue
+        quoted = f'"{column}"'
+        if kind == "expect_column_values_to_be_unique":
+            selects.append(f"COUNT({quoted}) AS e{i}_elements")
+            selects.append(f"COUNT({quoted}) - COUNT(DISTINCT {quoted}) AS e{i}_unexpected")
+        else:
+            elements = "COUNT(*)" if kind == "expect_column_values_to_not_be_null" else f"COUNT({quoted})"
+            selects.append(f"{elements} AS e{i}_elements")
+            selects.append(
+                f"COUNT(*) FILTER (WHERE {_unexpected_predicate(expectation)}) AS e{i}_unexpected"
+            )
+        outputs.append((f"e{i}_elements", f"e{i}_unexpected"))
+    return f"SELECT {', '.join(selects)} FROM {table}", outputs
+
+
+def _sample_sql(expectation, table, limit):
+    column = f'"{expectation["kwargs"]["column"]}"'
+    if expectation["expectation_type"] == "expect_column_values_to_be_unique":
+        return (f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL "
+                f"GROUP BY 1 HAVING COUNT(*) > 1 LIMIT {limit}")
+    return f"SELECT * FROM {table} WHERE {_unexpected_predicate(expectation)} LIMIT {limit}"
+
+
+def validate_table(table, suite, db_path=None, conn=None, sample_size=SAMPLE_SIZE):
+    """Validate a DuckDB table in one aggregate scan.
+
+    `suite` is a suite dict or a path to its JSON. Failing row-level
+    expectations get up to `sample_size` example rows (unique: duplicated
+    values) from a LIMIT query that only runs on failure.
+    """
+    if isinstance(suite, (str, Path)):
+        suite = load_suite(suite)
+    if conn is None:
+        with db_connection(db_path) as conn:
+            return validate_table(table, suite, conn=conn, sample_size=sample_size)
+
+    columns = {row[0] for row in conn.execute(f"DESCRIBE SELECT * FROM {table}").fetchall()}
+    sql, outputs = compile_suite(suite, table, columns)
+    cursor = conn.execute(sql)
+    names = [d[0] for d in cursor.description]
+    counts = dict(zip(names, cursor.fetchone()))
+
+    results = []
+    for expectation, output in zip(suite["expectations"], outputs):
+        kind, column = expectation["expectation_type"], expectation["kwargs"]["column"]
+        if output is None:
+            results.append(ExpectationResult(kind, column, column in columns))
+            continue
+        elements, unexpected = counts[output[0]], counts[output[1]]
+        result = ExpectationResult(kind, column, _passes(expectation, unexpected, elements),
+                                   elements, unexpected)
+        if unexpected and sample_size:
+            sample = conn.execute(_sample_sql(expectation, table, sample_size))
+            names = [d[0] for d in sample.description]
+            result.unexpected_samples = [
+                row[0] if kind == "expect_column_values_to_be_unique" else dict(zip(names, row))
+                for row in sample.fetchall()
+            ]
+        results.append(result)
+    return ValidationResult(suite.get("expectation_suite_name", "suite"), counts["row_count"], results)
+
+
+def _unexpected_mask(expectation, values):
+    kind, kwargs = expectation["expectation_type"], expectation["kwargs"]
+    if kind == "expect_column_values_to_not_be_null":
+        return pc.is_null(values)
+    if kind == "expect_column_values_to_be_between":
+        masks = []
+        if kwargs.get("min_value") is not None:
+            masks.append(pc.less(values, kwargs["min_value"]))
+        if kwargs.get("max_value") is not None:
+            masks.append(pc.greater(values, kwargs["max_value"]))
+        if not masks:
+            return pa.nulls(len(values), pa.bool_()).fill_null(False)
+        mask = masks[0] if len(masks) == 1 else pc.or_(*masks)
+        return pc.fill_null(mask, False)
+    value_set = pa.array(kwargs["value_set"], type=values.type)
+    return pc.and_(pc.is_valid(values), pc.invert(pc.is_in(values, value_set=value_set)))
+
+
+def _value_type(arrow_type):
+    return arrow_type.value_type if pa.types.is_dictionary(arrow_type) else arrow_type
+
+
+def validate_parquet(path, suite, batch_size=BATCH_SIZE, sample_size=SAMPLE_SIZE):
+    """Validate a Parquet file, directory or glob in one streaming pass over record batches.
+
+    Only the referenced columns are read. Uniqueness keeps its column's
+    values until the end of the pass, so memory grows with that column only.
+    """
+    if isinstance(suite, (str, Path)):
+        suite = load_suite(suite)
+    files = parquet_files(path)
+    schema = pq.read_schema(files[0]) if files else pa.schema([])
+    expectations = suite["expectations"]
+    needed = sorted({
+        e["kwargs"]["column"] for e in expectations
+        if e["expectation_type"] != "expect_column_to_exist" and e["kwargs"]["column"] in schema.names
+    })
+
+    row_count = 0
+    elements = [0] * len(expectations)
+    unexpected = [0] * len(expectations)
+    samples = [[] for _ in expectations]
+    unique_chunks = {i: [] for i, e in enumerate(expectations)
+                     if e["expectation_type"] == "expect_column_values_to_be_unique"
+                     and e["kwargs"]["column"] in needed}
+
+    for f in files:
+        for batch in pq.ParquetFile(f).iter_batches(batch_size=batch_size, columns=needed):
+            row_count += batch.num_rows
+            for i, expectation in enumerate(expectations):
+                column = expectation["kwargs"]["column"]
+                kind = expectation["expectation_type"]
+                if kind == "expect_column_to_exist" or column not in needed:
+                    continue
+                values = batch.column(column)
+                if pa.types.is_dictionary(values.type):
+                    values = values.cast(values.type.value_type)
+                if i in unique_chunks:
+                    unique_chunks[i].append(values)
+                    continue
+                if kind == "expect_column_values_to_not_be_null":
+                    elements[i] += len(values)
+                else:
+                    elements[i] += len(values) - values.null_count
+                mask = _unexpected_mask(expectation, values)
+                bad = pc.sum(mask).as_py() or 0
+                if bad:
+                    unexpected[i] += bad
+                    if len(samples[i]) < sample_size:
+                        rows = batch.filter(mask).slice(0, sample_size - len(samples[i]))
+                        samples[i].extend(rows.to_pylist())
+
+    for i, chunks in unique_chunks.items():
+        column = expectations[i]["kwargs"]["column"]
+        values = pa.chunked_array(chunks, type=_value_type(schema.field(column).type)).drop_null()
+        counts = pc.value_counts(values)
+        duplicated = counts.filter(pc.greater(counts.field("counts"), 1))
+        elements[i] = len(values)
+        unexpected[i] = len(values) - len(counts)
+        samples[i] = duplicated.field("values")[:sample_size].to_pylist()
+
+    results = []
+    for i, expectation in enumerate(expectations):
+        kind, column = expectation["expectation_type"], expectation["kwargs"]["column"]
+        if kind == "expect_column_to_exist" or column not in needed:
+            results.append(ExpectationResult(kind, column, column in schema.names))
+            continue
+        results.append(ExpectationResult(
+            kind, column, _passes(expectation, unexpected[i], elements[i]),
+            elements[i], unexpected[i], samples[i],
+        ))
+    return ValidationResult(suite.get("expectation_suite_name", "suite"), row_count, results)
+
+
+if __name__ == "__main__":
+    suite_path = "great_expectations/expectations/transactions_suite.json"
+    result = validate_table("raw.transactions", suite_path)
+    print(result.summary())
+    sys.exit(0 if result.success else 1)
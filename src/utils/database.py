@@ -1,13 +1,45 @@
 """Database connection utilities using DuckDB."""
 
 import os
+import re
+import sys
+import glob
+import time
+import hashlib
+import itertools
+import threading
+import contextvars
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 import duckdb
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Allow running as a script from the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.models.schemas import (
+    CATEGORICAL_COLUMNS, TABLES, table_schema, validate_batch, validate_parquet_metadata,
+)
+from src.utils.instrumentation import Span, span, write_prometheus
 
 DATABASE_PATH = os.getenv("DATABASE_PATH", "data/warehouse.duckdb")
 
+# Fact tables are reloaded a day at a time on these columns in incremental mode
+PARTITION_COLUMNS = {
+    "transactions": "transaction_date",
+    "inventory_snapshots": "snapshot_date",
+    "page_views": "event_timestamp",
+}
+MANIFEST_TABLE = "_load_manifest"
+STREAM_BATCH_SIZE = 100_000
+QUERY_CACHE_BYTES = int(os.getenv("QUERY_CACHE_BYTES", 256 * 1024 ** 2))
+QUERY_CACHE_DIR = os.getenv("QUERY_CACHE_DIR")
+
 
 def get_connection(db_path=None):
     """Get DuckDB connection."""
@@ -26,20 +58,1024 @@ def db_connection(db_path=None):
         conn.close()
 
 
-def load_parquet_to_table(table_name, parquet_path, schema="raw", db_path=None):
-    """Load parquet file to DuckDB table."""
-    with db_connection(db_path) as conn:
+class ConnectionPool:
+    """One shared DuckDB connection per database, handing out a cursor per thread."""
+    
+    def __init__(self, db_path=None, read_only=False):
+        self.db_path = db_path or DATABASE_PATH
+        self.read_only = read_only
+        self._conn = None
+        self._local = threading.local()
+        # {thread: cursor}, so close() can reach every cursor; dead threads are pruned
+        self._cursors = {}
+        self._lock = threading.Lock()
+    
+    def connection(self):
+        with self._lock:
+            if self._conn is None:
+                if not self.read_only:
+                    Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+                self._conn = duckdb.connect(self.db_path, read_only=self.read_only)
+            return self._conn
+    
+    def cursor(self):
+        """Cursor owned by the calling thread, created on first use.
+        
+        Creating one also closes the cursors of threads that have exited, so
+        short-lived worker threads do not pile up cursors on the connection.
+        """
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self.connection().cursor()
+            with self._lock:
+                for thread in [t for t in self._cursors if not t.is_alive()]:
+                    self._cursors.pop(thread).close()
+                self._cursors[threading.current_thread()] = cursor
+            self._local.cursor = cursor
+        return cursor
+    
+    def close(self):
+        with self._lock:
+            for cursor in self._cursors.values():
+                cursor.close()
+            self._cursors.clear()
+            self._local = threading.local()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _resolved(db_path):
+    return str(Path(db_path or DATABASE_PATH).resolve())
+
+
+def get_pool(db_path=None, read_only=False):
+    """Process-wide pool for a database file, created on first use."""
+    key = (_resolved(db_path), read_only)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(db_path, read_only)
+        return _pools[key]
+
+
+def close_pools():
+    """Close every pooled connection (e.g. before another process writes the file)."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+# Result cache versioning: loads through this module bump the version of the
+# table they write and the global generation. Tables in LOADED_SCHEMAS are
+# tracked individually; anything else (dbt marts, CTEs, files) is derived
+# from them and is tagged with the generation.
+LOADED_SCHEMAS = {"raw"}
+_table_versions = {}
+_generation = 0
+_versions_lock = threading.Lock()
+
+_SQL_LITERAL = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+_SQL_STRING = re.compile(r"('(?:[^']|'')*')")
+_SQL_SOURCES = re.compile(r"\b(?:FROM|JOIN)\b", re.IGNORECASE)
+_SQL_NAME = re.compile(r"\s*((?:\"?\w+\"?\.){0,2}\"?\w+\"?|'')(\s*\()?")
+_SQL_COMMA = re.compile(r"\s*,")
+_SQL_ALIAS = re.compile(r"\s*(?:AS\s+)?(\"?\w+\"?)(\s*\()?", re.IGNORECASE)
+_SQL_CLAUSES = {
+    "where", "group", "order", "having", "limit", "offset", "on", "using", "join", "inner", "left",
+    "right", "full", "cross", "natural", "positional", "asof", "semi", "anti", "union", "except",
+    "intersect", "window", "qualify", "sample", "tablesample", "returning", "select", "lateral",
+}
+
+
+def bump_table_version(schema, table_name):
+    """Invalidate cached results that read `schema.table_name` (and all derived tables)."""
+    global _generation
+    with _versions_lock:
+        LOADED_SCHEMAS.add(schema)
+        key = f"{schema}.{table_name}".lower()
+        _table_versions[key] = _table_versions.get(key, 0) + 1
+        _generation += 1
+
+
+def invalidate_cache():
+    """Invalidate everything derived outside this process, e.g. after `dbt run`."""
+    global _generation
+    with _versions_lock:
+        _generation += 1
+
+
+def normalize_sql(sql):
+    """Collapse whitespace outside string literals and drop a trailing semicolon."""
+    parts = _SQL_LITERAL.split(sql.strip().rstrip(";").strip())
+    return "".join(
+        part if i % 2 else re.sub(r"\s+", " ", part) for i, part in enumerate(parts)
+    )
+
+
+def _skip_parens(code, pos):
+    """Position just past the parenthesis group opening at or after `pos`."""
+    depth = 0
+    for i in range(code.index("(", pos), len(code)):
+        depth += {"(": 1, ")": -1}.get(code[i], 0)
+        if depth == 0:
+            return i + 1
+    return len(code)
+
+
+def referenced_tables(sql):
+    """Lower-cased sources after FROM/JOIN, including every table of a comma-separated FROM list.
+    
+    Tables are schema-qualified where the SQL qualifies them. Table
+    functions and macros come back as "name()" and file literals as "''";
+    table_versions() tags those with the global generation.
+    """
+    # String contents become '' so file sources (FROM 'x.parquet') still show up
+    code = "''".join(_SQL_STRING.split(sql)[::2])
+    sources = set()
+    for keyword in _SQL_SOURCES.finditer(code):
+        pos = keyword.end()
+        while True:
+            source = _SQL_NAME.match(code, pos)
+            if source is not None:
+                name = source.group(1).replace('"', "").lower()
+                pos = source.end()
+                if source.group(2):
+                    name += "()"
+                    pos = _skip_parens(code, pos - 1)
+                if name in _SQL_CLAUSES:
+                    break
+                sources.add(name)
+            elif code[pos:].lstrip().startswith("("):
+                # Subquery: its own FROM is matched separately
+                pos = _skip_parens(code, pos)
+            else:
+                break
+            alias = _SQL_ALIAS.match(code, pos)
+            if alias and alias.group(1).replace('"', "").lower() not in _SQL_CLAUSES:
+                pos = _skip_parens(code, alias.end() - 1) if alias.group(2) else alias.end()
+            comma = _SQL_COMMA.match(code, pos)
+            if comma is None:
+                break
+            pos = comma.end()
+    return sorted(sources)
+
+
+def table_versions(tables):
+    """Current version tag of each table, as used to validate cache entries."""
+    with _versions_lock:
+        tags = []
+        for name in tables:
+            schema = name.rpartition(".")[0].rpartition(".")[2]
+            # Macros, table functions and files can read anything: follow the generation
+            if schema in LOADED_SCHEMAS and not name.endswith(("()", "'")):
+                tags.append((name, "table", _table_versions.get(name, 0)))
+            else:
+                tags.append((name, "generation", _generation))
+        return tuple(tags)
+
+
+class QueryCache:
+    """Byte-bounded LRU cache of Arrow query results, with an optional Arrow IPC spill directory.
+    
+    Entries are tagged with table_versions() of the tables they read and are
+    dropped on lookup once any of those versions moves. Entries evicted from
+    memory are written to `spill_dir` (when set) and memory-mapped back on a hit.
+    `ttl` (seconds) bounds staleness against writers in other processes.
+    """
+    
+    def __init__(self, max_bytes=QUERY_CACHE_BYTES, spill_dir=QUERY_CACHE_DIR,
+                 max_spill_bytes=None, ttl=None):
+        self.max_bytes = max_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.max_spill_bytes = max_spill_bytes if max_spill_bytes is not None else 4 * max_bytes
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._spilled = OrderedDict()
+        self._bytes = 0
+        self._spill_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = dict(hits=0, spill_hits=0, misses=0, invalidations=0, evictions=0, spills=0)
+    
+    @staticmethod
+    def key(sql, params=None, db_path=None):
+        if isinstance(params, dict):
+            params = sorted(params.items())
+        return (_resolved(db_path), normalize_sql(sql), repr(params))
+    
+    def get(self, key, tables):
+        """Cached table for `key`, or None on a miss or a stale entry."""
+        versions = table_versions(tables)
+        with self._lock:
+            if key in self._memory:
+                table, tags, created = self._memory[key]
+                if self._fresh(tags, created, versions):
+                    self._memory.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return table
+                self._drop_memory(key)
+                self._stats["invalidations"] += 1
+            elif key in self._spilled:
+                path, size, tags, created = self._spilled.pop(key)
+                self._spill_bytes -= size
+                if self._fresh(tags, created, versions):
+                    table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+                    self._stats["spill_hits"] += 1
+                    self._put(key, table, tags, created)
+                    path.unlink(missing_ok=True)
+                    return table
+                path.unlink(missing_ok=True)
+                self._stats["invalidations"] += 1
+            self._stats["misses"] += 1
+            return None
+    
+    def put(self, key, table, tables):
+        with self._lock:
+            self._put(key, table, table_versions(tables), time.monotonic())
+    
+    def _fresh(self, tags, created, versions):
+        return tags == versions and (self.ttl is None or time.monotonic() - created < self.ttl)
+    
+    def _put(self, key, table, tags, created):
+        if key in self._memory:
+            self._drop_memory(key)
+        if table.nbytes > self.max_bytes:
+            return
+        self._memory[key] = (table, tags, created)
+        self._bytes += table.nbytes
+        while self._bytes > self.max_bytes:
+            old_key, (old_table, old_tags, old_created) = self._memory.popitem(last=False)
+            self._bytes -= old_table.nbytes
+            self._stats["evictions"] += 1
+            if self.spill_dir is not None:
+                self._spill(old_key, old_table, old_tags, old_created)
+    
+    def _drop_memory(self, key):
+        table, _, _ = self._memory.pop(key)
+        self._bytes -= table.nbytes
+    
+    def _spill(self, key, table, tags, created):
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        path = self.spill_dir / (hashlib.sha1(repr(key).encode()).hexdigest() + ".arrow")
+        with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        size = path.stat().st_size
+        self._spilled[key] = (path, size, tags, created)
+        self._spill_bytes += size
+        self._stats["spills"] += 1
+        while self._spill_bytes > self.max_spill_bytes:
+            old_path, old_size, _, _ = self._spilled.popitem(last=False)[1]
+            old_path.unlink(missing_ok=True)
+            self._spill_bytes -= old_size
+    
+    def clear(self):
+        with self._lock:
+            for path, _, _, _ in self._spilled.values():
+                path.unlink(missing_ok=True)
+            self._memory.clear()
+            self._spilled.clear()
+            self._bytes = self._spill_bytes = 0
+    
+    def stats(self):
+        """Hit/miss counters plus current entry counts and sizes."""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["spill_hits"] + self._stats["misses"]
+            return dict(
+                self._stats,
+                hit_rate=(self._stats["hits"] + self._stats["spill_hits"]) / lookups if lookups else 0.0,
+                entries=len(self._memory),
+                bytes=self._bytes,
+                spilled_entries=len(self._spilled),
+                spilled_bytes=self._spill_bytes,
+            )
+
+
+QUERY_CACHE = QueryCache()
+
+
+def execute_query(sql, params=None, db_path=None, read_only=False, stream=False,
+                  batch_size=STREAM_BATCH_SIZE, cache=False):
+    """Run a query on the calling thread's pooled cursor and return Arrow.
+    
+    Returns a pyarrow.Table, or with stream=True a pyarrow.RecordBatchReader
+    that fetches `batch_size` rows at a time from its own cursor. `params`
+    binds `?` placeholders (list) or `$name` placeholders (dict).
+    read_only=True opens the file read-only; DuckDB cannot mix read-only and
+    read-write connections to one file in a process, so use it for
+    query-only processes.
+    
+    cache=True serves repeated queries from QUERY_CACHE (or pass a
+    QueryCache); entries are invalidated when a table they read is reloaded.
+    """
+    pool = get_pool(db_path, read_only)
+    if not stream:
+        if not cache:
+            return pool.cursor().execute(sql, params).arrow()
+        cache = QUERY_CACHE if cache is True else cache
+        key = cache.key(sql, params, db_path)
+        tables = referenced_tables(sql)
+        result = cache.get(key, tables)
+        if result is None:
+            # Tag with the versions seen before running, so a concurrent load marks it stale
+            versions_before = table_versions(tables)
+            result = pool.cursor().execute(sql, params).arrow()
+            if table_versions(tables) == versions_before:
+                cache.put(key, result, tables)
+        return result
+    
+    cursor = pool.connection().cursor()
+    reader = cursor.execute(sql, params).fetch_record_batch(batch_size)
+    
+    def batches():
+        try:
+            yield from reader
+        finally:
+            cursor.close()
+    
+    return pa.RecordBatchReader.from_batches(reader.schema, batches())
+
+
+def ensure_enum_types(conn):
+    """Create one ENUM type per categorical column, using the enums in src.models.schemas."""
+    existing = {
+        row[0] for row in conn.execute("SELECT type_name FROM duckdb_types()").fetchall()
+    }
+    for column, enum in CATEGORICAL_COLUMNS.items():
+        if f"{column}_enum" not in existing:
+            values = ", ".join("'" + e.value.replace("'", "''") + "'" for e in enum)
+            conn.execute(f"CREATE TYPE {column}_enum AS ENUM ({values})")
+
+
+def _select_columns(conn, relation, compact):
+    """SELECT list for a load; compact loads cast categorical columns to their ENUM types."""
+    if not compact:
+        return "*"
+    ensure_enum_types(conn)
+    columns = [row[0] for row in conn.execute(f"DESCRIBE SELECT * FROM {relation}").fetchall()]
+    casts = [
+        f"CAST({c} AS {c}_enum) AS {c}" for c in columns if c in CATEGORICAL_COLUMNS
+    ]
+    return f"* REPLACE ({', '.join(casts)})" if casts else "*"
+
+
+def parquet_files(path):
+    """Resolve a Parquet file, directory of part files or glob pattern to a sorted file list."""
+    path = Path(path)
+    if path.is_dir():
+        return sorted(str(p) for p in path.glob("**/*.parquet"))
+    if glob.has_magic(str(path)):
+        return sorted(glob.glob(str(path), recursive=True))
+    return [str(path)] if path.exists() else []
+
+
+def parquet_row_count(path):
+    """Total rows across a Parquet dataset, read from file footers without scanning data."""
+    return sum(pq.read_metadata(f).num_rows for f in parquet_files(path))
+
+
+def _parquet_source(path):
+    """read_parquet() argument for a file, directory or glob."""
+    if Path(path).is_dir():
+        path = Path(path) / "**" / "*.parquet"
+    return f"'{path}'"
+
+
+def load_parquet_to_table(table_name, parquet_path, schema="raw", db_path=None, compact=False,
+                          conn=None):
+    """Load parquet file (or directory/glob of part files) to DuckDB table.
+    
+    With compact=True (for `generate_data.py --compact` output) categorical
+    columns are stored as ENUMs; surrogate *_key columns keep their integer types.
+    Pass `conn` to reuse an open connection or cursor instead of opening one.
+    """
+    if conn is None:
+        with db_connection(db_path) as conn:
+            return load_parquet_to_table(table_name, parquet_path, schema, compact=compact, conn=conn)
+    
+    source = _parquet_source(parquet_path)
+    loading = Span("load", accumulate=True, table=table_name)
+    with loading:
         conn.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+        _drop_view(conn, schema, table_name)
         conn.execute(f"""
             CREATE OR REPLACE TABLE {schema}.{table_name} AS
-            SELECT * FROM read_parquet('{parquet_path}')
+            SELECT {_select_columns(conn, f"read_parquet({source})", compact)} FROM read_parquet({source})
         """)
-        result = conn.execute(f"SELECT COUNT(*) FROM {schema}.{table_name}").fetchone()
-        return result[0]
+    if table_exists(conn, schema, MANIFEST_TABLE):
+        # The table no longer matches what incremental loads recorded
+        conn.execute(f"DELETE FROM {schema}.{MANIFEST_TABLE} WHERE table_name = ?", [table_name])
+    bump_table_version(schema, table_name)
+    with span("count", table=table_name) as counting:
+        counting.rows = parquet_row_count(parquet_path)
+    loading.rows = counting.rows
+    loading.bytes = sum(os.path.getsize(f) for f in parquet_files(parquet_path))
+    loading.emit()
+    return counting.rows
+
+
+def load_arrow_to_table(table_name, data, schema="raw", db_path=None, compact=False, conn=None,
+                        validate=True):
+    """Materialize Arrow data as a DuckDB table without going through files.
+    
+    `data` is a pyarrow.Table, a RecordBatchReader or an iterable of record
+    batches; readers and iterables are consumed batch by batch as DuckDB
+    scans them, so they are never held in memory whole. compact=True casts
+    categorical columns to ENUMs as load_parquet_to_table does. Tables
+    declared in src.models.schemas are validated batch by batch unless
+    validate=False. Returns the number of rows loaded.
+    """
+    if conn is None:
+        with db_connection(db_path) as conn:
+            return load_arrow_to_table(table_name, data, schema, compact=compact, conn=conn,
+                                       validate=validate)
+    
+    declared = table_schema(table_name, compact) if validate and table_name in TABLES else None
+    if isinstance(data, pa.Table) and declared is not None:
+        data = validate_batch(data, declared)
+    rows = data.num_rows if isinstance(data, pa.Table) else 0
+    nbytes = data.nbytes if isinstance(data, pa.Table) else 0
+    invalid = None
+    if not isinstance(data, pa.Table):
+        batches = iter(data)
+        if isinstance(data, pa.RecordBatchReader):
+            arrow_schema = data.schema
+        else:
+            first = next(batches, None)
+            if first is None:
+                return 0
+            arrow_schema, batches = first.schema, itertools.chain([first], batches)
+        if declared is not None:
+            arrow_schema = declared.with_metadata(arrow_schema.metadata)
+        
+        def counted():
+            nonlocal rows, nbytes, invalid
+            for batch in batches:
+                if declared is not None:
+                    try:
+                        batch = validate_batch(batch, arrow_schema)
+                    except ValueError as exc:
+                        invalid = exc
+                        raise
+                rows += batch.num_rows
+                nbytes += batch.nbytes
+                yield batch
+        
+        data = pa.RecordBatchReader.from_batches(arrow_schema, counted())
+    
+    view = f"_arrow_{table_name}"
+    conn.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+    conn.register(view, data)
+    try:
+        with span("load", table=table_name) as loading:
+            _drop_view(conn, schema, table_name)
+            conn.execute(f"""
+                CREATE OR REPLACE TABLE {schema}.{table_name} AS
+                SELECT {_select_columns(conn, view, compact)} FROM {view}
+            """)
+            loading.rows, loading.bytes = rows, nbytes
+    except duckdb.Error:
+        # DuckDB wraps errors raised inside the Arrow scan; surface the schema violation itself
+        if invalid is not None:
+            raise invalid from None
+        raise
+    finally:
+        conn.unregister(view)
+    if table_exists(conn, schema, MANIFEST_TABLE):
+        conn.execute(f"DELETE FROM {schema}.{MANIFEST_TABLE} WHERE table_name = ?", [table_name])
+    bump_table_version(schema, table_name)
+    return rows
+
+
+def ensure_manifest(conn, schema="raw"):
+    """Create the per-schema manifest of ingested Parquet files."""
+    conn.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.{MANIFEST_TABLE} (
+            table_name VARCHAR,
+            file_path VARCHAR,
+            file_size BIGINT,
+            modified_ns BIGINT,
+            min_partition DATE,
+            max_partition DATE,
+            row_count BIGINT,
+            loaded_at TIMESTAMP
+        )
+    """)
+
+
+def load_metadata(db_path=None, schema="raw", conn=None):
+    """{table: last loaded_at} for tables loaded incrementally into `schema`.
+    
+    Tables last loaded with load_parquet_to_table have no entry, so callers
+    should treat them as changed.
+    """
+    if conn is None:
+        with db_connection(db_path) as conn:
+            return load_metadata(schema=schema, conn=conn)
+    if not table_exists(conn, schema, MANIFEST_TABLE):
+        return {}
+    return dict(conn.execute(
+        f"SELECT table_name, MAX(loaded_at) FROM {schema}.{MANIFEST_TABLE} GROUP BY 1"
+    ).fetchall())
+
+
+def table_exists(conn, schema, table_name):
+    """Whether `schema.table_name` exists on this connection."""
+    return conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = ? AND table_name = ?",
+        [schema, table_name],
+    ).fetchone()[0] > 0
+
+
+def table_type(conn, schema, table_name):
+    """'BASE TABLE', 'VIEW' or None if `schema.table_name` does not exist."""
+    row = conn.execute(
+        "SELECT table_type FROM information_schema.tables WHERE table_schema = ? AND table_name = ?",
+        [schema, table_name],
+    ).fetchone()
+    return None if row is None else row[0]
+
+
+def _drop_view(conn, schema, table_name):
+    """Drop `schema.table_name` if it is a view (e.g. inventory_snapshots over intervals)."""
+    if table_type(conn, schema, table_name) == "VIEW":
+        conn.execute(f"DROP VIEW {schema}.{table_name}")
+
+
+def _file_list(files):
+    return "[" + ", ".join(f"'{f}'" for f in files) + "]"
+
+
+def _partition_ranges(conn, files, column):
+    """{file: (min date, max date)} of a partition column, in one scan of that column."""
+    if column is None:
+        return {f: (None, None) for f in files}
+    rows = conn.execute(f"""
+        SELECT filename, MIN(CAST({column} AS DATE)), MAX(CAST({column} AS DATE))
+        FROM read_parquet({_file_list(files)}, filename = true)
+        GROUP BY filename
+    """).fetchall()
+    ranges = {f: (None, None) for f in files}
+    ranges.update({path: (lo, hi) for path, lo, hi in rows})
+    return ranges
+
+
+def _record_files(conn, schema, table_name, files, ranges):
+    conn.executemany(
+        f"DELETE FROM {schema}.{MANIFEST_TABLE} WHERE table_name = ? AND file_path = ?",
+        [[table_name, f] for f in files],
+    )
+    conn.executemany(
+        f"INSERT INTO {schema}.{MANIFEST_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, current_timestamp)",
+        [
+            [table_name, f, os.stat(f).st_size, os.stat(f).st_mtime_ns, *ranges[f],
+             pq.read_metadata(f).num_rows]
+            for f in files
+        ],
+    )
+
+
+def load_parquet_incremental(table_name, parquet_path, schema="raw", db_path=None,
+                             compact=False, conn=None):
+    """Load only the Parquet files that are new or changed since the last load.
+    
+    Files are tracked in `{schema}._load_manifest` by path, size and mtime.
+    For fact tables in PARTITION_COLUMNS, the days covered by changed files
+    (and by their previous versions) are deleted and re-inserted from every
+    file overlapping them, so reruns are idempotent. Other tables are fully
+    reloaded when any of their files changes. Returns the rows inserted.
+    """
+    if conn is None:
+        with db_connection(db_path) as conn:
+            return load_parquet_incremental(table_name, parquet_path, schema, compact=compact,
+                                            conn=conn)
+    
+    ensure_manifest(conn, schema)
+    files = [os.path.abspath(f) for f in parquet_files(parquet_path)]
+    loaded = {
+        row[0]: row[1:] for row in conn.execute(f"""
+            SELECT file_path, file_size, modified_ns, min_partition, max_partition
+            FROM {schema}.{MANIFEST_TABLE} WHERE table_name = ?
+        """, [table_name]).fetchall()
+    }
+    changed = [
+        f for f in files
+        if loaded.get(f, (None, None))[:2] != (os.stat(f).st_size, os.stat(f).st_mtime_ns)
+    ]
+    if not changed:
+        return 0
+    
+    column = PARTITION_COLUMNS.get(table_name)
+    loading = Span("load_incremental", accumulate=True, table=table_name)
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        if column is None or table_type(conn, schema, table_name) != "BASE TABLE":
+            load_parquet_to_table(table_name, parquet_path, schema, compact=compact, conn=conn)
+            conn.execute(f"DELETE FROM {schema}.{MANIFEST_TABLE} WHERE table_name = ?",
+                         [table_name])
+            _record_files(conn, schema, table_name, files, _partition_ranges(conn, files, column))
+            inserted = parquet_row_count(parquet_path)
+        else:
+            ranges = _partition_ranges(conn, changed, column)
+            windows = list(ranges.values()) + [loaded[f][2:] for f in changed if f in loaded]
+            windows = [(lo, hi) for lo, hi in windows if lo is not None]
+            predicate = " OR ".join(
+                f"CAST({column} AS DATE) BETWEEN '{lo}' AND '{hi}'" for lo, hi in windows
+            ) or "FALSE"
+            overlapping = [
+                f for f, (_, _, lo, hi) in loaded.items()
+                if f in files and f not in changed and lo is not None
+                and any(lo <= w_hi and w_lo <= hi for w_lo, w_hi in windows)
+            ]
+            source = _file_list(changed + overlapping)
+            with loading:
+                conn.execute(f"DELETE FROM {schema}.{table_name} WHERE {predicate}")
+                inserted = conn.execute(f"""
+                    INSERT INTO {schema}.{table_name} BY NAME
+                    SELECT {_select_columns(conn, f"read_parquet({source})", compact)} FROM read_parquet({source})
+                    WHERE {predicate}
+                """).fetchone()[0]
+            loading.rows = inserted
+            loading.bytes = sum(os.path.getsize(f) for f in changed + overlapping)
+            loading.emit()
+            _record_files(conn, schema, table_name, changed, ranges)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    bump_table_version(schema, table_name)
+    return inserted
+
+
+# Inventory interval storage: one row per (store, product) run of identical daily values
+INVENTORY_INTERVALS_TABLE = "inventory_intervals"
+INVENTORY_KEYS = ["store_id", "product_id"]
+INVENTORY_VALUES = [
+    "quantity_on_hand", "quantity_reserved", "quantity_available",
+    "reorder_point", "safety_stock", "days_of_supply",
+]
+
+
+def _interval_sql(source):
+    """Collapse daily inventory rows from `source` into valid_from/valid_to intervals."""
+    keys, values = ", ".join(INVENTORY_KEYS), ", ".join(INVENTORY_VALUES)
+    same = " AND ".join(f"{v} IS NOT DISTINCT FROM LAG({v}) OVER w" for v in INVENTORY_VALUES)
+    return f"""
+        WITH daily AS (
+            SELECT CAST(CAST(snapshot_date AS TIMESTAMP) AS DATE) AS snapshot_date, {keys}, {values}
+            FROM {source}
+        ),
+        flagged AS (
+            SELECT *,
+                CASE WHEN LAG(snapshot_date) OVER w = snapshot_date - 1 AND {same}
+                     THEN 0 ELSE 1 END AS starts
+            FROM daily
+            WINDOW w AS (PARTITION BY {keys} ORDER BY snapshot_date)
+        ),
+        islands AS (
+            SELECT *, SUM(starts) OVER (
+                PARTITION BY {keys} ORDER BY snapshot_date ROWS UNBOUNDED PRECEDING
+            ) AS island
+            FROM flagged
+        )
+        SELECT {keys}, MIN(snapshot_date) AS valid_from, MAX(snapshot_date) AS valid_to,
+               {", ".join(f"ANY_VALUE({v}) AS {v}" for v in INVENTORY_VALUES)}
+        FROM islands
+        GROUP BY {keys}, island
+    """
+
+
+def _expanded_intervals_sql(intervals, where="TRUE", start="valid_from", end="valid_to"):
+    """One row per day of `start`..`end` for each interval matching `where`."""
+    columns = ", ".join(INVENTORY_KEYS + INVENTORY_VALUES)
+    return f"""
+        SELECT CAST(day AS DATE) AS snapshot_date, {columns}
+        FROM (
+            SELECT UNNEST(generate_series(
+                CAST({start} AS TIMESTAMP), CAST({end} AS TIMESTAMP), INTERVAL 1 DAY
+            )) AS day, *
+            FROM {intervals}
+            WHERE {where}
+        )
+    """
+
+
+def create_inventory_views(conn, schema="raw"):
+    """Table macros and an inventory_snapshots view over the intervals.
+    
+    inventory_as_of(day) and inventory_between(start_day, end_day) filter
+    intervals on valid_from/valid_to before expanding them, so they only
+    touch the intervals overlapping the requested days. The view expands
+    every interval into one row per day so models written against daily
+    snapshots keep working, but a snapshot_date filter on it is applied
+    after the expansion; day or range reads should use the macros or join
+    inventory_intervals on valid_from/valid_to instead.
+    """
+    intervals = f"{schema}.{INVENTORY_INTERVALS_TABLE}"
+    columns = ", ".join(INVENTORY_KEYS + INVENTORY_VALUES)
+    if table_type(conn, schema, "inventory_snapshots") == "BASE TABLE":
+        conn.execute(f"DROP TABLE {schema}.inventory_snapshots")
+    conn.execute(f"""
+        CREATE OR REPLACE MACRO {schema}.inventory_as_of(day) AS TABLE
+        SELECT CAST(day AS DATE) AS snapshot_date, {columns}
+        FROM {intervals}
+        WHERE valid_from <= CAST(day AS DATE) AND valid_to >= CAST(day AS DATE)
+    """)
+    conn.execute(f"""
+        CREATE OR REPLACE MACRO {schema}.inventory_between(start_day, end_day) AS TABLE
+        {_expanded_intervals_sql(
+            intervals,
+            where="valid_from <= CAST(end_day AS DATE) AND valid_to >= CAST(start_day AS DATE)",
+            start="GREATEST(valid_from, CAST(start_day AS DATE))",
+            end="LEAST(valid_to, CAST(end_day AS DATE))",
+        )}
+    """)
+    conn.execute(f"""
+        CREATE OR REPLACE VIEW {schema}.inventory_snapshots AS
+        {_expanded_intervals_sql(intervals)}
+    """)
+
+
+def load_inventory_intervals(parquet_path, schema="raw", db_path=None, conn=None):
+    """Load daily inventory snapshots as change intervals in `{schema}.inventory_intervals`.
+    
+    Only files not yet in the load manifest are read. New days after the
+    stored history extend each key's open interval when its values are
+    unchanged; anything else (first load, rewritten or back-dated files)
+    rebuilds the intervals from all files. Returns the interval rows written.
+    """
+    if conn is None:
+        with db_connection(db_path) as conn:
+            return load_inventory_intervals(parquet_path, schema, conn=conn)
+    
+    ensure_manifest(conn, schema)
+    files = [os.path.abspath(f) for f in parquet_files(parquet_path)]
+    loaded = {
+        row[0]: row[1:] for row in conn.execute(f"""
+            SELECT file_path, file_size, modified_ns FROM {schema}.{MANIFEST_TABLE}
+            WHERE table_name = ?
+        """, [INVENTORY_INTERVALS_TABLE]).fetchall()
+    }
+    changed = [
+        f for f in files if loaded.get(f) != (os.stat(f).st_size, os.stat(f).st_mtime_ns)
+    ]
+    if not changed:
+        return 0
+    
+    target = f"{schema}.{INVENTORY_INTERVALS_TABLE}"
+    keys = " AND ".join(f"i.{k} = n.{k}" for k in INVENTORY_KEYS)
+    same = " AND ".join(f"i.{v} IS NOT DISTINCT FROM n.{v}" for v in INVENTORY_VALUES)
+    ranges = _partition_ranges(conn, changed, "snapshot_date")
+    first_new = min(lo for lo, _ in ranges.values() if lo is not None)
+    
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        history_end = None
+        if table_exists(conn, schema, INVENTORY_INTERVALS_TABLE) and not set(changed) & set(loaded):
+            history_end = conn.execute(f"SELECT MAX(valid_to) FROM {target}").fetchone()[0]
+        
+        if history_end is None or first_new <= history_end:
+            conn.execute(f"""
+                CREATE OR REPLACE TABLE {target} AS
+                {_interval_sql(f"read_parquet({_file_list(files)})")}
+                ORDER BY valid_from, store_id, product_id
+            """)
+            conn.execute(f"DELETE FROM {schema}.{MANIFEST_TABLE} WHERE table_name = ?",
+                         [INVENTORY_INTERVALS_TABLE])
+            _record_files(conn, schema, INVENTORY_INTERVALS_TABLE, files,
+                          _partition_ranges(conn, files, "snapshot_date"))
+            written = conn.execute(f"SELECT COUNT(*) FROM {target}").fetchone()[0]
+        else:
+            conn.execute(f"""
+                CREATE TEMP TABLE new_intervals AS
+                {_interval_sql(f"read_parquet({_file_list(changed)})")}
+            """)
+            # A key's first new interval continues its open interval if nothing changed
+            conn.execute(f"""
+                CREATE TEMP TABLE continued AS
+                SELECT n.* FROM new_intervals n JOIN {target} i
+                ON {keys} AND i.valid_to = n.valid_from - 1 AND {same}
+            """)
+            conn.execute(f"""
+                UPDATE {target} i SET valid_to = n.valid_to
+                FROM continued n WHERE {keys} AND i.valid_to = n.valid_from - 1
+            """)
+            written = conn.execute(f"""
+                INSERT INTO {target}
+                SELECT * FROM new_intervals ANTI JOIN continued USING (store_id, product_id, valid_from)
+                ORDER BY valid_from, store_id, product_id
+            """).fetchone()[0]
+            conn.execute("DROP TABLE new_intervals")
+            conn.execute("DROP TABLE continued")
+            _record_files(conn, schema, INVENTORY_INTERVALS_TABLE, changed, ranges)
+        
+        create_inventory_views(conn, schema)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    bump_table_version(schema, INVENTORY_INTERVALS_TABLE)
+    return written
+
+
+def inventory_as_of(day, store_ids=None, product_ids=None, db_path=None, schema="raw",
+                    cache=False):
+    """Full inventory snapshot for `day` rebuilt from the intervals, as a pyarrow.Table.
+    
+    Same rows as the inventory_as_of macro, but queried from the intervals
+    table directly so cached results are tagged with its version.
+    """
+    sql = f"""
+        SELECT CAST(? AS DATE) AS snapshot_date, {", ".join(INVENTORY_KEYS + INVENTORY_VALUES)}
+        FROM {schema}.{INVENTORY_INTERVALS_TABLE}
+        WHERE valid_from <= CAST(? AS DATE) AND valid_to >= CAST(? AS DATE)
+    """
+    params = [day, day, day]
+    filters = []
+    for column, values in (("store_id", store_ids), ("product_id", product_ids)):
+        if values is not None:
+            values = [values] if isinstance(values, str) else list(values)
+            filters.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    if filters:
+        sql += " AND " + " AND ".join(filters)
+    return execute_query(sql + " ORDER BY store_id, product_id", params, db_path=db_path, cache=cache)
+
+
+# Streaming landing zone: <landing>/<table>/<landed_ns>-<run_id>-<seq>.parquet, renamed into
+# place once complete so a tailing loader never reads a partial file; run_id keeps
+# concurrent streams landing in one directory apart
+LANDING_DIR = os.getenv("LANDING_DIR", "data/landing")
+LANDED_FILE = "{landed_ns:019d}-{run_id:04d}-{seq:06d}.parquet"
+FIRST_EVENT_KEY = b"first_event_ns"
+TAIL_POLL_SECONDS = 0.1
+
+
+def landed_at_ns(path):
+    """Wall-clock time (ns) a micro-batch file was renamed into the landing zone."""
+    return int(Path(path).name.split("-", 1)[0])
+
+
+def landed_files(landing_dir, exclude=()):
+    """{table: [micro-batch files not in `exclude`, oldest first]} under `landing_dir`."""
+    files = {}
+    if not Path(landing_dir).is_dir():
+        return files
+    for directory in sorted(p for p in Path(landing_dir).iterdir() if p.is_dir()):
+        paths = (os.path.abspath(f) for f in glob.glob(str(directory / "*.parquet")))
+        new = sorted(f for f in paths if f not in exclude)
+        if new:
+            files[directory.name] = new
+    return files
 
 
-def initialize_warehouse(data_dir="data/sample", db_path=None):
-    """Initialize warehouse with sample data."""
+def load_landed(landing_dir=LANDING_DIR, schema="raw", db_path=None, conn=None, seen=None):
+    """Append micro-batches that landed since the last call to `{schema}.<table>`, in one transaction.
+    
+    Files are recorded in the load manifest with their partition ranges, so
+    the next incremental fact_sales build picks up streamed days too. `seen`
+    (a set of loaded paths, updated in place) saves re-reading the manifest
+    on every poll. Tables declared in src.models.schemas are checked from
+    Parquet footers first. Returns one dict per file with its rows and its
+    landing-to-queryable latency in seconds.
+    """
+    if conn is None:
+        with db_connection(db_path) as conn:
+            return load_landed(landing_dir, schema, conn=conn, seen=seen)
+    
+    ensure_manifest(conn, schema)
+    if seen is None:
+        seen = set()
+    if not seen:
+        seen.update(row[0] for row in conn.execute(
+            f"SELECT file_path FROM {schema}.{MANIFEST_TABLE}"
+        ).fetchall())
+    batches = landed_files(landing_dir, seen)
+    if not batches:
+        return []
+    
+    with span("load_landed") as loading:
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            for table, files in batches.items():
+                if table in TABLES:
+                    validate_parquet_metadata(files, table_schema(table))
+                source = f"read_parquet({_file_list(files)})"
+                if table_exists(conn, schema, table):
+                    conn.execute(f"INSERT INTO {schema}.{table} BY NAME SELECT * FROM {source}")
+                else:
+                    conn.execute(f"CREATE TABLE {schema}.{table} AS SELECT * FROM {source}")
+                ranges = _partition_ranges(conn, files, PARTITION_COLUMNS.get(table))
+                _record_files(conn, schema, table, files, ranges)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        queryable_ns = time.time_ns()
+        
+        loaded = []
+        for table, files in batches.items():
+            bump_table_version(schema, table)
+            for f in files:
+                metadata = pq.read_metadata(f)
+                first_event = (metadata.metadata or {}).get(FIRST_EVENT_KEY)
+                loaded.append({
+                    "table": table,
+                    "file": f,
+                    "rows": metadata.num_rows,
+                    "latency_seconds": (queryable_ns - landed_at_ns(f)) / 1e9,
+                    "event_latency_seconds":
+                        (queryable_ns - int(first_event)) / 1e9 if first_event else None,
+                })
+                seen.add(f)
+        loading.rows = sum(item["rows"] for item in loaded)
+        loading.bytes = sum(os.path.getsize(item["file"]) for item in loaded)
+    return loaded
+
+
+def tail_landing(landing_dir=LANDING_DIR, schema="raw", db_path=None,
+                 poll_seconds=TAIL_POLL_SECONDS, stop=None, on_load=None):
+    """Keep loading new micro-batches from `landing_dir` until `stop` (an Event) is set.
+    
+    Polls every `poll_seconds` while idle; a backlog is loaded in one
+    transaction per poll, so latency stays bounded as files pile up. Files
+    that landed before `stop` was set are loaded before returning.
+    `on_load` receives each non-empty result of load_landed. Returns the
+    number of files loaded.
+    """
+    seen = set()
+    count = 0
+    with db_connection(db_path) as conn:
+        # Loads run every poll; a progress bar would just be noise
+        conn.execute("SET enable_progress_bar = false")
+        while True:
+            stopping = stop is not None and stop.is_set()
+            loaded = load_landed(landing_dir, schema, conn=conn, seen=seen)
+            count += len(loaded)
+            if loaded and on_load is not None:
+                on_load(loaded)
+            if stopping:
+                return count
+            if not loaded:
+                time.sleep(poll_seconds)
+
+
+def bulk_load(tables, schema="raw", db_path=None, compact=False, max_workers=None,
+              incremental=False, inventory_intervals=False, validate=False):
+    """Load several Parquet datasets concurrently over one DuckDB connection.
+    
+    `tables` maps table name to a Parquet file, directory or glob. Each table
+    is loaded on its own cursor of a shared connection, and row counts come
+    from Parquet metadata. Returns {table: rows} in the order given; with
+    incremental=True tables go through load_parquet_incremental and the
+    counts are rows inserted by this run. inventory_intervals=True stores
+    inventory_snapshots as change intervals (see load_inventory_intervals)
+    and counts interval rows written. validate=True first checks the files
+    of tables declared in src.models.schemas against their schemas, from
+    Parquet footers only (see validate_parquet_metadata).
+    """
+    loader = load_parquet_incremental if incremental else load_parquet_to_table
+    with db_connection(db_path) as conn:
+        conn.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+        if compact:
+            ensure_enum_types(conn)
+        if incremental or inventory_intervals:
+            ensure_manifest(conn, schema)
+        
+        def load(item):
+            table, path = item
+            if validate and table in TABLES:
+                with span("validate", table=table):
+                    validate_parquet_metadata(parquet_files(path), table_schema(table, compact))
+            cursor = conn.cursor()
+            try:
+                with span("table", table=table) as s:
+                    if inventory_intervals and table == "inventory_snapshots":
+                        s.rows = load_inventory_intervals(path, schema, conn=cursor)
+                    else:
+                        s.rows = loader(table, path, schema, compact=compact, conn=cursor)
+                return table, s.rows
+            finally:
+                cursor.close()
+        
+        # Each load runs in a copy of this context so its spans nest under the caller's
+        contexts = [contextvars.copy_context() for _ in tables]
+        with ThreadPoolExecutor(max_workers or len(tables) or 1) as pool:
+            return dict(pool.map(lambda context, item: context.run(load, item),
+                                 contexts, tables.items()))
+
+
+def initialize_warehouse(data_dir="data/sample", db_path=None, compact=False, incremental=False,
+                         inventory_intervals=False):
+    """Initialize warehouse with sample data (or append new files with incremental=True).
+    
+    Files are checked against the table schemas in src.models.schemas before loading.
+    """
     data_path = Path(data_dir)
     
     tables = [
@@ -51,14 +1087,35 @@ def initialize_warehouse(data_dir="data/sample", db_path=None):
         ("page_views", "page_views.parquet"),
     ]
     
-    print("Initializing warehouse...")
+    sources = {}
     for table, filename in tables:
-        path = data_path / filename
-        if path.exists():
-            rows = load_parquet_to_table(table, str(path), db_path=db_path)
-            print(f"  ✓ {table}: {rows:,} rows")
+        if (data_path / table).is_dir():
+            # Sharded output from `generate_data.py --workers N`
+            sources[table] = str(data_path / table)
+        elif (data_path / filename).exists():
+            sources[table] = str(data_path / filename)
+    
+    print("Initializing warehouse...")
+    with span("initialize_warehouse") as s:
+        loaded = bulk_load(sources, db_path=db_path, compact=compact, incremental=incremental,
+                           inventory_intervals=inventory_intervals, validate=True)
+        s.rows = sum(loaded.values())
+    for table, rows in loaded.items():
+        print(f"  ✓ {table}: {rows:,} {'new ' if incremental else ''}rows")
     print("✅ Done!")
+    return loaded
 
 
 if __name__ == "__main__":
-    initialize_warehouse()
\ No newline at end of file
+    if "--tail" in sys.argv:
+        # Ctrl-C to stop; see src/ingestion/stream_events.py for the producer
+        try:
+            tail_landing(on_load=lambda loaded: print(f"  ✓ {len(loaded)} micro-batches"))
+        except KeyboardInterrupt:
+            pass
+    else:
+        initialize_warehouse(
+            incremental="--incremental" in sys.argv,
+            inventory_intervals="--inventory-intervals" in sys.argv,
+        )
+    write_prometheus()
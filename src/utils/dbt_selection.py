@@ -0,0 +1,137 @@
+"""Pick the dbt models that need rebuilding from the dbt manifest and warehouse load metadata."""
+
+import sys
+import json
+from pathlib import Path
+from dataclasses import dataclass
+
+# Allow running as a script from the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.utils.database import MANIFEST_TABLE, db_connection, load_metadata, table_exists
+
+DBT_DIR = Path(__file__).resolve().parent.parent.parent / "dbt"
+DBT_MANIFEST_PATH = DBT_DIR / "target" / "manifest.json"
+RUNS_TABLE = "_dbt_runs"
+
+
+@dataclass(frozen=True)
+class Model:
+    name: str
+    checksum: str
+    parents: tuple
+    sources: tuple
+
+
+def load_dbt_manifest(path=DBT_MANIFEST_PATH):
+    """Read target/manifest.json as written by `dbt parse` or `dbt compile`."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def model_lineage(manifest):
+    """{model name: Model} in dependency order (parents before children)."""
+    nodes = manifest["nodes"]
+    sources = {
+        uid: f"{source['schema']}.{source.get('identifier') or source['name']}".lower()
+        for uid, source in manifest.get("sources", {}).items()
+    }
+    models = {uid: node for uid, node in nodes.items() if node["resource_type"] == "model"}
+
+    lineage, visiting = {}, set()
+
+    def visit(uid):
+        node = models[uid]
+        if node["name"] in lineage:
+            return
+        if uid in visiting:
+            raise ValueError(f"Cycle in dbt lineage at {node['name']}")
+        visiting.add(uid)
+        upstream = node.get("depends_on", {}).get("nodes", [])
+        for parent in upstream:
+            if parent in models:
+                visit(parent)
+        lineage[node["name"]] = Model(
+            name=node["name"],
+            checksum=node.get("checksum", {}).get("checksum", ""),
+            parents=tuple(models[p]["name"] for p in upstream if p in models),
+            sources=tuple(sources[p] for p in upstream if p in sources),
+        )
+
+    for uid in sorted(models):
+        visit(uid)
+    return lineage
+
+
+def _ensure_runs(conn, schema):
+    conn.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.{RUNS_TABLE} (
+            model_name VARCHAR, checksum VARCHAR, succeeded_at TIMESTAMP
+        )
+    """)
+
+
+def last_model_runs(conn, schema="raw"):
+    """{model: (succeeded_at, checksum)} of each model's last successful build."""
+    if not table_exists(conn, schema, RUNS_TABLE):
+        return {}
+    return {
+        name: (succeeded_at, checksum) for name, succeeded_at, checksum in conn.execute(f"""
+            SELECT model_name, succeeded_at, checksum FROM {schema}.{RUNS_TABLE}
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY model_name ORDER BY succeeded_at DESC) = 1
+        """).fetchall()
+    }
+
+
+def _source_changed(source, loads, since, schema):
+    source_schema, _, table = source.partition(".")
+    if source_schema != schema:
+        return True  # no load metadata outside the loaded schema
+    if table == MANIFEST_TABLE:
+        return False  # bookkeeping: the tables it describes are sources in their own right
+    return table not in loads or loads[table] > since
+
+
+def plan_build(lineage, db_path=None, schema="raw"):
+    """(stale models in dependency order, warehouse time the plan was made).
+
+    A model is stale when it has never been built, its SQL checksum changed,
+    a parent model is stale, or one of its sources was loaded after its last
+    successful build. Sources without load metadata count as changed, except
+    the load manifest itself, which models read to find the days to rebuild.
+    """
+    with db_connection(db_path) as conn:
+        planned_at = conn.execute("SELECT CAST(current_timestamp AS TIMESTAMP)").fetchone()[0]
+        loads = load_metadata(schema=schema, conn=conn)
+        runs = last_model_runs(conn, schema)
+
+    stale = []
+    for model in lineage.values():
+        last = runs.get(model.name)
+        if (
+            last is None
+            or last[1] != model.checksum
+            or any(parent in stale for parent in model.parents)
+            or any(_source_changed(s, loads, last[0], schema) for s in model.sources)
+        ):
+            stale.append(model.name)
+    return stale, planned_at
+
+
+def record_model_runs(models, lineage, started_at, db_path=None, schema="raw"):
+    """Mark `models` as successfully built from data loaded up to `started_at`.
+
+    Pass plan_build's planned_at, so loads that land during the build still
+    count as new on the next run.
+    """
+    with db_connection(db_path) as conn:
+        _ensure_runs(conn, schema)
+        conn.executemany(
+            f"INSERT INTO {schema}.{RUNS_TABLE} VALUES (?, ?, ?)",
+            [[name, lineage[name].checksum, started_at] for name in models],
+        )
+
+
+if __name__ == "__main__":
+    print(" ".join(plan_build(model_lineage(load_dbt_manifest()))[0]))
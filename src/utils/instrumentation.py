@@ -0,0 +1,223 @@
+"""Timing spans for pipeline stages, written as JSON lines and Prometheus text-format metrics."""
+
+import os
+import json
+import time
+import fcntl
+import resource
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+# Unset paths turn the corresponding output off; spans still reach capture()
+METRICS_PATH = os.getenv("PIPELINE_METRICS_PATH")
+PROMETHEUS_PATH = os.getenv("PIPELINE_PROMETHEUS_PATH")
+# Once write_prometheus has consumed this much, the JSON lines file is rotated to <path>.1
+METRICS_MAX_BYTES = int(os.getenv("PIPELINE_METRICS_MAX_BYTES", 64 * 1024 ** 2))
+# Labels kept on Prometheus series; run ids and map indexes would explode cardinality
+PROMETHEUS_LABELS = ("dag_id", "task_id", "table")
+PROMETHEUS_METRICS = {
+    "wall_seconds": "Wall-clock time of the stage",
+    "cpu_seconds": "Process CPU time (all threads) during the stage",
+    "peak_rss_delta_bytes": "Growth of the process peak RSS during the stage",
+    "rows": "Rows produced or loaded by the stage",
+    "bytes": "Bytes written or read by the stage",
+    "rows_per_second": "Rows divided by wall-clock time",
+}
+
+_current = contextvars.ContextVar("current_span", default=None)
+_labels = {}
+_listeners = []
+_lock = threading.Lock()
+
+
+def set_labels(**labels):
+    """Labels added to every span this process emits (e.g. the Airflow dag_id and task_id)."""
+    _labels.update(labels)
+
+
+def peak_rss_bytes():
+    """High-water RSS of this process (VmHWM on Linux, ru_maxrss elsewhere)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Span:
+    """Wall time, CPU time, peak RSS growth, rows and bytes of one pipeline stage.
+
+    Use as a context manager; the span is emitted on exit. With
+    accumulate=True it can be entered repeatedly (say, once per batch) and
+    is emitted by calling emit(). Spans inherit labels from the enclosing span.
+    """
+
+    def __init__(self, name, accumulate=False, **labels):
+        parent = _current.get()
+        self.name = name
+        self.parent = parent.name if parent else None
+        self.labels = {**(parent.labels if parent else {}), **labels}
+        self.accumulate = accumulate
+        self.rows = 0
+        self.bytes = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss_delta_bytes = 0
+        self.started_at = None
+        self._emitted = False
+
+    def __enter__(self):
+        if self.started_at is None:
+            self.started_at = time.time()
+        self._token = _current.set(self)
+        self._start = (time.perf_counter(), time.process_time(), peak_rss_bytes())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall, cpu, rss = self._start
+        self.wall_seconds += time.perf_counter() - wall
+        self.cpu_seconds += time.process_time() - cpu
+        self.peak_rss_delta_bytes += peak_rss_bytes() - rss
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.labels["error"] = exc_type.__name__
+        if not self.accumulate or exc_type is not None:
+            self.emit()
+        return False
+
+    def record(self):
+        return {
+            "span": self.name,
+            "parent": self.parent,
+            "started_at": self.started_at,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "peak_rss_delta_bytes": self.peak_rss_delta_bytes,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "rows_per_second": self.rows / self.wall_seconds if self.wall_seconds else 0.0,
+            "pid": os.getpid(),
+            **_labels,
+            **self.labels,
+        }
+
+    def emit(self):
+        """Write the span once to the JSON lines file and any capture() blocks."""
+        if self._emitted:
+            return
+        self._emitted = True
+        record = self.record()
+        for listener in _listeners:
+            listener.append(record)
+        if METRICS_PATH:
+            with _lock, _metrics_lock(METRICS_PATH), open(METRICS_PATH, "a") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+
+@contextmanager
+def _metrics_lock(metrics_path):
+    """Exclusive lock, across processes, on appending to and aggregating `metrics_path`."""
+    Path(metrics_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(f"{metrics_path}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def span(name, **labels):
+    """Context manager timing one stage: `with span("load", table="stores") as s: s.rows = n`."""
+    return Span(name, **labels)
+
+
+def traced(name=None, **labels):
+    """Decorator wrapping each call of a function in a span (named after it by default)."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Span(name or fn.__name__, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def capture():
+    """Collect the records of spans emitted in this process inside the block."""
+    records = []
+    _listeners.append(records)
+    try:
+        yield records
+    finally:
+        _listeners.remove(records)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _prometheus_labels(record):
+    labels = {"span": record["span"]}
+    labels.update({k: record[k] for k in PROMETHEUS_LABELS if record.get(k) is not None})
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+def _replace_text(path, text):
+    tmp = Path(f"{path}.tmp")
+    tmp.parent.mkdir(parents=True, exist_ok=True)
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+def write_prometheus(path=None, metrics_path=None):
+    """Render the latest value of every span series in the JSON lines file as a Prometheus textfile.
+
+    Meant for node_exporter's textfile collector; the file is replaced
+    atomically. The latest values and the offset read so far are kept in
+    <path>.state.json, so each call parses only the spans emitted since the
+    last one, and the JSON lines file is rotated to <metrics_path>.1 once it
+    reaches METRICS_MAX_BYTES. Returns the number of series written.
+    """
+    path, metrics_path = path or PROMETHEUS_PATH, metrics_path or METRICS_PATH
+    if not path or not metrics_path:
+        return 0
+    state_path = Path(f"{path}.state.json")
+    with _metrics_lock(metrics_path):
+        state = json.loads(state_path.read_text()) if state_path.exists() else {}
+        if state.get("metrics_path") != str(metrics_path):
+            state = {}
+        series, offset = state.get("series", {}), state.get("offset", 0)
+        if Path(metrics_path).exists():
+            with open(metrics_path, "rb") as f:
+                if os.fstat(f.fileno()).st_size < offset:
+                    offset = 0  # truncated or replaced behind our back
+                f.seek(offset)
+                new = f.read()
+            offset += len(new)
+            for line in new.splitlines():
+                record = json.loads(line)
+                series[_prometheus_labels(record)] = {m: record[m] for m in PROMETHEUS_METRICS}
+            if offset >= METRICS_MAX_BYTES:
+                os.replace(metrics_path, f"{metrics_path}.1")
+                offset = 0
+        if not series:
+            return 0
+        _replace_text(state_path, json.dumps(
+            {"metrics_path": str(metrics_path), "offset": offset, "series": series}
+        ))
+
+        lines = []
+        for metric, help_text in PROMETHEUS_METRICS.items():
+            lines.append(f"# HELP pipeline_stage_{metric} {help_text}")
+            lines.append(f"# TYPE pipeline_stage_{metric} gauge")
+            for labels, values in series.items():
+                lines.append(f"pipeline_stage_{metric}{labels} {values[metric]}")
+        _replace_text(path, "\n".join(lines) + "\n")
+    return len(series)
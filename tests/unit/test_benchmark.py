@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.benchmarks.suite import (
+    append_history, compare_runs, load_history, measure_stage, run_benchmarks, scale, write_dimensions,
+)
+
+
+def entry(**metrics):
+    return {"timestamp": "2024-01-01T00:00:00", "commit": None, "metrics": metrics}
+
+
+class TestBenchmarkSuite:
+    """Tests for scale-factor benchmarks and regression checks."""
+
+    def test_scale_grows_customers_and_days(self):
+        assert scale(2)["customers"] == 2 * scale(1)["customers"]
+        assert scale(2)["days"] == 2 * scale(1)["days"]
+        assert scale(0.001)["days"] == 1
+
+    def test_run_records_metrics_per_stage(self, tmp_path):
+        run = run_benchmarks([0.01], ["generate_stores"])
+        metrics = run["metrics"]
+        assert metrics["sf0.01/generate_stores/rows"] == scale(0.01)["stores"]
+        assert metrics["sf0.01/generate_stores/rows_per_sec"] > 0
+        assert metrics["sf0.01/generate_stores/peak_rss_mb"] >= 0
+        history = tmp_path / "history.json"
+        append_history(run, history)
+        append_history(run, history)
+        assert len(load_history(history)) == 2
+
+    def test_fact_stage_reads_prewritten_dimensions(self, tmp_path):
+        sizes = scale(0.01)
+        write_dimensions(sizes, tmp_path)
+        assert sorted(p.name for p in (tmp_path / "dimensions").iterdir()) == [
+            "customers.parquet", "products.parquet", "stores.parquet",
+        ]
+        result = measure_stage("generate_inventory", sizes, tmp_path, repeats=1)
+        assert result["rows"] > 0
+        assert result["peak_rss_mb"] >= 0
+
+    def test_compare_flags_slowdowns_past_threshold(self):
+        baseline = entry(**{
+            "sf1/load/seconds": 1.0, "sf1/load/rows_per_sec": 1000.0, "sf1/load/peak_rss_mb": 100.0,
+        })
+        current = entry(**{
+            "sf1/load/seconds": 1.1, "sf1/load/rows_per_sec": 700.0, "sf1/load/peak_rss_mb": 150.0,
+        })
+        regressed = {name for name, *_ in compare_runs(baseline, current, threshold=0.2)}
+        assert regressed == {"sf1/load/rows_per_sec", "sf1/load/peak_rss_mb"}
+
+    def test_compare_ignores_improvements_and_noise(self):
+        baseline = entry(**{"sf1/load/seconds": 2.0, "sf1/tiny/seconds": 0.001})
+        current = entry(**{"sf1/load/seconds": 1.0, "sf1/tiny/seconds": 0.01})
+        assert compare_runs(baseline, current) == []
@@ -0,0 +1,130 @@
+import sys
+from datetime import date
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+import pandas as pd
+from src.analytics.customers import refresh_customers
+from src.utils.database import close_pools, db_connection, load_parquet_incremental
+
+
+def fact_rows(day, customers, amount=10.0, status="delivered", loaded_at="2024-01-11 06:00"):
+    return pd.DataFrame({
+        "transaction_id": [f"TXN-{day}-{c}-{i}" for i, c in enumerate(customers)],
+        "order_id": [f"ORD-{day}-{c}" for c in customers],
+        "customer_id": customers,
+        "transaction_day": pd.to_datetime([day] * len(customers)),
+        "total_amount": amount,
+        "line_profit": amount / 4,
+        "order_status": status,
+        "loaded_at": pd.Timestamp(loaded_at),
+    })
+
+
+def add_facts(path, day, customers, **kwargs):
+    """Append one day of facts as a later dbt build of that day would."""
+    rows = fact_rows(day, customers, loaded_at="2024-01-12 06:00", **kwargs)
+    with db_connection(path) as conn:
+        conn.execute("INSERT INTO marts.fact_sales SELECT * FROM rows")
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "warehouse.duckdb")
+    facts = pd.concat([
+        fact_rows("2024-01-01", ["C1", "C1", "C2", "C3"]),
+        fact_rows("2024-01-02", ["C1", "C2"], status="cancelled"),
+        fact_rows("2024-01-10", ["C1", "C2"], amount=50.0),
+    ])
+    customers = pd.DataFrame({
+        "customer_id": ["C1", "C2", "C3", "C4"],
+        "customer_type": "retail",
+        "loyalty_tier": ["gold", "silver", "bronze", "bronze"],
+    })
+    with db_connection(path) as conn:
+        for schema in ("marts", "raw"):
+            conn.execute(f"CREATE SCHEMA {schema}")
+        conn.execute("CREATE TABLE marts.fact_sales AS SELECT * FROM facts")
+        conn.execute("CREATE TABLE raw.customers AS SELECT * FROM customers")
+    assert refresh_customers(path) is None
+    yield path
+    close_pools()
+
+
+def rfm(path):
+    with db_connection(path) as conn:
+        return conn.execute(
+            "SELECT * FROM customer_analytics.customer_rfm ORDER BY customer_id"
+        ).fetchdf().set_index("customer_id")
+
+
+class TestCustomerAnalytics:
+    """Tests for RFM scoring and incremental customer aggregates."""
+
+    def test_full_refresh_scores_every_customer(self, db_path):
+        scores = rfm(db_path)
+        assert list(scores.index) == ["C1", "C2", "C3", "C4"]
+        # Cancelled lines are not purchases; the two C1 lines on day 1 are one order
+        assert scores.loc["C1", "order_count"] == 2
+        assert scores.loc["C1", "revenue"] == 70.0
+        assert scores.loc["C3", "recency_days"] == 9
+        assert scores.loc["C4", "segment"] == "No Purchases"
+        assert scores.loc["C4", "clv"] == 0
+        # 17.5 profit over a 30-day tenure floor, projected over 3 years
+        assert scores.loc["C1", "clv"] == pytest.approx(17.5 * 365 / 30 * 3)
+        assert scores.loc["C3", "recency_score"] < scores.loc["C1", "recency_score"]
+
+    def test_refresh_without_new_loads_is_noop(self, db_path):
+        assert refresh_customers(db_path) is False
+
+    def test_raw_load_waits_for_dbt(self, db_path, tmp_path):
+        directory = tmp_path / "transactions"
+        directory.mkdir()
+        fact_rows("2024-01-11", ["C3"]).rename(columns={"transaction_day": "transaction_date"}).to_parquet(
+            directory / "part-0.parquet", index=False
+        )
+        load_parquet_incremental("transactions", str(directory), db_path=db_path)
+        assert refresh_customers(db_path) is False
+        add_facts(db_path, "2024-01-11", ["C3"])
+        assert refresh_customers(db_path) == (date(2024, 1, 11), date(2024, 1, 11))
+
+    def test_new_day_merges_incrementally(self, db_path):
+        add_facts(db_path, "2024-01-11", ["C3", "C5"], amount=20.0)
+        assert refresh_customers(db_path) == (date(2024, 1, 11), date(2024, 1, 11))
+        incremental = rfm(db_path)
+        assert incremental.loc["C3", "order_count"] == 2
+        assert incremental.loc["C3", "revenue"] == 30.0
+        refresh_customers(db_path, full_refresh=True)
+        pd.testing.assert_frame_equal(incremental, rfm(db_path))
+
+    def test_reprocessed_day_recomputes_touched_customers(self, db_path):
+        with db_connection(db_path) as conn:
+            conn.execute("DELETE FROM marts.fact_sales WHERE transaction_day = '2024-01-10'")
+        add_facts(db_path, "2024-01-10", ["C1", "C2"], amount=50.0, status="returned")
+        refresh_customers(db_path)
+        incremental = rfm(db_path)
+        assert incremental.loc["C1", "revenue"] == 20.0
+        refresh_customers(db_path, full_refresh=True)
+        pd.testing.assert_frame_equal(incremental, rfm(db_path))
+
+    def test_lookback_rebuild_reads_only_the_window(self, db_path):
+        # dbt's lookback rebuilds the last loaded day alongside the new one
+        with db_connection(db_path) as conn:
+            conn.execute("DELETE FROM marts.fact_sales WHERE transaction_day = '2024-01-10'")
+        add_facts(db_path, "2024-01-10", ["C1", "C2", "C4"], amount=50.0)
+        add_facts(db_path, "2024-01-11", ["C3"], amount=20.0)
+        # An out-of-window change without a new loaded_at must not be read
+        with db_connection(db_path) as conn:
+            conn.execute("UPDATE marts.fact_sales SET total_amount = 1000 WHERE transaction_day = '2024-01-01'")
+        assert refresh_customers(db_path) == (date(2024, 1, 10), date(2024, 1, 11))
+        incremental = rfm(db_path)
+        assert incremental.loc["C1", "order_count"] == 2
+        assert incremental.loc["C1", "revenue"] == 70.0
+        assert incremental.loc["C4", "revenue"] == 50.0
+        with db_connection(db_path) as conn:
+            conn.execute("UPDATE marts.fact_sales SET total_amount = 10 WHERE transaction_day = '2024-01-01'")
+        refresh_customers(db_path, full_refresh=True)
+        pd.testing.assert_frame_equal(incremental, rfm(db_path))
@@ -4,9 +4,20 @@ from pathlib import Path
 # Add project root to Python path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
 import pytest
+import numpy as np
 import pandas as pd
-from src.ingestion.generate_data import generate_products, generate_stores, generate_customers
+import pyarrow.parquet as pq
+from src.ingestion import generate_data
+from src.ingestion.generate_data import (
+    generate_products, generate_stores, generate_customers, generate_transactions,
+    generate_inventory, generate_page_views, iter_transactions, write_dataset, iter_fact_table, write_fact_table,
+    _init_worker, _walk, compact_frame, write_partition, PARTITION_EPOCH, generate_to_warehouse,
+)
+from src.utils.database import db_connection
 
 
 class TestGenerateProducts:
@@ -77,3 +88,279 @@ class TestGenerateCustomers:
         df = generate_customers(100)
         valid_types = ['consumer', 'pro']
         assert df['customer_type'].isin(valid_types).all()
+
+
+class TestFastDimensions:
+    """Tests for the Faker-free dimension generators."""
+    
+    @pytest.fixture(autouse=True)
+    def small_vocabulary(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(generate_data, "VOCAB_PATH", str(tmp_path / "vocab.json"))
+        monkeypatch.setattr(generate_data, "VOCAB_SIZE", 50)
+    
+    @pytest.mark.parametrize("generate,n", [
+        (generate_products, 20), (generate_stores, 10), (generate_customers, 20),
+    ])
+    def test_fast_matches_column_contract(self, generate, n):
+        assert list(generate(n, fast=True).columns) == list(generate(n).columns)
+    
+    def test_fast_customers_unique_ids(self):
+        df = generate_customers(1000, fast=True)
+        assert len(df) == 1000
+        assert df['customer_id'].is_unique
+        assert df['customer_type'].isin(['consumer', 'pro']).all()
+    
+    def test_fast_stores_valid_types(self):
+        df = generate_stores(50, fast=True)
+        assert df['store_id'].is_unique
+        assert df['store_type'].isin(['retail', 'distribution_center', 'fulfillment_center']).all()
+    
+    def test_vocabulary_persisted_and_reused(self, tmp_path):
+        first = generate_data.load_vocabulary()
+        assert (tmp_path / "vocab.json").exists()
+        second = generate_data.load_vocabulary()
+        assert list(first["cities"]) == list(second["cities"])
+
+
+@pytest.fixture(scope="module")
+def dimensions():
+    return generate_products(50), generate_stores(10), generate_customers(100)
+
+
+class TestGenerateTransactions:
+    """Tests for transaction generation."""
+    
+    def test_generate_transactions_has_required_columns(self, dimensions):
+        df = generate_transactions(*dimensions, days=1)
+        required_columns = ['transaction_id', 'order_id', 'customer_id', 'store_id',
+                          'product_id', 'transaction_date', 'quantity', 'unit_price',
+                          'discount_amount', 'total_amount', 'order_status', 'channel',
+                          'fulfillment_type']
+        assert list(df.columns) == required_columns
+    
+    def test_generate_transactions_reproducible(self, dimensions):
+        df1 = generate_transactions(*dimensions, days=2)
+        df2 = generate_transactions(*dimensions, days=2)
+        pd.testing.assert_frame_equal(df1, df2)
+    
+    def test_generate_transactions_unique_ids(self, dimensions):
+        df = generate_transactions(*dimensions, days=2)
+        assert df['transaction_id'].is_unique
+    
+    def test_generate_transactions_distinct_products_per_order(self, dimensions):
+        df = generate_transactions(*dimensions, days=1)
+        assert not df.duplicated(['order_id', 'product_id']).any()
+        assert df.groupby('order_id').size().max() <= 5
+    
+    def test_generate_transactions_in_store_fulfillment(self, dimensions):
+        df = generate_transactions(*dimensions, days=1)
+        in_store = df['channel'] == 'in_store'
+        assert (df.loc[in_store, 'fulfillment_type'] == 'in_store').all()
+        assert df.loc[~in_store, 'fulfillment_type'].isin(['ship_to_home', 'bopis']).all()
+
+
+class TestGenerateInventory:
+    """Tests for inventory snapshot generation."""
+    
+    def test_walk_matches_daily_clamped_updates(self):
+        rng = np.random.default_rng(0)
+        stock = rng.integers(0, 30, size=(4, 6))
+        deltas = rng.integers(-20, 31, size=(25, 4, 6))
+        expected, level = [], stock
+        for delta in deltas:
+            level = np.maximum(0, level + delta)
+            expected.append(level)
+        np.testing.assert_array_equal(_walk(stock, deltas), np.array(expected))
+    
+    def test_generate_inventory_quantities_consistent(self, dimensions):
+        products, stores, _ = dimensions
+        df = generate_inventory(products, stores, days=5)
+        assert (df['quantity_on_hand'] >= 0).all()
+        assert (df['quantity_reserved'] <= df['quantity_on_hand'].clip(upper=20)).all()
+        assert (df['quantity_available'] == df['quantity_on_hand'] - df['quantity_reserved']).all()
+    
+    def test_generate_inventory_full_assortment(self, dimensions):
+        products, stores, _ = dimensions
+        df = generate_inventory(products, stores, days=2, products_per_store=None)
+        assert len(df) == 2 * len(stores) * products['is_active'].sum()
+        assert not df.duplicated(['snapshot_date', 'store_id', 'product_id']).any()
+
+
+class TestGeneratePageViews:
+    """Tests for clickstream generation."""
+    
+    def test_generate_page_views_has_required_columns(self, dimensions):
+        products, _, customers = dimensions
+        df = generate_page_views(products, customers, days=1)
+        required_columns = ['event_id', 'session_id', 'customer_id', 'product_id',
+                          'event_timestamp', 'event_type', 'page_url', 'referrer_url',
+                          'device_type', 'browser']
+        assert list(df.columns) == required_columns
+    
+    def test_generate_page_views_unique_event_ids(self, dimensions):
+        products, _, customers = dimensions
+        df = generate_page_views(products, customers, days=2)
+        assert df['event_id'].is_unique
+    
+    def test_generate_page_views_session_attributes_constant(self, dimensions):
+        products, _, customers = dimensions
+        df = generate_page_views(products, customers, days=1)
+        sessions = df.groupby('session_id')
+        assert (sessions['device_type'].nunique() == 1).all()
+        assert (sessions['browser'].nunique() == 1).all()
+        assert sessions.size().between(3, 15).all()
+    
+    def test_generate_page_views_clickstream_scale(self, dimensions):
+        products, _, customers = dimensions
+        base = generate_page_views(products, customers, days=1)
+        scaled = generate_page_views(products, customers, days=1, clickstream_scale=2)
+        assert scaled['session_id'].nunique() == 2 * base['session_id'].nunique()
+
+
+class TestWriteDataset:
+    """Tests for the streaming Parquet/CSV writer."""
+    
+    def test_write_dataset_row_groups_match_batch_size(self, dimensions, tmp_path):
+        rows = write_dataset(iter_transactions(*dimensions, days=2), tmp_path, "transactions", 5000)
+        metadata = pq.read_metadata(tmp_path / "transactions.parquet")
+        assert metadata.num_rows == rows
+        assert all(metadata.row_group(i).num_rows == 5000 for i in range(metadata.num_row_groups - 1))
+    
+    def test_write_dataset_matches_in_memory_generation(self, dimensions, tmp_path):
+        write_dataset(iter_transactions(*dimensions, days=2), tmp_path, "transactions", 7000)
+        expected = generate_transactions(*dimensions, days=2)
+        pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "transactions.parquet"), expected)
+        assert len(pd.read_csv(tmp_path / "transactions.csv")) == len(expected)
+
+
+class TestShardedGeneration:
+    """Tests for day-range sharding."""
+    
+    START = date(2024, 1, 1)
+    
+    @pytest.mark.parametrize("name", ["transactions", "inventory_snapshots"])
+    def test_shards_match_single_run(self, dimensions, name):
+        whole = pd.concat(iter_fact_table(name, *dimensions, self.START, 4), ignore_index=True)
+        shards = [
+            frame
+            for first_day, days in [(0, 1), (1, 2), (3, 1)]
+            for frame in iter_fact_table(name, *dimensions, self.START, days, first_day)
+        ]
+        pd.testing.assert_frame_equal(pd.concat(shards, ignore_index=True), whole)
+    
+    def test_write_fact_table_workers_write_part_files(self, dimensions, tmp_path):
+        with ProcessPoolExecutor(2, initializer=_init_worker, initargs=dimensions) as executor:
+            rows = write_fact_table("transactions", *dimensions, 3, tmp_path, self.START,
+                                    workers=2, executor=executor)
+        parts = sorted((tmp_path / "transactions").glob("*.parquet"))
+        assert len(parts) == 3
+        combined = pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True)
+        assert len(combined) == rows
+        expected = generate_transactions(*dimensions, days=3, start_date=self.START)
+        pd.testing.assert_frame_equal(combined, expected)
+
+
+    def test_inventory_shards_by_store_block(self, dimensions, tmp_path):
+        with ProcessPoolExecutor(2, initializer=_init_worker, initargs=dimensions) as executor:
+            rows = write_fact_table("inventory_snapshots", *dimensions, 3, tmp_path, self.START,
+                                    workers=2, executor=executor)
+        parts = sorted((tmp_path / "inventory_snapshots").glob("*.parquet"))
+        assert len(parts) == 2
+        # Each part holds whole stores over every day
+        assert all(pd.read_parquet(p)["snapshot_date"].nunique() == 3 for p in parts)
+        keys = ["snapshot_date", "store_id", "product_id"]
+        combined = pd.concat([pd.read_parquet(p) for p in parts]).sort_values(keys, ignore_index=True)
+        expected = generate_inventory(*dimensions[:2], days=3, start_date=self.START)
+        assert len(combined) == rows
+        pd.testing.assert_frame_equal(combined, expected.sort_values(keys, ignore_index=True),
+                                      check_dtype=False)
+
+
+class TestWritePartition:
+    """Tests for Hive-partitioned day extracts."""
+    
+    @pytest.mark.parametrize("name", ["transactions", "inventory_snapshots"])
+    def test_partition_matches_contiguous_run(self, dimensions, tmp_path, name):
+        day = date(2024, 1, 3)
+        rows = write_partition(name, day, tmp_path, *dimensions)
+        written = pd.read_parquet(tmp_path / name / "dt=2024-01-03" / "part-00000.parquet")
+        whole = pd.concat(iter_fact_table(name, *dimensions, PARTITION_EPOCH, 3), ignore_index=True)
+        date_column = "transaction_date" if name == "transactions" else "snapshot_date"
+        expected = whole[pd.to_datetime(whole[date_column]).dt.date == day].reset_index(drop=True)
+        assert rows == len(written)
+        pd.testing.assert_frame_equal(written, expected, check_dtype=False)
+    
+    def test_rewrite_replaces_only_that_partition(self, dimensions, tmp_path):
+        write_partition("transactions", date(2024, 1, 1), tmp_path, *dimensions)
+        write_partition("transactions", date(2024, 1, 2), tmp_path, *dimensions)
+        first = pd.read_parquet(tmp_path / "transactions" / "dt=2024-01-02")
+        write_partition("transactions", date(2024, 1, 2), tmp_path, *dimensions)
+        partitions = sorted(p.name for p in (tmp_path / "transactions").iterdir())
+        assert partitions == ["dt=2024-01-01", "dt=2024-01-02"]
+        pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "transactions" / "dt=2024-01-02"), first)
+    
+    def test_inventory_resumes_from_checkpoint(self, dimensions, tmp_path):
+        name = "inventory_snapshots"
+        whole = pd.concat(iter_fact_table(name, *dimensions, PARTITION_EPOCH, 5), ignore_index=True)
+        days = pd.to_datetime(whole["snapshot_date"]).dt.date
+        write_partition(name, date(2024, 1, 2), tmp_path, *dimensions)
+        checkpoints = tmp_path / "_state" / name
+        assert [p.name for p in checkpoints.iterdir()] == ["dt=2024-01-02.parquet"]
+        # Resumes across the gap left by the unwritten 2024-01-03 and 2024-01-04
+        for day in (date(2024, 1, 5), date(2024, 1, 3)):
+            write_partition(name, day, tmp_path, *dimensions)
+            written = pd.read_parquet(tmp_path / name / f"dt={day.isoformat()}")
+            expected = whole[days == day].reset_index(drop=True)
+            pd.testing.assert_frame_equal(written, expected, check_dtype=False)
+        assert sorted(p.name for p in checkpoints.iterdir()) == [
+            "dt=2024-01-02.parquet", "dt=2024-01-03.parquet", "dt=2024-01-05.parquet",
+        ]
+    
+    def test_partition_before_epoch_rejected(self, dimensions, tmp_path):
+        with pytest.raises(ValueError):
+            write_partition("transactions", date(2023, 12, 31), tmp_path, *dimensions)
+
+
+class TestGenerateToWarehouse:
+    """Tests for generating straight into DuckDB."""
+    
+    def test_tables_match_persisted_parquet(self, tmp_path):
+        db_path = str(tmp_path / "warehouse.duckdb")
+        loaded = generate_to_warehouse(1, db_path, date(2024, 1, 1), fast_dims=True,
+                                       persist_dir=tmp_path / "out")
+        assert set(loaded) == {"products", "stores", "customers", *generate_data.FACT_TABLES}
+        with db_connection(db_path) as conn:
+            for name, rows in loaded.items():
+                assert conn.execute(f"SELECT COUNT(*) FROM raw.{name}").fetchone()[0] == rows
+                assert pq.read_metadata(tmp_path / "out" / f"{name}.parquet").num_rows == rows
+            loaded_ids = conn.execute(
+                "SELECT transaction_id FROM raw.transactions ORDER BY 1"
+            ).fetchdf()["transaction_id"].tolist()
+        persisted = pd.read_parquet(tmp_path / "out" / "transactions.parquet")
+        assert loaded_ids == sorted(persisted["transaction_id"])
+        assert not list((tmp_path / "out").glob("*.csv"))
+
+
+class TestCompactFrame:
+    """Tests for the compact (categorical + surrogate key) representation."""
+    
+    def test_compact_frame_categoricals_from_enums(self, dimensions):
+        df = compact_frame(generate_transactions(*dimensions, days=1))
+        assert isinstance(df['order_status'].dtype, pd.CategoricalDtype)
+        assert list(df['channel'].cat.categories) == ['online', 'in_store', 'app']
+        assert df['order_status'].notna().all()
+    
+    def test_compact_frame_surrogate_keys(self, dimensions):
+        df = compact_frame(generate_transactions(*dimensions, days=1))
+        assert df.columns.get_loc('customer_key') == df.columns.get_loc('customer_id') + 1
+        assert (df['customer_id'].str[4:].astype(int) == df['customer_key']).all()
+        assert df['order_key'].dtype == 'int64'
+    
+    def test_compact_frame_nullable_keys(self, dimensions):
+        products, _, customers = dimensions
+        df = compact_frame(generate_page_views(products, customers, days=1))
+        assert df['customer_key'].isna().equals(df['customer_id'].isna())
+    
+    def test_compact_frame_rejects_unknown_values(self):
+        with pytest.raises(ValueError, match="channel"):
+            compact_frame(pd.DataFrame({'channel': ['online', 'telephone']}))
@@ -0,0 +1,485 @@
+import sys
+from datetime import date
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.utils.database import (
+    db_connection, load_parquet_to_table, load_parquet_incremental, bulk_load, parquet_files,
+    parquet_row_count, execute_query, get_pool, close_pools, QueryCache, invalidate_cache,
+    normalize_sql, referenced_tables, load_inventory_intervals, inventory_as_of, load_arrow_to_table,
+    load_landed, tail_landing, LANDED_FILE, FIRST_EVENT_KEY,
+)
+from src.utils.instrumentation import capture, span
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "warehouse.duckdb")
+
+
+@pytest.fixture
+def transactions_parquet(tmp_path):
+    path = tmp_path / "transactions.parquet"
+    pd.DataFrame({
+        "transaction_id": ["TXN-1", "TXN-2", "TXN-3"],
+        "order_key": [1, 1, 2],
+        "quantity": [1, 2, 3],
+        "order_status": pd.Categorical(["delivered", "pending", "delivered"]),
+        "channel": ["online", "app", "in_store"],
+    }).to_parquet(path, index=False)
+    return str(path)
+
+
+class TestLoadParquetToTable:
+    """Tests for loading parquet into DuckDB."""
+    
+    def test_load_returns_row_count(self, transactions_parquet, db_path):
+        assert load_parquet_to_table("transactions", transactions_parquet, db_path=db_path) == 3
+    
+    def test_load_keeps_strings_by_default(self, transactions_parquet, db_path):
+        load_parquet_to_table("transactions", transactions_parquet, db_path=db_path)
+        with db_connection(db_path) as conn:
+            types = {row[0]: row[1] for row in conn.execute("DESCRIBE raw.transactions").fetchall()}
+        assert types["order_status"] == "VARCHAR"
+    
+    def test_compact_load_uses_enum_types(self, transactions_parquet, db_path):
+        load_parquet_to_table("transactions", transactions_parquet, db_path=db_path, compact=True)
+        with db_connection(db_path) as conn:
+            types = {row[0]: row[1] for row in conn.execute("DESCRIBE raw.transactions").fetchall()}
+            delivered = conn.execute(
+                "SELECT COUNT(*) FROM raw.transactions WHERE order_status = 'delivered'"
+            ).fetchone()[0]
+        assert types["order_status"].startswith("ENUM('pending'")
+        assert types["channel"].startswith("ENUM('online'")
+        assert types["order_key"] == "BIGINT"
+        assert delivered == 2
+
+
+class TestLoadArrowToTable:
+    """Tests for loading Arrow batches straight into DuckDB."""
+    
+    def test_batches_match_parquet_load(self, transactions_parquet, db_path):
+        table = pa.Table.from_pandas(pd.read_parquet(transactions_parquet))
+        assert load_arrow_to_table("from_arrow", table.to_batches(max_chunksize=1), db_path=db_path,
+                                   compact=True) == 3
+        load_parquet_to_table("from_parquet", transactions_parquet, db_path=db_path, compact=True)
+        with db_connection(db_path) as conn:
+            arrow_rows = conn.execute("SELECT * FROM raw.from_arrow ORDER BY 1").fetchall()
+            parquet_rows = conn.execute("SELECT * FROM raw.from_parquet ORDER BY 1").fetchall()
+            types = {row[0]: row[1] for row in conn.execute("DESCRIBE raw.from_arrow").fetchall()}
+        assert arrow_rows == parquet_rows
+        assert types["order_status"].startswith("ENUM('pending'")
+    
+    def test_empty_batches_load_nothing(self, db_path):
+        assert load_arrow_to_table("empty", iter([]), db_path=db_path) == 0
+    
+    def test_declared_tables_are_validated(self, db_path):
+        stores = pa.table({"store_id": ["STR-0001"], "store_name": ["Atlanta"]})
+        with pytest.raises(ValueError, match="missing columns"):
+            load_arrow_to_table("stores", stores.to_batches(), db_path=db_path)
+        assert load_arrow_to_table("stores", stores, db_path=db_path, validate=False) == 1
+
+
+@pytest.fixture
+def part_directory(tmp_path):
+    parts = tmp_path / "page_views"
+    parts.mkdir()
+    for i in range(3):
+        pd.DataFrame({"event_id": [f"EVT-{i}{j}" for j in range(i + 1)]}).to_parquet(
+            parts / f"part-{i:05d}.parquet", index=False
+        )
+    return parts
+
+
+class TestBulkLoad:
+    """Tests for the concurrent bulk loader."""
+    
+    def test_parquet_files_resolves_directory_and_glob(self, part_directory):
+        assert len(parquet_files(part_directory)) == 3
+        assert parquet_files(part_directory / "part-0000[01].parquet") == parquet_files(part_directory)[:2]
+    
+    def test_parquet_row_count_from_metadata(self, part_directory):
+        assert parquet_row_count(part_directory) == 6
+    
+    def test_load_directory_of_part_files(self, part_directory, db_path):
+        assert load_parquet_to_table("page_views", str(part_directory), db_path=db_path) == 6
+    
+    def test_bulk_load_tables(self, transactions_parquet, part_directory, db_path):
+        rows = bulk_load(
+            {"transactions": transactions_parquet, "page_views": str(part_directory)},
+            db_path=db_path,
+        )
+        assert rows == {"transactions": 3, "page_views": 6}
+        with db_connection(db_path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM raw.page_views").fetchone()[0] == 6
+    
+    def test_bulk_load_spans_nest_under_caller(self, transactions_parquet, part_directory, db_path):
+        with capture() as records:
+            with span("initialize_warehouse"):
+                bulk_load({"transactions": transactions_parquet, "page_views": str(part_directory)},
+                          db_path=db_path)
+        loads = {r["table"]: r for r in records if r["span"] == "load"}
+        assert loads["page_views"]["rows"] == 6
+        assert loads["page_views"]["bytes"] > 0
+        assert {r["parent"] for r in records if r["span"] == "table"} == {"initialize_warehouse"}
+        assert {r["span"] for r in records} >= {"load", "count", "table", "initialize_warehouse"}
+
+
+def write_day(directory, day, quantities):
+    path = directory / f"{day}.parquet"
+    pd.DataFrame({
+        "transaction_id": [f"TXN-{day}-{i}" for i in range(len(quantities))],
+        "transaction_date": pd.to_datetime([day] * len(quantities)),
+        "quantity": quantities,
+    }).to_parquet(path, index=False)
+    return path
+
+
+class TestIncrementalLoad:
+    """Tests for manifest-based incremental loading."""
+    
+    @pytest.fixture
+    def daily_directory(self, tmp_path):
+        directory = tmp_path / "transactions"
+        directory.mkdir()
+        write_day(directory, "2024-01-01", [1, 2])
+        write_day(directory, "2024-01-02", [3])
+        return directory
+    
+    def totals(self, db_path):
+        with db_connection(db_path) as conn:
+            return conn.execute(
+                "SELECT CAST(transaction_date AS DATE)::VARCHAR, SUM(quantity) "
+                "FROM raw.transactions GROUP BY 1 ORDER BY 1"
+            ).fetchall()
+    
+    def test_first_load_creates_table(self, daily_directory, db_path):
+        assert load_parquet_incremental("transactions", str(daily_directory), db_path=db_path) == 3
+        assert self.totals(db_path) == [("2024-01-01", 3), ("2024-01-02", 3)]
+    
+    def test_rerun_without_new_files_loads_nothing(self, daily_directory, db_path):
+        load_parquet_incremental("transactions", str(daily_directory), db_path=db_path)
+        assert load_parquet_incremental("transactions", str(daily_directory), db_path=db_path) == 0
+        assert self.totals(db_path) == [("2024-01-01", 3), ("2024-01-02", 3)]
+    
+    def test_appends_only_new_day(self, daily_directory, db_path):
+        load_parquet_incremental("transactions", str(daily_directory), db_path=db_path)
+        write_day(daily_directory, "2024-01-03", [5, 5])
+        assert load_parquet_incremental("transactions", str(daily_directory), db_path=db_path) == 2
+        assert self.totals(db_path)[-1] == ("2024-01-03", 10)
+    
+    def test_rewritten_day_replaces_partition(self, daily_directory, db_path):
+        load_parquet_incremental("transactions", str(daily_directory), db_path=db_path)
+        write_day(daily_directory, "2024-01-02", [7, 7, 7])
+        assert load_parquet_incremental("transactions", str(daily_directory), db_path=db_path) == 3
+        assert self.totals(db_path) == [("2024-01-01", 3), ("2024-01-02", 21)]
+    
+    def test_dimension_reloads_fully(self, transactions_parquet, db_path):
+        rows = bulk_load({"stores": transactions_parquet}, db_path=db_path, incremental=True)
+        assert rows == {"stores": 3}
+        assert bulk_load({"stores": transactions_parquet}, db_path=db_path, incremental=True) == {
+            "stores": 0
+        }
+
+
+class TestExecuteQuery:
+    """Tests for the pooled Arrow query API."""
+    
+    @pytest.fixture(autouse=True)
+    def warehouse(self, transactions_parquet, db_path):
+        load_parquet_to_table("transactions", transactions_parquet, db_path=db_path)
+        yield
+        close_pools()
+    
+    def test_returns_arrow_table(self, db_path):
+        result = execute_query("SELECT SUM(quantity) AS total FROM raw.transactions", db_path=db_path)
+        assert isinstance(result, pa.Table)
+        assert result.column("total").to_pylist() == [6]
+    
+    def test_binds_parameters(self, db_path):
+        sql = "SELECT transaction_id FROM raw.transactions WHERE quantity >= ? ORDER BY 1"
+        assert execute_query(sql, [2], db_path=db_path).column(0).to_pylist() == ["TXN-2", "TXN-3"]
+    
+    def test_stream_yields_record_batches(self, db_path):
+        reader = execute_query(
+            "SELECT * FROM range(2500)", db_path=db_path, stream=True, batch_size=1000
+        )
+        assert isinstance(reader, pa.RecordBatchReader)
+        assert reader.read_all().num_rows == 2500
+    
+    def test_cursor_per_thread(self, db_path):
+        pool = get_pool(db_path)
+        assert pool.cursor() is pool.cursor()
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(
+                lambda q: execute_query(
+                    "SELECT COUNT(*) FROM raw.transactions WHERE quantity > ?", [q], db_path=db_path
+                ).column(0)[0].as_py(),
+                range(4),
+            ))
+        assert results == [3, 2, 1, 0]
+    
+    def test_cursors_of_finished_threads_are_closed(self, db_path):
+        pool = get_pool(db_path)
+        for _ in range(3):
+            worker = threading.Thread(target=pool.cursor)
+            worker.start()
+            worker.join()
+        pool.cursor()
+        assert list(pool._cursors) == [threading.current_thread()]
+
+
+class TestQueryCache:
+    """Tests for the versioned query result cache."""
+    
+    SQL = "SELECT SUM(quantity) AS total FROM raw.transactions WHERE quantity >= ?"
+    
+    @pytest.fixture(autouse=True)
+    def warehouse(self, transactions_parquet, db_path):
+        load_parquet_to_table("transactions", transactions_parquet, db_path=db_path)
+        yield
+        close_pools()
+    
+    def test_normalize_and_referenced_tables(self):
+        assert normalize_sql("SELECT  a,\n 'x  y' FROM t;") == "SELECT a, 'x  y' FROM t"
+        sql = "SELECT * FROM marts.fact_sales f JOIN read_parquet('x') r ON 1 = 1 JOIN raw.stores s"
+        assert referenced_tables(sql) == ["marts.fact_sales", "raw.stores", "read_parquet()"]
+        sql = "SELECT * FROM raw.a AS x, (SELECT * FROM raw.b) b, raw.c WHERE x.k = b.k"
+        assert referenced_tables(sql) == ["raw.a", "raw.b", "raw.c"]
+        assert referenced_tables("SELECT * FROM raw.inventory_as_of(?)") == ["raw.inventory_as_of()"]
+        assert referenced_tables("SELECT * FROM 'x.parquet'") == ["''"]
+    
+    def test_repeated_query_hits_cache(self, db_path):
+        cache = QueryCache()
+        first = execute_query(self.SQL, [1], db_path=db_path, cache=cache)
+        again = execute_query(" ".join(self.SQL.split(" ")) + ";", [1], db_path=db_path, cache=cache)
+        other = execute_query(self.SQL, [2], db_path=db_path, cache=cache)
+        assert again is first
+        assert other.column("total").to_pylist() == [5]
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 2
+    
+    def test_reload_invalidates_entry(self, tmp_path, db_path):
+        cache = QueryCache()
+        execute_query(self.SQL, [1], db_path=db_path, cache=cache)
+        reloaded = tmp_path / "reloaded.parquet"
+        pd.DataFrame({"quantity": [10]}).to_parquet(reloaded, index=False)
+        load_parquet_to_table("transactions", str(reloaded), db_path=db_path)
+        result = execute_query(self.SQL, [1], db_path=db_path, cache=cache)
+        assert result.column("total").to_pylist() == [10]
+        assert cache.stats()["invalidations"] == 1
+    
+    def reload_transactions(self, tmp_path, db_path, quantity):
+        reloaded = tmp_path / "reloaded.parquet"
+        pd.DataFrame({"quantity": [quantity]}).to_parquet(reloaded, index=False)
+        load_parquet_to_table("transactions", str(reloaded), db_path=db_path)
+    
+    def test_comma_join_tracks_every_table(self, tmp_path, db_path, transactions_parquet):
+        load_parquet_to_table("stores", transactions_parquet, db_path=db_path)
+        cache = QueryCache()
+        sql = ("SELECT SUM(t.quantity) AS total FROM raw.stores s, raw.transactions t "
+               "WHERE s.transaction_id = 'TXN-1'")
+        assert execute_query(sql, db_path=db_path, cache=cache).column("total").to_pylist() == [6]
+        self.reload_transactions(tmp_path, db_path, 10)
+        assert execute_query(sql, db_path=db_path, cache=cache).column("total").to_pylist() == [10]
+    
+    def test_macro_source_follows_generation(self, tmp_path, db_path):
+        with db_connection(db_path) as conn:
+            conn.execute("CREATE MACRO raw.total_quantity() AS TABLE "
+                         "SELECT SUM(quantity) AS total FROM raw.transactions")
+        cache = QueryCache()
+        sql = "SELECT * FROM raw.total_quantity()"
+        assert execute_query(sql, db_path=db_path, cache=cache).column("total").to_pylist() == [6]
+        self.reload_transactions(tmp_path, db_path, 10)
+        assert execute_query(sql, db_path=db_path, cache=cache).column("total").to_pylist() == [10]
+    
+    def test_derived_tables_follow_generation(self, db_path):
+        cache = QueryCache()
+        sql = "SELECT COUNT(*) FROM information_schema.tables"
+        execute_query(sql, db_path=db_path, cache=cache)
+        execute_query(sql, db_path=db_path, cache=cache)
+        invalidate_cache()
+        execute_query(sql, db_path=db_path, cache=cache)
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["invalidations"] == 1
+    
+    def test_lru_eviction_spills_to_disk(self, tmp_path, db_path):
+        sql = "SELECT range AS n FROM range(?, ? + 1000)"
+        size = execute_query(sql, [0, 0], db_path=db_path).nbytes
+        cache = QueryCache(max_bytes=size * 5 // 2, spill_dir=tmp_path / "spill")
+        for n in range(3):
+            execute_query(sql, [n, n], db_path=db_path, cache=cache)
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["spilled_entries"] == 1
+        assert execute_query(sql, [0, 0], db_path=db_path, cache=cache).num_rows == 1000
+        assert cache.stats()["spill_hits"] == 1
+
+
+def write_inventory_day(directory, day, on_hand):
+    path = directory / f"{day}.parquet"
+    n = len(on_hand)
+    pd.DataFrame({
+        "snapshot_date": pd.to_datetime([day] * n),
+        "store_id": ["ST-1"] * n,
+        "product_id": [f"P-{i}" for i in range(n)],
+        "quantity_on_hand": on_hand,
+        "quantity_reserved": [0] * n,
+        "quantity_available": on_hand,
+        "reorder_point": [20] * n,
+        "safety_stock": [10] * n,
+        "days_of_supply": [1.5] * n,
+    }).to_parquet(path, index=False)
+
+
+class TestInventoryIntervals:
+    """Tests for interval-encoded inventory snapshots."""
+    
+    @pytest.fixture
+    def inventory_directory(self, tmp_path):
+        directory = tmp_path / "inventory_snapshots"
+        directory.mkdir()
+        write_inventory_day(directory, "2024-01-01", [5, 7, 9])
+        write_inventory_day(directory, "2024-01-02", [5, 7, 8])
+        write_inventory_day(directory, "2024-01-03", [5, 6, 8])
+        return directory
+    
+    @pytest.fixture(autouse=True)
+    def pools(self):
+        yield
+        close_pools()
+    
+    def test_unchanged_rows_collapse_to_intervals(self, inventory_directory, db_path):
+        assert load_inventory_intervals(str(inventory_directory), db_path=db_path) == 5
+    
+    def test_view_reproduces_daily_snapshots(self, inventory_directory, db_path):
+        load_inventory_intervals(str(inventory_directory), db_path=db_path)
+        expected = pd.concat(pd.read_parquet(p) for p in sorted(inventory_directory.glob("*.parquet")))
+        with db_connection(db_path) as conn:
+            view = conn.execute(
+                "SELECT * FROM raw.inventory_snapshots ORDER BY snapshot_date, product_id"
+            ).df()
+        assert len(view) == len(expected)
+        assert view["quantity_on_hand"].tolist() == expected["quantity_on_hand"].tolist()
+    
+    def test_as_of_lookup(self, inventory_directory, db_path):
+        load_inventory_intervals(str(inventory_directory), db_path=db_path)
+        snapshot = inventory_as_of(date(2024, 1, 2), db_path=db_path)
+        assert snapshot.column("quantity_on_hand").to_pylist() == [5, 7, 8]
+        single = inventory_as_of("2024-01-03", product_ids=["P-1"], db_path=db_path)
+        assert single.column("quantity_on_hand").to_pylist() == [6]
+    
+    def test_cached_lookup_follows_reload(self, inventory_directory, db_path):
+        load_inventory_intervals(str(inventory_directory), db_path=db_path)
+        cache = QueryCache()
+        first = inventory_as_of("2024-01-02", product_ids=["P-2"], db_path=db_path, cache=cache)
+        assert first.column("quantity_on_hand").to_pylist() == [8]
+        write_inventory_day(inventory_directory, "2024-01-02", [5, 7, 99])
+        load_inventory_intervals(str(inventory_directory), db_path=db_path)
+        again = inventory_as_of("2024-01-02", product_ids=["P-2"], db_path=db_path, cache=cache)
+        assert again.column("quantity_on_hand").to_pylist() == [99]
+        assert cache.stats()["invalidations"] == 1
+    
+    def test_new_day_extends_open_intervals(self, inventory_directory, db_path):
+        load_inventory_intervals(str(inventory_directory), db_path=db_path)
+        write_inventory_day(inventory_directory, "2024-01-04", [5, 6, 1])
+        assert load_inventory_intervals(str(inventory_directory), db_path=db_path) == 1
+        with db_connection(db_path) as conn:
+            intervals = conn.execute(
+                "SELECT product_id, valid_from::VARCHAR, valid_to::VARCHAR FROM raw.inventory_intervals "
+                "WHERE product_id = 'P-0'"
+            ).fetchall()
+        assert intervals == [("P-0", "2024-01-01", "2024-01-04")]
+        assert inventory_as_of("2024-01-04", db_path=db_path).column("quantity_on_hand").to_pylist() == [5, 6, 1]
+    
+    def test_between_macro_expands_only_requested_days(self, inventory_directory, db_path):
+        load_inventory_intervals(str(inventory_directory), db_path=db_path)
+        with db_connection(db_path) as conn:
+            rows = conn.execute("""
+                SELECT snapshot_date::VARCHAR, product_id, quantity_on_hand
+                FROM raw.inventory_between('2024-01-02', '2024-01-02') ORDER BY product_id
+            """).fetchall()
+        assert rows == [("2024-01-02", "P-0", 5), ("2024-01-02", "P-1", 7), ("2024-01-02", "P-2", 8)]
+    
+    def test_full_reload_replaces_interval_view(self, inventory_directory, db_path):
+        load_inventory_intervals(str(inventory_directory), db_path=db_path)
+        assert load_parquet_to_table("inventory_snapshots", str(inventory_directory), db_path=db_path) == 9
+        with db_connection(db_path) as conn:
+            kind = conn.execute(
+                "SELECT table_type FROM information_schema.tables WHERE table_name = 'inventory_snapshots'"
+            ).fetchone()[0]
+        assert kind == "BASE TABLE"
+
+
+def land(directory, seq, ids, first_event_ns=None):
+    directory.mkdir(parents=True, exist_ok=True)
+    data = pa.table({
+        "event_id": ids,
+        "event_timestamp": pd.to_datetime(["2024-01-01 10:00"] * len(ids)),
+    })
+    if first_event_ns is not None:
+        data = data.replace_schema_metadata({FIRST_EVENT_KEY: str(first_event_ns).encode()})
+    path = directory / LANDED_FILE.format(landed_ns=time.time_ns(), run_id=0, seq=seq)
+    pq.write_table(data, path)
+    return path
+
+
+class TestLandingLoader:
+    """Tests for tailing streamed micro-batches into raw tables."""
+    
+    def count(self, db_path, table="events"):
+        with db_connection(db_path) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM raw.{table}").fetchone()[0]
+    
+    def test_appends_new_files_once(self, tmp_path, db_path):
+        landing = tmp_path / "landing"
+        land(landing / "events", 1, ["E-1", "E-2"], first_event_ns=time.time_ns())
+        (landing / "events" / ".000002.tmp").write_bytes(b"partial")
+        loaded = load_landed(landing, db_path=db_path)
+        assert [item["rows"] for item in loaded] == [2]
+        assert loaded[0]["latency_seconds"] >= 0
+        assert loaded[0]["event_latency_seconds"] >= loaded[0]["latency_seconds"]
+        
+        land(landing / "events", 3, ["E-3"])
+        (second,) = load_landed(landing, db_path=db_path)
+        assert second["event_latency_seconds"] is None
+        assert load_landed(landing, db_path=db_path) == []
+        assert self.count(db_path) == 3
+    
+    def test_invalid_batch_rolls_back_whole_poll(self, tmp_path, db_path):
+        landing = tmp_path / "landing"
+        land(landing / "events", 1, ["E-1"])
+        bad = land(landing / "transactions", 2, ["T-1"])
+        with pytest.raises(ValueError, match="missing columns"):
+            load_landed(landing, db_path=db_path)
+        bad.unlink()
+        load_landed(landing, db_path=db_path)
+        with db_connection(db_path) as conn:
+            rows = conn.execute(
+                "SELECT table_name, row_count, min_partition::VARCHAR FROM raw._load_manifest"
+            ).fetchall()
+        assert rows == [("events", 1, None)]
+    
+    def test_tail_loads_until_stopped(self, tmp_path, db_path):
+        landing = tmp_path / "landing"
+        stop = threading.Event()
+        batches = []
+        tailer = threading.Thread(target=lambda: batches.append(
+            tail_landing(landing, db_path=db_path, poll_seconds=0.01, stop=stop)
+        ))
+        tailer.start()
+        land(landing / "events", 1, ["E-1"])
+        land(landing / "events", 2, ["E-2", "E-3"])
+        stop.set()
+        tailer.join(timeout=30)
+        assert batches == [2]
+        assert self.count(db_path) == 3
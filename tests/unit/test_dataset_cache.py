@@ -0,0 +1,151 @@
+import sys
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.ingestion import dataset_cache
+from src.ingestion import generate_data
+from src.ingestion.dataset_cache import (
+    DatasetCache, cached_dataset, dataset_key, dataset_params, load_dataset, materialize,
+)
+from src.utils.database import initialize_warehouse
+
+START = date(2024, 1, 1)
+SIZES = dict(products=20, stores=3, customers=50)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DatasetCache(tmp_path / "cache")
+
+
+@pytest.fixture
+def generations(monkeypatch):
+    calls = []
+    generate = dataset_cache._generate
+    monkeypatch.setattr(dataset_cache, "_generate", lambda params, *args: (
+        calls.append(params), generate(params, *args)
+    ))
+    return calls
+
+
+def dataset(cache, days=1, **params):
+    return cached_dataset(days, START, fast_dims=True, cache=cache, **SIZES, **params)
+
+
+class TestDatasetKey:
+    """Tests for cache keys."""
+
+    def test_key_covers_parameters_and_constants(self, monkeypatch):
+        base = dataset_key(dataset_params(7, START))
+        assert dataset_key(dataset_params(7, START)) == base
+        assert dataset_key(dataset_params(8, START)) != base
+        assert dataset_key(dataset_params(7, START, compact=True)) != base
+        monkeypatch.setattr(generate_data, "TRANSACTIONS_PER_DAY", 10)
+        assert dataset_key(dataset_params(7, START)) != base
+
+    def test_default_start_date_is_days_before_today(self):
+        assert dataset_params(7)["start_date"] == (date.today() - timedelta(days=7)).isoformat()
+        assert len(dataset_params()["generator_version"]) == 16
+
+
+class TestDatasetCache:
+    """Tests for the content-addressed dataset store."""
+
+    def test_hit_skips_generation(self, cache, generations):
+        first = dataset(cache)
+        assert dataset(cache) == first
+        assert len(generations) == 1
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+        assert {p.name for p in first.glob("*.parquet")} == {
+            f"{name}.parquet" for name in [*generate_data.DIMENSION_TABLES, *generate_data.FACT_TABLES]
+        }
+        assert not list(first.glob("*.csv"))
+
+    def test_cached_output_matches_generator(self, cache):
+        entry = dataset(cache, days=2)
+        products = generate_data.generate_products(SIZES["products"], fast=True)
+        stores = generate_data.generate_stores(SIZES["stores"], fast=True)
+        customers = generate_data.generate_customers(SIZES["customers"], fast=True)
+        expected = generate_data.generate_transactions(products, stores, customers, 2, START)
+        cached = pq.read_table(entry / "transactions.parquet").to_pandas()
+        assert cached["transaction_id"].tolist() == expected["transaction_id"].tolist()
+        assert cached["total_amount"].tolist() == expected["total_amount"].tolist()
+
+    def test_identical_files_are_stored_once(self, cache):
+        one, two = dataset(cache, days=1), dataset(cache, days=2)
+        blobs = list(cache.root.glob("blobs/*/*.parquet"))
+        assert len(blobs) < len(list(one.glob("*.parquet"))) + len(list(two.glob("*.parquet")))
+        assert (one / "stores.parquet").samefile(two / "stores.parquet")
+        assert not (one / "transactions.parquet").samefile(two / "transactions.parquet")
+
+    def test_evicts_least_recently_used(self, cache, tmp_path):
+        shared = pa.table({"id": list(range(1000))})
+        
+        def put(key, value):
+            source = tmp_path / key
+            source.mkdir()
+            pq.write_table(shared, source / "stores.parquet")
+            pq.write_table(pa.table({"id": [value] * 1000}), source / "transactions.parquet")
+            return cache.put(key, source)
+        
+        one, two = put("one", 1), put("two", 2)
+        assert cache.get("one") == one
+        cache.max_bytes = cache.total_bytes()
+        three = put("three", 3)
+        assert [entry.name for entry in cache.entries()] == ["one", "three"]
+        assert not two.exists()
+        assert cache.stats()["evictions"] == 1
+        # Blobs only the evicted entry used are gone; shared ones stay
+        assert len(list(cache.root.glob("blobs/*/*.parquet"))) == 3
+        assert (one / "stores.parquet").samefile(three / "stores.parquet")
+
+    def test_external_sources_are_copied(self, cache, tmp_path):
+        source = tmp_path / "source"
+        source.mkdir()
+        pq.write_table(pa.table({"id": [1, 2]}), source / "stores.parquet")
+        entry = cache.put("key", source)
+        assert (source / "stores.parquet").stat().st_nlink == 1
+        assert not (entry / "stores.parquet").samefile(source / "stores.parquet")
+
+    def test_collection_waits_for_lock(self, cache):
+        removed = threading.Event()
+        with cache._locked():
+            remover = threading.Thread(target=lambda: (cache.remove("missing"), removed.set()))
+            remover.start()
+            assert not removed.wait(0.2)
+        remover.join(timeout=10)
+        assert removed.is_set()
+
+    def test_workers_change_key_and_layout(self, cache):
+        parts = dataset(cache, days=2, workers=2)
+        assert parts != dataset(cache, days=2)
+        assert sorted(p.name for p in (parts / "transactions").glob("*.parquet")) == [
+            "part-00000.parquet", "part-00001.parquet"
+        ]
+
+    def test_load_dataset_memory_maps_tables(self, cache):
+        tables = load_dataset(1, START, fast_dims=True, cache=cache, tables=["stores", "page_views"],
+                              **SIZES)
+        assert set(tables) == {"stores", "page_views"}
+        assert tables["stores"].num_rows == SIZES["stores"]
+
+    def test_materialize_replaces_previous_output(self, cache, tmp_path):
+        output = tmp_path / "sample"
+        (output / "transactions").mkdir(parents=True)
+        (output / "transactions" / "part-00000.parquet").write_bytes(b"old")
+        (output / "transactions.csv").write_text("old")
+        materialize(dataset(cache), output)
+        assert not (output / "transactions").exists()
+        assert not (output / "transactions.csv").exists()
+        loaded = initialize_warehouse(output, db_path=str(tmp_path / "warehouse.duckdb"))
+        assert loaded["stores"] == SIZES["stores"]
+        assert not (output / "transactions.parquet").samefile(
+            dataset(cache) / "transactions.parquet"
+        )
@@ -0,0 +1,89 @@
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+import pandas as pd
+from src.utils.database import load_parquet_incremental
+from src.utils.dbt_selection import model_lineage, plan_build, record_model_runs
+
+
+def node(name, depends_on, checksum="abc"):
+    return {
+        "resource_type": "model",
+        "name": name,
+        "checksum": {"checksum": checksum},
+        "depends_on": {"nodes": depends_on},
+    }
+
+
+MANIFEST = {
+    "sources": {
+        "source.p.raw.transactions": {"schema": "raw", "name": "transactions"},
+        "source.p.raw.products": {"schema": "raw", "name": "products"},
+        "source.p.raw._load_manifest": {"schema": "raw", "name": "_load_manifest"},
+    },
+    "nodes": {
+        "model.p.fact_sales": node("fact_sales", [
+            "model.p.stg_transactions", "model.p.stg_products", "source.p.raw._load_manifest",
+        ]),
+        "model.p.dim_product": node("dim_product", ["model.p.stg_products"]),
+        "model.p.stg_transactions": node("stg_transactions", ["source.p.raw.transactions"]),
+        "model.p.stg_products": node("stg_products", ["source.p.raw.products"]),
+        "test.p.unique_id": {"resource_type": "test", "name": "unique_id"},
+    },
+}
+
+
+def write_part(path, day):
+    pd.DataFrame({"id": [1], "transaction_date": pd.to_datetime([day])}).to_parquet(path, index=False)
+
+
+@pytest.fixture
+def warehouse(tmp_path):
+    db_path = str(tmp_path / "warehouse.duckdb")
+    for table in ("transactions", "products"):
+        directory = tmp_path / table
+        directory.mkdir()
+        write_part(directory / "part-0.parquet", "2024-01-01")
+        load_parquet_incremental(table, str(directory), db_path=db_path)
+    return tmp_path, db_path
+
+
+class TestDbtSelection:
+    """Tests for change-driven dbt model selection."""
+
+    def test_lineage_in_dependency_order(self):
+        lineage = model_lineage(MANIFEST)
+        order = list(lineage)
+        assert order.index("stg_transactions") < order.index("fact_sales")
+        assert order.index("stg_products") < order.index("dim_product")
+        assert lineage["stg_products"].sources == ("raw.products",)
+        assert set(lineage["fact_sales"].parents) == {"stg_transactions", "stg_products"}
+
+    def test_everything_stale_before_first_build(self, warehouse):
+        _, db_path = warehouse
+        stale, _ = plan_build(model_lineage(MANIFEST), db_path)
+        assert set(stale) == {"fact_sales", "dim_product", "stg_transactions", "stg_products"}
+
+    def test_only_models_downstream_of_new_loads(self, warehouse):
+        tmp_path, db_path = warehouse
+        lineage = model_lineage(MANIFEST)
+        stale, planned_at = plan_build(lineage, db_path)
+        record_model_runs(stale, lineage, planned_at, db_path)
+        assert plan_build(lineage, db_path)[0] == []
+
+        write_part(tmp_path / "transactions" / "part-1.parquet", "2024-01-02")
+        load_parquet_incremental("transactions", str(tmp_path / "transactions"), db_path=db_path)
+        assert plan_build(lineage, db_path)[0] == ["stg_transactions", "fact_sales"]
+
+    def test_changed_sql_rebuilds_model(self, warehouse):
+        _, db_path = warehouse
+        lineage = model_lineage(MANIFEST)
+        stale, planned_at = plan_build(lineage, db_path)
+        record_model_runs(stale, lineage, planned_at, db_path)
+        manifest = dict(MANIFEST, nodes=dict(MANIFEST["nodes"]))
+        manifest["nodes"]["model.p.dim_product"] = node("dim_product", ["model.p.stg_products"], "new")
+        assert plan_build(model_lineage(manifest), db_path)[0] == ["dim_product"]
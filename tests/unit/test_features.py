@@ -0,0 +1,164 @@
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+import numpy as np
+import pandas as pd
+from src.analytics import features
+from src.analytics.features import read_features, refresh_features
+from src.utils.database import close_pools, create_inventory_views, db_connection
+
+START = date(2024, 1, 1)
+
+
+def fact_rows(days, units=lambda i: (i + 1) % 5, loaded_at="2024-04-11 06:00"):
+    """One store x product line per day; demand varies by day, some days are zero."""
+    rows = [(d, units(i)) for i, d in enumerate(days) if units(i)]
+    return pd.DataFrame({
+        "store_id": "ST-1",
+        "product_id": "P-1",
+        "transaction_day": pd.to_datetime([d for d, _ in rows]),
+        "quantity": [q for _, q in rows],
+        "order_status": "delivered",
+        "loaded_at": pd.Timestamp(loaded_at),
+    })
+
+
+def day_range(first, n):
+    return [first + timedelta(days=i) for i in range(n)]
+
+
+@pytest.fixture
+def env(tmp_path):
+    path = str(tmp_path / "warehouse.duckdb")
+    facts = fact_rows(day_range(START, 101))
+    inventory = pd.DataFrame({
+        "snapshot_date": pd.to_datetime(day_range(START, 120)),
+        "store_id": "ST-1",
+        "product_id": "P-1",
+        "quantity_available": range(120),
+        "days_of_supply": 7.5,
+    })
+    with db_connection(path) as conn:
+        for schema in ("marts", "raw"):
+            conn.execute(f"CREATE SCHEMA {schema}")
+        conn.execute("CREATE TABLE marts.fact_sales AS SELECT * FROM facts")
+        conn.execute("CREATE TABLE raw.inventory_snapshots AS SELECT * FROM inventory")
+    feature_dir = tmp_path / "features"
+    written = refresh_features(path, feature_dir)
+    assert len(written) == 101
+    yield path, feature_dir
+    close_pools()
+
+
+def load_day(path, day, units):
+    """Replace one day of facts as a later dbt build of that day would."""
+    with db_connection(path) as conn:
+        conn.execute("DELETE FROM marts.fact_sales WHERE transaction_day = ?", [day])
+        rows = fact_rows([day], lambda i: units, loaded_at="2024-04-12 06:00")
+        conn.execute("INSERT INTO marts.fact_sales SELECT * FROM rows")
+
+
+class TestFeatureStore:
+    """Tests for incremental demand features."""
+
+    def test_lags_and_windows_match_pandas(self, env):
+        _, feature_dir = env
+        day = START + timedelta(days=95)
+        row = read_features(day, day, feature_dir).to_pylist()[0]
+        demand = pd.Series(
+            [(i + 1) % 5 for i in range(101)], index=pd.to_datetime(day_range(START, 101))
+        )
+        before = demand[:pd.Timestamp(day - timedelta(days=1))]
+        assert row["demand"] == demand[pd.Timestamp(day)]
+        assert row["demand_lag_7"] == demand[pd.Timestamp(day - timedelta(days=7))]
+        assert row["demand_sum_28"] == before[-28:].sum()
+        assert row["demand_mean_90"] == pytest.approx(before[-90:].mean())
+        assert row["demand_std_7"] == pytest.approx(np.std(before[-7:], ddof=1))
+        assert row["quantity_available"] == 95
+
+    def test_read_features_by_range(self, env):
+        _, feature_dir = env
+        table = read_features(START + timedelta(days=10), START + timedelta(days=12), feature_dir)
+        assert table.num_rows == 3
+
+    def test_read_features_without_partitions(self, env):
+        _, feature_dir = env
+        later = START + timedelta(days=200)
+        empty = read_features(later, later, feature_dir)
+        assert empty.num_rows == 0
+        written = read_features(START, START, feature_dir).schema
+        assert [(f.name, f.type) for f in empty.schema] == [(f.name, f.type) for f in written]
+        assert read_features(later, later, feature_dir, columns=["demand"]).column_names == ["demand"]
+
+    def test_incremental_day_matches_full_refresh(self, env, tmp_path):
+        path, feature_dir = env
+        # A reprocessed day and a new day: the later days must be rewritten too
+        load_day(path, START + timedelta(days=99), 40)
+        load_day(path, START + timedelta(days=101), 3)
+        written = refresh_features(path, feature_dir)
+        assert sorted(written) == day_range(START + timedelta(days=99), 3)
+        incremental = read_features(feature_dir=feature_dir).to_pandas()
+
+        refresh_features(path, tmp_path / "full", full_refresh=True)
+        full = read_features(feature_dir=tmp_path / "full").to_pandas()
+        pd.testing.assert_frame_equal(incremental, full)
+
+    def test_cancelled_and_returned_lines_are_not_demand(self, env):
+        path, feature_dir = env
+        day = START + timedelta(days=99)
+        load_day(path, day, 40)
+        with db_connection(path) as conn:
+            for status in ("cancelled", "returned"):
+                rows = fact_rows([day], lambda i: 5, loaded_at="2024-04-12 06:00").assign(order_status=status)
+                conn.execute("INSERT INTO marts.fact_sales SELECT * FROM rows")
+        refresh_features(path, feature_dir)
+        assert read_features(day, day, feature_dir).column("demand").to_pylist() == [40]
+
+    def test_refresh_without_new_loads_is_noop(self, env):
+        path, feature_dir = env
+        assert refresh_features(path, feature_dir) == {}
+
+    def test_failed_refresh_publishes_nothing(self, env, monkeypatch):
+        path, feature_dir = env
+        day = START + timedelta(days=99)
+        before = read_features(day, day, feature_dir)
+        load_day(path, day, 40)
+        stage = features.write_feature_day
+
+        def fail_after_first(conn, staged_day, feature_dir):
+            if staged_day > day:
+                raise RuntimeError("disk full")
+            return stage(conn, staged_day, feature_dir)
+
+        monkeypatch.setattr(features, "write_feature_day", fail_after_first)
+        with pytest.raises(RuntimeError):
+            refresh_features(path, feature_dir)
+        assert read_features(day, day, feature_dir).equals(before)
+        assert not (feature_dir / ".staging" / "demand").exists()
+
+        monkeypatch.undo()
+        assert sorted(refresh_features(path, feature_dir)) == day_range(day, 2)
+        assert read_features(day, day, feature_dir).column("demand").to_pylist() == [40]
+
+    def test_interval_inventory_matches_daily_snapshots(self, env, tmp_path):
+        path, feature_dir = env
+        with db_connection(path) as conn:
+            conn.execute("""
+                CREATE TABLE raw.inventory_intervals AS
+                SELECT store_id, product_id,
+                       CAST(CAST(snapshot_date AS TIMESTAMP) AS DATE) AS valid_from,
+                       CAST(CAST(snapshot_date AS TIMESTAMP) AS DATE) AS valid_to,
+                       NULL AS quantity_on_hand, NULL AS quantity_reserved, quantity_available,
+                       NULL AS reorder_point, NULL AS safety_stock, days_of_supply
+                FROM raw.inventory_snapshots
+            """)
+            create_inventory_views(conn)
+        written = refresh_features(path, tmp_path / "intervals", full_refresh=True)
+        assert len(written) == 101
+        end = START + timedelta(days=100)
+        assert read_features(START, end, tmp_path / "intervals").equals(read_features(START, end, feature_dir))
@@ -0,0 +1,113 @@
+import sys
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.utils import instrumentation
+from src.utils.instrumentation import Span, capture, span, traced, write_prometheus
+
+
+class TestSpans:
+    """Tests for pipeline stage spans."""
+
+    def test_span_records_timings_and_counts(self):
+        with capture() as records:
+            with span("load", table="stores") as s:
+                s.rows, s.bytes = 50, 1024
+        (record,) = records
+        assert record["span"] == "load"
+        assert record["table"] == "stores"
+        assert record["rows"] == 50 and record["bytes"] == 1024
+        assert record["wall_seconds"] >= 0 and record["cpu_seconds"] >= 0
+        assert record["rows_per_second"] > 0
+
+    def test_nested_spans_inherit_labels_and_parent(self):
+        with capture() as records:
+            with span("fact_table", table="transactions"):
+                with span("generate"):
+                    pass
+        inner, outer = records
+        assert inner["parent"] == "fact_table"
+        assert inner["table"] == "transactions"
+        assert outer["parent"] is None
+
+    def test_accumulating_span_emits_once(self):
+        stage = Span("write_parquet", accumulate=True)
+        with capture() as records:
+            for _ in range(3):
+                with stage:
+                    stage.rows += 10
+            assert records == []
+            stage.emit()
+            stage.emit()
+        assert [r["rows"] for r in records] == [30]
+
+    def test_failed_span_is_emitted_with_error(self):
+        with capture() as records:
+            with pytest.raises(ValueError):
+                with span("load"):
+                    raise ValueError("boom")
+        assert records[0]["error"] == "ValueError"
+
+    def test_traced_names_span_after_function(self):
+        @traced(table="products")
+        def generate_products():
+            return 1
+        with capture() as records:
+            assert generate_products() == 1
+        assert records[0]["span"] == "generate_products"
+        assert records[0]["table"] == "products"
+
+    def test_json_lines_and_prometheus_output(self, tmp_path, monkeypatch):
+        metrics = tmp_path / "spans.jsonl"
+        monkeypatch.setattr(instrumentation, "METRICS_PATH", str(metrics))
+        for rows in (10, 20):
+            with span("load", table="stores") as s:
+                s.rows = rows
+        lines = [json.loads(line) for line in metrics.read_text().splitlines()]
+        assert [line["rows"] for line in lines] == [10, 20]
+
+        prom = tmp_path / "pipeline.prom"
+        assert write_prometheus(prom) == 1
+        text = prom.read_text()
+        assert '# TYPE pipeline_stage_rows gauge' in text
+        assert 'pipeline_stage_rows{span="load",table="stores"} 20' in text
+
+    def test_prometheus_reads_only_new_spans_and_rotates(self, tmp_path, monkeypatch):
+        metrics = tmp_path / "spans.jsonl"
+        monkeypatch.setattr(instrumentation, "METRICS_PATH", str(metrics))
+        monkeypatch.setattr(instrumentation, "METRICS_MAX_BYTES", 1)
+        prom = tmp_path / "pipeline.prom"
+        with span("load", table="stores") as s:
+            s.rows = 5
+        assert write_prometheus(prom) == 1
+        assert not metrics.exists() and (tmp_path / "spans.jsonl.1").exists()
+
+        with span("load", table="products") as s:
+            s.rows = 7
+        assert write_prometheus(prom) == 2
+        text = prom.read_text()
+        assert 'pipeline_stage_rows{span="load",table="stores"} 5' in text
+        assert 'pipeline_stage_rows{span="load",table="products"} 7' in text
+        assert [json.loads(line)["table"] for line in (tmp_path / "spans.jsonl.1").read_text().splitlines()] == [
+            "products"
+        ]
+
+    def test_write_dataset_reports_each_stage(self, tmp_path):
+        from src.ingestion.generate_data import write_dataset
+        frames = (pd.DataFrame({"id": range(i * 5, i * 5 + 5)}) for i in range(3))
+        with capture() as records:
+            with span("fact_table", table="transactions"):
+                rows = write_dataset(frames, tmp_path, "transactions", batch_size=5)
+        stages = {r["span"]: r for r in records}
+        assert rows == 15
+        assert {"generate", "write_parquet", "write_csv", "fact_table"} <= set(stages)
+        assert stages["write_parquet"]["rows"] == 15
+        assert stages["write_parquet"]["bytes"] == (tmp_path / "transactions.parquet").stat().st_size
+        assert stages["write_csv"]["bytes"] == (tmp_path / "transactions.csv").stat().st_size
+        assert stages["generate"]["table"] == "transactions"
@@ -0,0 +1,104 @@
+import sys
+from datetime import date
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+import pandas as pd
+from src.analytics.rollups import ROLLUPS, query_sales, refresh_rollups, route
+from src.utils.database import close_pools, db_connection
+
+
+def fact_rows(day, quantities):
+    return pd.DataFrame({
+        "transaction_id": [f"TXN-{day}-{i}" for i in range(len(quantities))],
+        "order_id": [f"ORD-{day}-{i // 2}" for i in range(len(quantities))],
+        "store_id": ["ST-1", "ST-2"] * (len(quantities) // 2),
+        "product_id": ["P-1", "P-2", "P-2", "P-1"][:len(quantities)],
+        "transaction_day": pd.to_datetime([day] * len(quantities)),
+        "transaction_month": pd.to_datetime([day[:8] + "01"] * len(quantities)),
+        "quantity": quantities,
+        "discount_amount": 1.0,
+        "total_amount": [10.0 * q for q in quantities],
+        "line_profit": [2.0 * q for q in quantities],
+        "order_status": "delivered",
+        "channel": ["online", "online", "app", "app"][:len(quantities)],
+        "loaded_at": pd.Timestamp("2024-01-03 06:00"),
+    })
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "warehouse.duckdb")
+    facts = pd.concat([fact_rows("2024-01-01", [1, 2, 3, 4]), fact_rows("2024-01-02", [5, 6])])
+    products = pd.DataFrame({"product_id": ["P-1", "P-2"], "category": ["Tools", "Paint"]})
+    stores = pd.DataFrame({"store_id": ["ST-1", "ST-2"], "region": ["West", "East"]})
+    with db_connection(path) as conn:
+        for schema in ("marts", "raw"):
+            conn.execute(f"CREATE SCHEMA {schema}")
+        conn.execute("CREATE TABLE marts.fact_sales AS SELECT * FROM facts")
+        conn.execute("CREATE TABLE marts.dim_product AS SELECT * FROM products")
+        conn.execute("CREATE TABLE raw.stores AS SELECT * FROM stores")
+    refresh_rollups(path)
+    yield path
+    close_pools()
+
+
+def as_rows(table):
+    return sorted(tuple(row.values()) for row in table.to_pylist())
+
+
+SPECS = [
+    dict(measures=["revenue", "units"], group_by=["category"]),
+    dict(measures=["revenue", "profit", "discount"], group_by=["month", "region"]),
+    dict(measures=["units"], group_by=["day", "store_id"], filters={"channel": ["online", "app"]}),
+    dict(measures=["order_count", "revenue"], group_by=["channel"], start=date(2024, 1, 2)),
+    dict(measures=["order_count"], group_by=["category", "store_id", "channel", "order_status"]),
+]
+
+
+class TestRollups:
+    """Tests for rollup refresh and query routing."""
+
+    @pytest.mark.parametrize("spec", SPECS)
+    def test_rollup_matches_fact_table(self, db_path, spec):
+        expected = query_sales(db_path=db_path, use_rollups=False, **spec)
+        assert as_rows(query_sales(db_path=db_path, **spec)) == as_rows(expected)
+
+    def test_routes_to_smallest_rollup(self):
+        assert route(["revenue"], ["region"]).name == "sales_monthly_region"
+        assert route(["revenue"], ["day"]).name == "sales_daily_category"
+        assert route(["revenue"], ["store_id"]).name == "sales_daily_store_category"
+        assert route(["revenue"], ["region"], end=date(2024, 1, 15)).name == "sales_daily_store_category"
+
+    def test_order_count_needs_exact_grain(self):
+        assert route(["order_count"], ["category"]) is None
+        grain = ["category", "channel", "order_status"]
+        assert route(["order_count"], grain).name == "sales_daily_category"
+        by_store = ["store_id", "category", "channel", "order_status"]
+        assert route(["order_count"], by_store).name == "sales_daily_store_category"
+
+    def test_incremental_refresh_replaces_days(self, db_path):
+        with db_connection(db_path) as conn:
+            conn.execute("UPDATE marts.fact_sales SET quantity = quantity * 10 "
+                         "WHERE transaction_day = '2024-01-02'")
+            conn.execute("UPDATE marts.fact_sales SET quantity = 0 "
+                         "WHERE transaction_day = '2024-01-01'")
+        refreshed = refresh_rollups(db_path, start=date(2024, 1, 2), end=date(2024, 1, 2))
+        assert set(refreshed) == {r.name for r in ROLLUPS}
+        units = query_sales(["units"], ["day"], db_path=db_path)
+        assert units.column("units").to_pylist() == [10, 110]
+
+    def test_refresh_without_new_loads_is_noop(self, db_path):
+        assert refresh_rollups(db_path) == {}
+
+    def test_refresh_follows_dbt_builds(self, db_path):
+        with db_connection(db_path) as conn:
+            conn.execute("UPDATE marts.fact_sales SET quantity = quantity * 10, "
+                         "loaded_at = TIMESTAMP '2024-01-04 06:00:00' WHERE transaction_day = '2024-01-02'")
+        assert set(refresh_rollups(db_path).values()) == {(date(2024, 1, 2), date(2024, 1, 2))}
+        units = query_sales(["units"], ["day"], db_path=db_path)
+        assert units.column("units").to_pylist() == [10, 110]
+        assert refresh_rollups(db_path) == {}
@@ -0,0 +1,151 @@
+import sys
+from datetime import date
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.ingestion.generate_data import (
+    generate_products, generate_stores, generate_customers, iter_fact_table, compact_frame,
+    write_dataset, FACT_TABLES,
+)
+from src.models.schemas import (
+    Batch, OrderStatus, PageView, Transaction, TABLES, table_schema, validate_batch,
+    validate_parquet_metadata,
+)
+
+
+@pytest.fixture(scope="module")
+def dimensions():
+    return generate_products(20, fast=True), generate_stores(3, fast=True), generate_customers(50, fast=True)
+
+
+def transactions_table(**overrides):
+    frame = pd.DataFrame({
+        "transaction_id": ["TXN-1", "TXN-2"],
+        "order_id": ["ORD-1", "ORD-2"],
+        "customer_id": ["CUS-1", "CUS-2"],
+        "store_id": ["STR-1", "STR-1"],
+        "product_id": ["PRD-1", "PRD-2"],
+        "transaction_date": pd.to_datetime(["2024-01-01 10:00", "2024-01-01 11:00"]),
+        "quantity": [1, 2],
+        "unit_price": [9.99, 5.0],
+        "discount_amount": [0.0, 1.0],
+        "total_amount": [9.99, 9.0],
+        "order_status": ["delivered", "pending"],
+        "channel": ["online", "app"],
+        "fulfillment_type": ["bopis", "ship_to_home"],
+    })
+    for column, values in overrides.items():
+        frame[column] = values
+    return pa.Table.from_pandas(frame, preserve_index=False)
+
+
+class TestTableSchemas:
+    """Tests for Arrow schemas derived from the row views."""
+
+    def test_schema_follows_annotations(self):
+        schema = table_schema("transactions")
+        assert schema.names == list(Transaction.columns)
+        assert schema.field("quantity").type == pa.int64()
+        assert schema.field("transaction_date").type == pa.timestamp("ns")
+        assert schema.field("order_status").type == pa.string()
+        assert not schema.field("order_id").nullable
+        assert table_schema("page_views").field("customer_id").nullable
+
+    def test_compact_schema_has_dictionaries_and_keys(self):
+        schema = table_schema("page_views", compact=True)
+        assert pa.types.is_dictionary(schema.field("event_type").type)
+        assert schema.names.index("customer_key") == schema.names.index("customer_id") + 1
+        assert schema.field("customer_key").type == pa.int32()
+        assert schema.field("customer_key").nullable
+
+    @pytest.mark.parametrize("compact", [False, True])
+    def test_generator_output_matches_schemas(self, dimensions, compact):
+        frames = dict(zip(["products", "stores", "customers"], dimensions))
+        for name in FACT_TABLES:
+            frames[name] = next(iter(iter_fact_table(name, *dimensions, date(2024, 1, 1), 1)))
+        assert set(frames) == set(TABLES)
+        for name, frame in frames.items():
+            frame = compact_frame(frame) if compact else frame
+            data = validate_batch(pa.Table.from_pandas(frame, preserve_index=False),
+                                  table_schema(name, compact))
+            assert data.schema.names == table_schema(name, compact).names
+
+
+class TestValidateBatch:
+    """Tests for the vectorized batch validator."""
+
+    def test_valid_batch_is_reordered_and_cast(self):
+        schema = pa.schema([pa.field("id", pa.string(), nullable=False), pa.field("note", pa.string())])
+        batch = pa.RecordBatch.from_pydict({"note": [None, None], "id": ["a", "b"]})
+        data = validate_batch(batch, schema)
+        assert isinstance(data, pa.RecordBatch)
+        assert data.schema.names == ["id", "note"]
+        assert data.schema.field("note").type == pa.string()
+
+    def test_reports_every_problem(self):
+        table = transactions_table(quantity=[1.5, 2.0], order_id=["ORD-1", None],
+                                   channel=["online", "telephone"]).drop(["total_amount"])
+        with pytest.raises(ValueError) as exc:
+            validate_batch(table, table_schema("transactions"))
+        message = str(exc.value)
+        assert "missing columns ['total_amount']" in message
+        assert "quantity: expected int64, got double" in message
+        assert "order_id: 1 nulls" in message
+        assert "channel: values outside Channel: ['telephone']" in message
+
+    def test_checks_dictionary_values_in_use(self):
+        schema = table_schema("transactions", compact=True)
+        frame = compact_frame(transactions_table().to_pandas())
+        dictionary = pa.array(["delivered", "bogus"])
+        
+        def with_statuses(indices):
+            statuses = pa.DictionaryArray.from_arrays(pa.array(indices, pa.int8()), dictionary)
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            return table.set_column(table.schema.get_field_index("order_status"), "order_status", statuses)
+        
+        assert validate_batch(with_statuses([0, 0]), schema).num_rows == 2
+        with pytest.raises(ValueError, match="bogus"):
+            validate_batch(with_statuses([0, 1]), schema)
+
+    def test_parquet_metadata_checks_types_and_nulls(self, tmp_path):
+        path = tmp_path / "transactions.parquet"
+        pq.write_table(transactions_table(order_id=["ORD-1", None]), path)
+        with pytest.raises(ValueError, match="order_id: 1 nulls"):
+            validate_parquet_metadata([str(path)], table_schema("transactions"))
+        pq.write_table(transactions_table(), path)
+        validate_parquet_metadata([str(path)], table_schema("transactions"))
+
+    def test_write_dataset_rejects_invalid_frames(self, tmp_path):
+        frame = transactions_table(order_status=["delivered", "lost"]).to_pandas()
+        with pytest.raises(ValueError, match="lost"):
+            write_dataset([frame], tmp_path, "transactions", table="transactions")
+
+
+class TestBatch:
+    """Tests for array-backed batches and their row views."""
+
+    def test_rows_are_slotted_views(self):
+        batch = Batch(Transaction, transactions_table())
+        row = batch[-1]
+        assert len(batch) == 2
+        assert row.order_status is OrderStatus.PENDING
+        assert row.quantity == 2
+        assert not hasattr(row, "__dict__")
+        assert [r.transaction_id for r in batch] == ["TXN-1", "TXN-2"]
+        with pytest.raises(IndexError):
+            batch[2]
+
+    def test_nullable_columns_read_as_none(self, dimensions):
+        products, _, customers = dimensions
+        frame = next(iter(iter_fact_table("page_views", products, None, customers,
+                                          date(2024, 1, 1), 1)))
+        batch = Batch.from_pandas(PageView, frame)
+        anonymous = frame.index[frame["customer_id"].isna()][0]
+        assert batch[int(anonymous)].customer_id is None
+        assert batch.column("event_type").type == pa.string()
@@ -0,0 +1,108 @@
+import sys
+import asyncio
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import numpy as np
+import pytest
+import pyarrow.parquet as pq
+from src.ingestion.generate_data import generate_products, generate_stores, generate_customers
+from src.ingestion import stream_events
+from src.ingestion.stream_events import EventStream, intraday_factor, load_test, next_run_id
+from src.models.schemas import table_schema, validate_batch
+from src.utils.database import FIRST_EVENT_KEY, landed_files, load_landed
+
+
+@pytest.fixture(scope="module")
+def dimensions():
+    return generate_products(20, fast=True), generate_stores(3, fast=True), generate_customers(50, fast=True)
+
+
+class TestIntradayCurve:
+    """Tests for the time-of-day traffic curve."""
+
+    def test_factor_averages_to_one(self):
+        day = datetime(2024, 1, 1)
+        factors = [intraday_factor(day.replace(hour=h, minute=m)) for h in range(24) for m in range(0, 60, 5)]
+        assert np.mean(factors) == pytest.approx(1.0, rel=0.01)
+        assert intraday_factor(day.replace(hour=20)) > 5 * intraday_factor(day.replace(hour=3))
+
+    def test_flat_curve(self):
+        assert intraday_factor(datetime(2024, 1, 1, 3), curve=None) == 1.0
+
+
+class TestEventStream:
+    """Tests for the asyncio micro-batch producer."""
+
+    def test_micro_batches_land_valid_events(self, dimensions, tmp_path):
+        stream = EventStream(*dimensions, 2000, tmp_path, start=datetime(2024, 1, 1, 12),
+                             speedup=60, curve=None, flush_seconds=0.2, seed=7)
+        stats = asyncio.run(stream.run(0.6))
+        files = landed_files(tmp_path)
+        assert set(files) == {"page_views", "transactions"}
+        assert stats["files"] == sum(len(paths) for paths in files.values()) > 2
+        for table, paths in files.items():
+            data = pq.read_table(paths)
+            validate_batch(data, table_schema(table))
+            assert FIRST_EVENT_KEY in pq.read_schema(paths[0]).metadata
+            assert data.num_rows == stats[f"{table}_rows"]
+        views = pq.read_table(files["page_views"]).to_pandas()
+        assert views["event_id"].is_unique
+        # 0.6s at 60x covers the first 36 simulated seconds after noon
+        assert views["event_timestamp"].min() >= datetime(2024, 1, 1, 12)
+        assert views["event_timestamp"].max() < datetime(2024, 1, 1, 12, 0, 37)
+        orders = pq.read_table(files["transactions"]).to_pandas()
+        assert set(orders["channel"]) <= {"online", "app"}
+        assert (orders.groupby("order_id")["product_id"].nunique()
+                == orders.groupby("order_id").size()).all()
+
+    def test_ids_differ_between_runs(self, dimensions, tmp_path):
+        # Same seed twice: run ids come from the landing dir, not the rng
+        for seed in (1, 1):
+            stream = EventStream(*dimensions, 2000, tmp_path, curve=None, seed=seed)
+            asyncio.run(stream.run(0.2))
+        loaded = load_landed(tmp_path, db_path=str(tmp_path / "warehouse.duckdb"))
+        assert {item["table"] for item in loaded} == {"page_views", "transactions"}
+        views = pq.read_table(landed_files(tmp_path)["page_views"]).to_pandas()
+        assert views["event_id"].is_unique
+
+
+    def test_concurrent_streams_share_landing_dir(self, dimensions, tmp_path):
+        streams = [
+            EventStream(*dimensions, 2000, tmp_path, curve=None, flush_seconds=0.1, seed=1)
+            for _ in range(2)
+        ]
+
+        async def run_both():
+            return await asyncio.gather(*(stream.run(0.4) for stream in streams))
+
+        stats = asyncio.run(run_both())
+        files = landed_files(tmp_path)
+        paths = [path for table_paths in files.values() for path in table_paths]
+        assert len(paths) == sum(s["files"] for s in stats)
+        assert {Path(path).name.split("-")[1] for path in paths} == {"0000", "0001"}
+        assert not list(tmp_path.glob("*/.*.tmp"))
+        for table in files:
+            assert pq.read_table(files[table]).num_rows == sum(s[f"{table}_rows"] for s in stats)
+
+    def test_run_ids_count_up_per_landing_dir(self, tmp_path, monkeypatch):
+        assert [next_run_id(tmp_path / "a") for _ in range(3)] == [0, 1, 2]
+        assert next_run_id(tmp_path / "b") == 0
+        monkeypatch.setattr(stream_events, "RUN_ID_BITS", 2)
+        next_run_id(tmp_path / "a")
+        with pytest.raises(RuntimeError):
+            next_run_id(tmp_path / "a")
+
+
+class TestLoadTest:
+    """Tests for the sustained-rate load test."""
+
+    def test_reports_rate_and_latency(self):
+        (result,) = load_test([500], duration=1.0, flush_seconds=0.2)
+        assert result["rate"] == 500
+        assert result["events"] > 0
+        assert result["p99_latency_seconds"] >= result["p50_latency_seconds"] >= 0
+        assert isinstance(result["sustained"], bool)
@@ -0,0 +1,85 @@
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import pytest
+import pandas as pd
+from src.quality.validator import compile_suite, load_suite, validate_parquet, validate_table
+from src.utils.database import load_parquet_to_table
+
+SUITE_PATH = Path(__file__).parent.parent.parent / "great_expectations/expectations/transactions_suite.json"
+
+
+@pytest.fixture
+def suite():
+    return load_suite(SUITE_PATH)
+
+
+@pytest.fixture
+def bad_parquet(tmp_path):
+    path = tmp_path / "transactions.parquet"
+    pd.DataFrame({
+        "transaction_id": ["TXN-1", "TXN-2", "TXN-2", "TXN-3"],
+        "order_id": ["ORD-1", None, "ORD-2", "ORD-3"],
+        "quantity": [1, 0, 5, 2000],
+        "channel": ["online", "app", "fax", None],
+    }).to_parquet(path, index=False)
+    return str(path)
+
+
+def summarize(result):
+    return [(r.expectation_type, r.success, r.unexpected_count) for r in result.results]
+
+
+EXPECTED = [
+    ("expect_column_to_exist", True, 0),
+    ("expect_column_values_to_be_unique", False, 1),
+    ("expect_column_values_to_not_be_null", False, 1),
+    ("expect_column_values_to_be_between", False, 2),
+    ("expect_column_values_to_be_in_set", False, 1),
+]
+
+
+class TestValidator:
+    """Tests for the single-pass expectation validator."""
+
+    def test_suite_compiles_to_one_query(self, suite):
+        sql, _ = compile_suite(suite, "raw.transactions", {"transaction_id", "order_id", "quantity", "channel"})
+        assert sql.count("FROM raw.transactions") == 1
+
+    def test_validate_table(self, suite, bad_parquet, tmp_path):
+        db_path = str(tmp_path / "warehouse.duckdb")
+        load_parquet_to_table("transactions", bad_parquet, db_path=db_path)
+        result = validate_table("raw.transactions", suite, db_path=db_path)
+        assert not result.success
+        assert result.row_count == 4
+        assert summarize(result) == EXPECTED
+        assert result.results[1].unexpected_samples == ["TXN-2"]
+        assert result.results[4].unexpected_samples[0]["channel"] == "fax"
+
+    def test_validate_parquet_matches_table(self, suite, bad_parquet):
+        result = validate_parquet(bad_parquet, suite, batch_size=2)
+        assert summarize(result) == EXPECTED
+        assert result.results[1].unexpected_samples == ["TXN-2"]
+        assert {row["quantity"] for row in result.results[3].unexpected_samples} == {0, 2000}
+
+    def test_missing_column_fails_without_scan(self, suite, tmp_path):
+        path = tmp_path / "empty.parquet"
+        pd.DataFrame({"order_id": ["ORD-1"]}).to_parquet(path, index=False)
+        result = validate_parquet(str(path), suite)
+        assert [r.success for r in result.results] == [False, False, True, False, False]
+
+    def test_mostly_threshold(self, bad_parquet):
+        suite = {"expectations": [{
+            "expectation_type": "expect_column_values_to_not_be_null",
+            "kwargs": {"column": "order_id", "mostly": 0.75},
+        }]}
+        assert validate_parquet(bad_parquet, suite).success
+
+    def test_unsupported_expectation_rejected(self, tmp_path):
+        path = tmp_path / "suite.json"
+        path.write_text('{"expectations": [{"expectation_type": "expect_magic", "kwargs": {}}]}')
+        with pytest.raises(ValueError):
+            load_suite(path)